@@ -7,6 +7,8 @@ from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 import os
 from dotenv import load_dotenv
+from app.services import database
+from app.services.database import engine_options, normalize_url
 
 # Load environment variables
 load_dotenv()
@@ -29,14 +31,20 @@ def create_app(testing=False):
     app.config["WTF_CSRF_TIME_LIMIT"] = None  # Disable CSRF timeout for better UX
     
     if testing:
-        # Use in-memory SQLite database for testing
-        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+        # Use in-memory SQLite database for testing (TEST_DATABASE_URL for a
+        # file database, e.g. benchmarks and tests that need real concurrency)
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("TEST_DATABASE_URL", "sqlite:///:memory:")
         app.config["TESTING"] = True
         app.config["DEBUG"] = False
+        app.config["PASSWORD_HASH_WORKERS"] = 0  # hash inline, no worker processes
     else:
-        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///officehoursai.db"
+        app.config["SQLALCHEMY_DATABASE_URI"] = normalize_url(os.getenv("DATABASE_URL", "sqlite:///officehoursai.db"))
+        if os.getenv("DATABASE_READ_URL"):
+            app.config["DATABASE_READ_URL"] = normalize_url(os.getenv("DATABASE_READ_URL"))
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # SQLite WAL/pragmas or Postgres pool sizing (see app/services/database.py)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
 
     # File upload configuration
     app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
@@ -45,6 +53,9 @@ def create_app(testing=False):
     # JWT configuration
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "jwt-secret-key")
 
+    # Admin access (profiling/diagnostics endpoints) by email, comma separated
+    app.config["ADMIN_EMAILS"] = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
     # Initialize extensions with app and performance settings
     CORS(app, 
          origins=['http://localhost:5001', 'http://127.0.0.1:5001'],  # Specific origins for security
@@ -52,19 +63,29 @@ def create_app(testing=False):
          max_age=86400)  # Cache preflight requests for 24 hours
     
     db.init_app(app)
+    database.init_app(app, db)
     jwt.init_app(app)
 
+    # Per-request SQL timing, slow-query log and N+1 warnings
+    from app.services import query_monitor
+    query_monitor.init_app(app)
+
     global migrate
     migrate = Migrate(app, db)
 
     # Import blueprints inside factory
-    from app.routes import auth, office, upload, chat
+    from app.routes import auth, office, upload, chat, admin
 
     # Register blueprints
     app.register_blueprint(auth.bp)
     app.register_blueprint(office.bp)
     app.register_blueprint(upload.bp)
     app.register_blueprint(chat.bp)
+    app.register_blueprint(admin.bp)
+
+    # Cached role/membership lookups for authorization (shares chat's Redis)
+    from app.services import acl
+    acl.init_app(app, None if testing else chat.redis_client)
 
     print("Registered office blueprint:", office.bp.name)
 
@@ -72,4 +93,14 @@ def create_app(testing=False):
     with app.app_context():
         db.create_all()
 
+    # Background sampling of RSS and cache-size gauges for /chat/metrics,
+    # the archive compactor when ARCHIVE_AFTER_DAYS is set, and the
+    # extraction workers (EXTRACTION_WORKERS, 0 when run standalone),
+    # started once the tables exist
+    if not testing:
+        from app.services import metrics, archive, extraction_queue
+        metrics.start_sampler()
+        archive.start_compactor(app)
+        extraction_queue.start_workers(app)
+
     return app
@@ -10,6 +10,11 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # REMOVED email verification fields for now
+
+    __table_args__ = (
+        # Case-insensitive email matching for bulk roster imports
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
     
     # Relationships
     owned_offices = db.relationship('Office', backref='owner', lazy=True)
@@ -44,12 +49,45 @@ class Resource(db.Model):
     file_path = db.Column(db.String(200), nullable=False)
     file_name = db.Column(db.String(200), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)
-    extracted_text = db.Column(db.Text)
+    extracted_text = db.deferred(db.Column(db.Text))  # legacy; text now lives in ResourceChunk rows
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Additional metadata
     file_size = db.Column(db.Integer)  # Size in bytes
     processed = db.Column(db.Boolean, default=False)  # Whether text has been extracted
+    content_hash = db.Column(db.String(64))  # SHA-256 of the file, key of its StoredBlob (NULL for legacy uploads)
+
+    __table_args__ = (
+        db.Index('ix_resource_office_id', 'office_id'),
+        db.Index('ix_resource_content_hash', 'content_hash'),
+    )
+
+class ResourceChunk(db.Model):
+    """A page, slide or section of a Resource's extracted text (see app/services/resource_text.py)."""
+    __tablename__ = 'resource_chunk'
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id', ondelete='CASCADE'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # order within the resource
+    kind = db.Column(db.String(10), nullable=False)  # page, slide, section, ...
+    number = db.Column(db.Integer, nullable=False)  # page/slide/section number as shown to users (second, for video keyframes)
+    codec = db.Column(db.String(10), nullable=False)  # 'none', 'zstd' or 'zlib'
+    char_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_resource_chunk_resource_id_position', 'resource_id', 'position', unique=True),
+    )
+
+class StoredBlob(db.Model):
+    """One stored upload file, shared by every Resource with the same content (see app/services/upload_store.py)."""
+    __tablename__ = 'stored_blob'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    file_path = db.Column(db.String(200), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # Resources pointing at this file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ChatSession(db.Model):
     __tablename__ = 'chat_session'
@@ -59,10 +97,108 @@ class ChatSession(db.Model):
     office_id = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_chat_session_user_id_office_id', 'user_id', 'office_id'),
+    )
+
 class ChatMessage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False)
     sender = db.Column(db.String(10), nullable=False)  # 'user' or 'ai'
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    video_url = db.Column(db.String(500), nullable=True)
\ No newline at end of file
+    video_url = db.Column(db.String(500), nullable=True)
+
+    __table_args__ = (
+        # History loads and keyset pagination: WHERE session_id = ? ORDER BY timestamp, id
+        db.Index('ix_chat_message_session_id_timestamp', 'session_id', 'timestamp', 'id'),
+    )
+
+class ChatMessageArchive(db.Model):
+    """Compressed segment of archived ChatMessage rows (see app/services/archive.py)."""
+    __tablename__ = 'chat_message_archive'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('chat_session.id'), nullable=False)
+    first_message_id = db.Column(db.Integer, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)
+    first_timestamp = db.Column(db.DateTime, nullable=False)
+    last_timestamp = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False)
+    codec = db.Column(db.String(10), nullable=False)  # 'zstd' or 'zlib'
+    raw_bytes = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_chat_message_archive_session_id_first_timestamp', 'session_id', 'first_timestamp'),
+    )
+
+class ArchiveRun(db.Model):
+    """One compactor pass, with table sizes afterwards, for the space report."""
+    __tablename__ = 'archive_run'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ran_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idle_days = db.Column(db.Float, nullable=False)
+    sessions = db.Column(db.Integer, nullable=False)
+    messages = db.Column(db.Integer, nullable=False)
+    raw_bytes = db.Column(db.Integer, nullable=False)
+    compressed_bytes = db.Column(db.Integer, nullable=False)
+    hot_rows = db.Column(db.Integer)
+    hot_bytes = db.Column(db.BigInteger)
+    archive_bytes = db.Column(db.BigInteger)
+    duration_ms = db.Column(db.Float)
+
+class ExtractionJob(db.Model):
+    """Text extraction for one Resource, run by the worker pool (see app/services/extraction_queue.py)."""
+    __tablename__ = 'extraction_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource_id = db.Column(db.Integer, db.ForeignKey('resource.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    progress = db.Column(db.Float, nullable=False, default=0.0)  # 0..1
+    message = db.Column(db.String(200))
+    error = db.Column(db.Text)
+    worker = db.Column(db.String(50))
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)  # retry backoff
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_extraction_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_extraction_job_resource_id', 'resource_id'),
+    )
+
+class UploadSession(db.Model):
+    """A resumable upload in progress: chunks are written into temp_path (see app/services/chunked_upload.py)."""
+    __tablename__ = 'upload_session'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, used in URLs
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    office_id = db.Column(db.Integer, db.ForeignKey('office.id'), nullable=False)
+    file_name = db.Column(db.String(200), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    temp_path = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='open')  # open, finalizing
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_upload_session_expires_at', 'expires_at'),
+    )
+
+class UploadChunk(db.Model):
+    """One received chunk of an UploadSession, with the checksum it was verified against."""
+    __tablename__ = 'upload_chunk'
+
+    upload_id = db.Column(db.String(32), db.ForeignKey('upload_session.id', ondelete='CASCADE'), primary_key=True)
+    offset = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -2,3 +2,4 @@ from . import auth
 from . import office
 from . import upload
 from . import chat
+from . import admin
@@ -0,0 +1,131 @@
+# app/routes/admin.py - Admin-only diagnostics for live workers
+
+import math
+import time
+import threading
+
+from flask import Blueprint, request, jsonify, current_app
+from app.utils.auth_utils import admin_required
+from app.services.profiler import SamplingProfiler, RECENT_PROFILES, render_profile
+from app.services import memory, metrics, archive
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+MAX_PROFILE_SECONDS = 60
+_profile_lock = threading.Lock()  # one whole-worker profile at a time
+
+@bp.route('/profile', methods=['GET'])
+@admin_required
+def profile_worker():
+    """Sample every thread in this worker for N seconds.
+
+    Query params: seconds (default 10, max 60), interval_ms (default 5),
+    format=speedscope|collapsed.
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    if not (math.isfinite(seconds) and math.isfinite(interval_ms)):
+        return jsonify({'error': 'seconds and interval_ms must be finite'}), 400
+    seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+    interval = max(interval_ms, 1.0) / 1000.0
+    fmt = request.args.get('format', 'speedscope')
+    if fmt not in ('speedscope', 'collapsed'):
+        return jsonify({'error': 'format must be speedscope or collapsed'}), 400
+    if not _profile_lock.acquire(blocking=False):
+        return jsonify({'error': 'A profile is already running on this worker'}), 409
+
+    try:
+        profiler = SamplingProfiler(interval=interval).start()
+        try:
+            time.sleep(seconds)
+        finally:
+            profiler.stop()  # never leave the sampler thread walking stacks
+    finally:
+        _profile_lock.release()
+    return render_profile(profiler, fmt, f"worker-{int(profiler.started_at)}")
+
+@bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """Per-request profiles captured with the X-Profile header."""
+    profiles = [{'id': profile_id, 'endpoint': entry['endpoint'], **entry['profiler'].summary()}
+                for profile_id, entry in reversed(RECENT_PROFILES.items())]
+    return jsonify({'profiles': profiles})
+
+@bp.route('/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def get_profile(profile_id):
+    entry = RECENT_PROFILES.get(profile_id)
+    if not entry:
+        return jsonify({'error': 'Profile not found'}), 404
+    return render_profile(entry['profiler'], request.args.get('format', 'speedscope'), f"request-{profile_id}")
+
+@bp.route('/memory', methods=['GET'])
+@admin_required
+def memory_status():
+    """tracemalloc state plus the current RSS and cache-size gauges."""
+    return jsonify({'tracemalloc': memory.status(), **metrics.collect(history=True, fresh=True)})
+
+@bp.route('/memory/start', methods=['POST'])
+@admin_required
+def memory_start():
+    """Start tracemalloc. JSON body: {"frames": 1} (more frames = more overhead)."""
+    try:
+        frames = min(max(int((request.get_json(silent=True) or {}).get('frames', 1)), 1), 25)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'frames must be a number'}), 400
+    started = memory.start(frames)
+    return jsonify({'started': started, **memory.status()}), 200 if started else 409
+
+@bp.route('/memory/stop', methods=['POST'])
+@admin_required
+def memory_stop():
+    memory.stop()
+    return jsonify(memory.status())
+
+@bp.route('/memory/snapshot', methods=['GET'])
+@admin_required
+def memory_snapshot():
+    """Top allocation sites and per-module totals, diffed against the previous snapshot."""
+    try:
+        top = min(max(int(request.args.get('top', 25)), 1), 200)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top must be a number'}), 400
+    try:
+        return jsonify(memory.take_snapshot(top))
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+
+@bp.route('/archive/compact', methods=['POST'])
+@admin_required
+def archive_compact():
+    """Archive sessions idle for N days now. JSON body: {"idle_days": 30, "segment_size": 500}."""
+    data = request.get_json(silent=True) or {}
+    try:
+        idle_days = float(data.get('idle_days', 30))
+        segment_size = max(int(data.get('segment_size', archive.DEFAULT_SEGMENT_SIZE)), 1)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'idle_days and segment_size must be numbers'}), 400
+    return jsonify(archive.compact(current_app._get_current_object(), idle_days, segment_size))
+
+@bp.route('/archive/report', methods=['GET'])
+@admin_required
+def archive_report():
+    """Compaction runs, newest first: space reclaimed and hot-table size over time."""
+    from app.models.db_models import ArchiveRun
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be a number'}), 400
+    runs = ArchiveRun.query.order_by(ArchiveRun.id.desc()).limit(limit).all()
+    return jsonify({
+        'codec': 'zstd' if archive.ZSTD_AVAILABLE else 'zlib',
+        'runs': [archive.run_to_dict(run) for run in runs],
+        'totals': {
+            'messages': sum(run.messages for run in runs),
+            'reclaimed_bytes': sum(run.raw_bytes - run.compressed_bytes for run in runs),
+        },
+    })
@@ -1,11 +1,34 @@
 from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models.db_models import User
-from app.utils.auth_utils import hash_password, verify_password
+from app.services.password_hasher import get_password_hasher, HasherBusy
 from flask_jwt_extended import create_access_token
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+HASH_RETRY_AFTER_SECONDS = 2
+
+def busy_response():
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.headers['Retry-After'] = str(HASH_RETRY_AFTER_SECONDS)
+    return response, 503
+
+def upgrade_password_hash(app, hasher, user_id, old_hash, password):
+    """Re-hash with the current parameters in the background and store it
+    unless the password changed meanwhile. Skipped when the pool is full."""
+    def store(future):
+        if future.exception():
+            return
+        with app.app_context():
+            User.query.filter_by(id=user_id, password=old_hash).update({'password': future.result()})
+            db.session.commit()
+            db.session.remove()
+
+    try:
+        hasher.submit_hash(password).add_done_callback(store)
+    except HasherBusy:
+        pass  # upgraded on a later login
+
 @bp.route('/register', methods=['POST'])
 def register():
     current_app.logger.info("Received registration request")
@@ -29,7 +52,7 @@ def register():
         user = User(
             name=name,
             email=email,
-            password=hash_password(password),
+            password=get_password_hasher(current_app).hash(password),
             role=role
         )
         current_app.logger.info(f"Creating new user: {email}")
@@ -37,6 +60,10 @@ def register():
         db.session.commit()
         current_app.logger.info(f"User created successfully: {email}")
         return jsonify({'message': 'User registered successfully'}), 201
+    except HasherBusy as e:
+        current_app.logger.warning(f"Registration shed: {e}")
+        db.session.rollback()
+        return busy_response()
     except Exception as e:
         current_app.logger.error(f"Error in registration: {str(e)}")
         db.session.rollback()
@@ -49,10 +76,21 @@ def login():
     password = data.get('password')
 
     user = User.query.filter_by(email=email).first()
-    if not user or not verify_password(password, user.password):
+    if not user:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    hasher = get_password_hasher(current_app)
+    try:
+        valid = hasher.verify(password, user.password)
+    except HasherBusy as e:
+        current_app.logger.warning(f"Login shed: {e}")
+        return busy_response()
+    if not valid:
         return jsonify({'error': 'Invalid credentials'}), 401
+    if hasher.needs_rehash(user.password):
+        upgrade_password_hash(current_app._get_current_object(), hasher, user.id, user.password, password)
 
-    access_token = create_access_token(identity=str(user.id))
+    # The role claim lets routes authorize without loading the user
+    access_token = create_access_token(identity=str(user.id), additional_claims={'role': user.role})
     return jsonify({
         'token': access_token,
         'user': {
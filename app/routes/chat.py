@@ -9,13 +9,24 @@ import threading
 import logging
 import queue
 from datetime import datetime
+from itertools import islice
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Dict, Any, List, Generator
 
 from flask import Blueprint, request, jsonify, Response, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import select, func, tuple_
 from app import db
-from app.models.db_models import ChatSession, ChatMessage, Enrollment, Office
+from app.models.db_models import ChatSession, ChatMessage
+from app.services.llm_provider import create_llm_client
+from app.services.trace_recorder import start_trace, NullTrace
+from app.services.cache_trace import record_cache_access
+from app.services.profiler import profile_if_requested
+from app.services import metrics
+from app.services.message_writer import get_message_writer
+from app.services.database import read_session
+from app.services.archive import archived_messages, archived_count
+from app.services import acl
 from dotenv import load_dotenv
 
 # Import OpenAI and httpx for API calls
@@ -83,6 +94,12 @@ def log_performance_metric(metric_type, value, details=None):
     
     logger.info(f"PERF_{metric_type.upper()}: {value:.3f}s - {details}")
 
+# In-process and Redis cache sizes, sampled in the background (see app/services/metrics.py)
+metrics.register_gauge('cache.performance_metrics_bytes', lambda: metrics.deep_sizeof(performance_metrics), periodic=True)
+if redis_client:
+    metrics.register_gauge('cache.redis', lambda: metrics.redis_namespace_sizes(
+        redis_client, ('tts:', 'llm_response:', 'chat_history:')), periodic=True)
+
 # --- Model & Performance Configuration ---
 # Ultra-fast models for near real-time performance
 FAST_MODEL = "gpt-4o-mini"  # Fastest text model
@@ -94,32 +111,21 @@ TTS_VOICE = "onyx"  # Optimized voice
 MAX_TOKENS = 300  # Reduced further for ultra-fast responses
 MAX_VISION_TOKENS = 200  # Even smaller for vision queries 
 
-# Initialize OpenAI client with performance optimizations
-openai_client = None
-try:
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if openai_api_key:
-        # Initialize with optimized HTTP client for performance
-        openai_client = openai.OpenAI(
-            api_key=openai_api_key,
-            timeout=httpx.Timeout(30.0, connect=5.0),  # Faster timeouts
-            max_retries=1,  # Reduce retries for speed
-            http_client=httpx.Client(
-                limits=httpx.Limits(
-                    max_connections=100,  # Connection pooling
-                    max_keepalive_connections=20,
-                    keepalive_expiry=30.0
-                ),
-                timeout=httpx.Timeout(30.0, connect=5.0),
-                http2=True  # Enable HTTP/2 for better performance
-            )
-        )
-        logger.info("✅ OpenAI client initialized with performance optimizations.")
-    else:
-        logger.warning("⚠️ OPENAI_API_KEY not found in environment variables. OpenAI features will be disabled.")
-except Exception as e:
-    logger.error(f"❌ Error initializing OpenAI client: {e}")
-    openai_client = None
+# Redis cache lifetimes (seconds); size them with benchmarks/cache_sim.py
+TTS_CACHE_TTL = 7200  # 2 hours
+LLM_CACHE_TTL = 1800  # 30 minutes
+HISTORY_CACHE_TTL = 300  # 5 minutes
+
+# /chat/history paging (messages per page) and export batch size
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+HISTORY_EXPORT_BATCH = 500
+
+# How long /chat/message waits for the user's message (and, before 'end', the reply) to be committed
+USER_MESSAGE_WRITE_TIMEOUT = 5.0
+
+# Initialize the LLM/TTS client (real OpenAI, or the local mock via LLM_PROVIDER=mock)
+openai_client = create_llm_client()
 
 bp = Blueprint('chat', __name__, url_prefix='/chat')
 
@@ -131,9 +137,7 @@ def start_session():
     if not office_id:
         return jsonify({"error": "Office ID is required"}), 400
 
-    enrollment = Enrollment.query.filter_by(user_id=user_id, office_id=office_id).first()
-    office = Office.query.get(office_id)
-    if not enrollment and (not office or office.owner_id != int(user_id)):
+    if not acl.can_access_office(user_id, office_id):
         return jsonify({"error": "User not enrolled in this office"}), 403
     session = ChatSession.query.filter_by(user_id=user_id, office_id=office_id).first()
     if not session:
@@ -145,13 +149,40 @@ def start_session():
 @bp.route('/history/<int:session_id>', methods=['GET'])
 @jwt_required()
 def get_history(session_id):
+    """Chat history in chronological order.
+
+    Without query params the whole history is streamed as {"history": [...]}.
+    With limit and an optional before/after cursor, one keyset page on
+    (timestamp, id) is returned with cursors for the neighbouring pages.
+    Both forms send an ETag and answer If-None-Match with 304.
+    """
     user_id = get_jwt_identity()
-    session = ChatSession.query.get(session_id)
+    session = db.session.get(ChatSession, session_id)
     if not session or int(session.user_id) != int(user_id):
         return jsonify({"error": "Access denied"}), 403
-    messages = ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.timestamp).all()
-    history = [{"sender": m.sender, "message": m.message, "timestamp": m.timestamp.isoformat(), "message_id": m.id} for m in messages]
-    return jsonify({"history": history})
+
+    paged = any(key in request.args for key in ('limit', 'before', 'after'))
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), MAX_HISTORY_PAGE_SIZE)
+        before = decode_history_cursor(request.args['before']) if 'before' in request.args else None
+        after = decode_history_cursor(request.args['after']) if 'after' in request.args else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+    if before and after:
+        return jsonify({"error": "Use either before or after, not both"}), 400
+
+    app_instance = current_app._get_current_object()
+    etag = history_etag(app_instance, session_id, request.query_string)
+    db.session.remove()  # Nothing else needs the request session
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif paged:
+        response = jsonify(history_page(app_instance, session_id, limit, before, after))
+    else:
+        response = Response(stream_history_json(app_instance, session_id), mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @bp.route('/health', methods=['GET'])
 def health_check():
@@ -159,6 +190,7 @@ def health_check():
         "status": "streaming_ready",
         "optimizations": {
             "openai_available": openai_client is not None,
+            "llm_provider": type(openai_client).__name__ if openai_client else None,
             "pil_available": PIL_AVAILABLE,
             "redis_available": redis_client is not None
         }
@@ -179,7 +211,7 @@ def get_performance_metrics():
         # Get recent error rates
         total_errors = sum(performance_metrics['error_counts'].values())
         
-        metrics = {
+        report = {
             "timestamp": time.time(),
             "performance": {
                 "avg_response_time_ms": round(avg_response_time * 1000, 2),
@@ -201,46 +233,156 @@ def get_performance_metrics():
                 "openai_available": openai_client is not None,
                 "redis_available": redis_client is not None,
                 "pil_available": PIL_AVAILABLE
-            }
+            },
+            **metrics.collect(history=request.args.get('history') == '1')
         }
         
-        return jsonify(metrics)
+        return jsonify(report)
         
     except Exception as e:
         logger.error(f"Error generating metrics: {e}")
         return jsonify({"error": "Failed to generate metrics", "details": str(e)}), 500
 
 # Helper function to get chat history for LLM context with caching
-def get_chat_history_for_llm(app, session_id: int) -> List[Dict[str, Any]]:
+def get_chat_history_for_llm(app, session_id: int, trace=None) -> List[Dict[str, Any]]:
+    trace = trace or NullTrace()
     # Try to get chat history from cache first
     cache_key = f"chat_history:{session_id}"
     
     if redis_client:
         try:
             cached_history = redis_client.get(cache_key)
+            record_cache_access('history', cache_key, 'get', len(cached_history or ''), hit=bool(cached_history))
             if cached_history:
+                trace.cache('history', 'hit')
                 import json
                 return json.loads(cached_history)
         except Exception as e:
             logger.warning(f"Failed to read chat history from cache: {e}")
+    trace.cache('history', 'miss' if redis_client else 'disabled')
     
     # Fetch from database if not in cache
-    messages = ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.timestamp).all()
+    # Read through the read engine so this never queues behind message writes
+    with read_session(app) as read_db:
+        # Archived messages of a compacted session always precede its hot rows
+        rows = [(m.sender, m.message) for m in archived_messages(read_db, session_id)]
+        rows += read_db.execute(
+            select(ChatMessage.sender, ChatMessage.message)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.timestamp, ChatMessage.id)
+        ).all()
     history = []
-    for msg in messages:
-        role = 'user' if msg.sender == 'user' else 'assistant'
-        history.append({"role": role, "content": msg.message})
+    for sender, message in rows:
+        role = 'user' if sender == 'user' else 'assistant'
+        history.append({"role": role, "content": message})
     
     # Cache the history for faster subsequent requests
     if redis_client and history:
         try:
             import json
-            redis_client.setex(cache_key, 300, json.dumps(history))  # Cache for 5 minutes
+            history_json = json.dumps(history)
+            redis_client.setex(cache_key, HISTORY_CACHE_TTL, history_json)
+            record_cache_access('history', cache_key, 'set', len(history_json), HISTORY_CACHE_TTL)
         except Exception as e:
             logger.warning(f"Failed to cache chat history: {e}")
     
     return history
 
+def invalidate_history_cache(session_ids):
+    """Drop cached LLM history for sessions that just had messages committed."""
+    if not redis_client:
+        return
+    for session_id in session_ids:
+        cache_key = f"chat_history:{session_id}"
+        try:
+            redis_client.delete(cache_key)
+            record_cache_access('history', cache_key, 'del')
+        except Exception as e:
+            logger.warning(f"Failed to invalidate chat history cache: {e}")
+
+def message_to_dict(m) -> Dict[str, Any]:
+    return {"sender": m.sender, "message": m.message, "timestamp": m.timestamp.isoformat(), "message_id": m.id}
+
+def encode_history_cursor(m) -> str:
+    raw = f"{m.timestamp.isoformat()}|{m.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_history_cursor(cursor: str):
+    """(timestamp, id) from a cursor; ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, message_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (UnicodeDecodeError, TypeError, ValueError, base64.binascii.Error):
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+
+def base64_decoded_size(encoded) -> int:
+    """Byte length of base64 `encoded` (str or bytes) without decoding it."""
+    padding = len(encoded) - len(encoded.rstrip('=' if isinstance(encoded, str) else b'='))
+    return len(encoded) * 3 // 4 - padding
+
+def history_etag(app, session_id: int, variant: bytes) -> str:
+    """Messages are append-only, so (count, max id) identifies a history version."""
+    with read_session(app) as read_db:
+        count, max_id = read_db.execute(
+            select(func.count(ChatMessage.id), func.max(ChatMessage.id)).where(ChatMessage.session_id == session_id)
+        ).one()
+        archived = archived_count(read_db, session_id)
+    return hashlib.sha1(f"{session_id}:{count}:{archived}:{max_id}:".encode() + variant).hexdigest()
+
+def history_page(app, session_id: int, limit: int, before=None, after=None) -> Dict[str, Any]:
+    """One keyset page of history. Defaults to the newest `limit` messages."""
+    key = tuple_(ChatMessage.timestamp, ChatMessage.id)
+    query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    if after:
+        query = query.where(key > tuple_(*after)).order_by(ChatMessage.timestamp, ChatMessage.id)
+    else:
+        if before:
+            query = query.where(key < tuple_(*before))
+        query = query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+    with read_session(app) as read_db:
+        rows = list(read_db.scalars(query.limit(limit + 1)))
+        # Archived messages sort before every hot row: read them first when
+        # paging forward, or to top up a backward page that ran out of hot rows
+        if after:
+            archived = list(islice(archived_messages(read_db, session_id, after=after), limit + 1))
+            rows = (archived + rows)[:limit + 1]
+        elif len(rows) <= limit:
+            start = (rows[-1].timestamp, rows[-1].id) if rows else before
+            rows += islice(archived_messages(read_db, session_id, before=start, descending=True),
+                           limit + 1 - len(rows))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not after:
+        rows.reverse()
+    return {
+        "history": [message_to_dict(m) for m in rows],
+        "page": {
+            "limit": limit,
+            "before": encode_history_cursor(rows[0]) if rows else None,
+            "after": encode_history_cursor(rows[-1]) if rows else None,
+            "has_more_before": has_more if not after else True,
+            "has_more_after": has_more if after else before is not None,
+        },
+    }
+
+def stream_history_json(app, session_id: int) -> Generator[str, None, None]:
+    """Full history as one JSON document, fetched and encoded in batches."""
+    query = (select(ChatMessage).where(ChatMessage.session_id == session_id)
+             .order_by(ChatMessage.timestamp, ChatMessage.id)
+             .execution_options(yield_per=HISTORY_EXPORT_BATCH))
+    yield '{"history": ['
+    separator = ''
+    with read_session(app) as read_db:
+        archived = archived_messages(read_db, session_id)
+        for batch in iter(lambda: list(islice(archived, HISTORY_EXPORT_BATCH)), []):
+            yield separator + ','.join(json.dumps(message_to_dict(m)) for m in batch)
+            separator = ','
+        for batch in read_db.scalars(query).partitions():
+            yield separator + ','.join(json.dumps(message_to_dict(m)) for m in batch)
+            separator = ','
+    yield ']}'
+
 # Function to optimize image size (optional, for vision model)
 def optimize_image(image_data: str) -> str:
     if not PIL_AVAILABLE:
@@ -268,6 +410,39 @@ def optimize_image(image_data: str) -> str:
         logger.error(f"❌ Error optimizing image: {e}")
         return image_data # Return original if optimization fails
 
+# --- Sentence segmentation & SSE encoding (hot path, see benchmarks/microbench.py) ---
+SENTENCE_ENDINGS = '.!?'
+MIN_SENTENCE_LENGTH = 20  # Minimum characters for a sentence
+SENTENCE_COMPLETE_WORDS = 4  # Minimum words for a complete sentence
+
+def split_complete_sentence(text_buffer: str):
+    """Split the buffer after its furthest sentence ending.
+
+    Returns (sentence, remainder); sentence is None while no ending has arrived.
+    """
+    sentence_end_pos = -1
+    for ending in SENTENCE_ENDINGS:
+        pos = text_buffer.find(ending)
+        if pos != -1:
+            sentence_end_pos = max(sentence_end_pos, pos)
+    if sentence_end_pos == -1:
+        return None, text_buffer
+    return text_buffer[:sentence_end_pos + 1].strip(), text_buffer[sentence_end_pos + 1:]
+
+def is_speakable(text: str) -> bool:
+    """Only substantial sentences are sent to TTS to avoid choppy audio."""
+    return len(text) >= MIN_SENTENCE_LENGTH and len(text.split()) >= SENTENCE_COMPLETE_WORDS
+
+def encode_sse_event(chunk: Dict[str, Any]) -> Optional[str]:
+    """Encode a stream chunk as a server-sent event frame for the client."""
+    if chunk['type'] in ('text', 'audio', 'error'):
+        payload = {'type': chunk['type'], 'content': chunk['content']}
+    elif chunk['type'] == 'end':
+        payload = {'type': 'end', 'processing_time': chunk['processing_time']}
+    else:
+        return None
+    return f"data: {json.dumps(payload)}\n\n"
+
 # Actual LLM/TTS integration with OpenAI
 def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Optional[str], session_id: int) -> Generator[Dict[str, Any], None, None]:
     if not openai_client:
@@ -278,9 +453,6 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
     performance_metrics['concurrent_requests'] += 1
     full_text_response = ""
     text_buffer = ""
-    sentence_endings = '.!?'
-    min_sentence_length = 20  # Minimum characters for a sentence
-    sentence_complete_words = 4  # Minimum words for a complete sentence
     accumulated_words = []
     
     # Performance tracking variables
@@ -288,17 +460,21 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
     first_token_time = None
     tts_generation_times = []
     total_chunks_generated = 0
+    trace = start_trace(user_message, bool(video_frame))  # No-op unless CHAT_TRACE_FILE is set
     
     try:
         # No 'with app.app_context()' here, as it's expected to be called within one already
         # Prepare chat history for LLM context (with caching)
-        chat_history = get_chat_history_for_llm(app, session_id)
+        chat_history = get_chat_history_for_llm(app, session_id, trace)
+        trace.history(len(chat_history))
         
         # Check if we have a cached response for similar recent queries
         query_cache_key = f"llm_response:{hashlib.md5((user_message + str(len(chat_history))).encode()).hexdigest()[:16]}"
         if redis_client and not video_frame:  # Only cache text-only responses
             try:
                 cached_response = redis_client.get(query_cache_key)
+                record_cache_access('llm', query_cache_key, 'get', len(cached_response or ''), hit=bool(cached_response))
+                trace.cache('llm', 'hit' if cached_response else 'miss')
                 if cached_response:
                     logger.info(f"🚀 LLM cache hit for query: '{user_message[:30]}...'")
                     import json
@@ -332,6 +508,7 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
         token_limit = MAX_VISION_TOKENS if video_frame else MAX_TOKENS
         
         logger.info(f"Sending request to OpenAI LLM ({model_to_use}, max_tokens={token_limit})...")
+        trace.llm_started()
         llm_response_stream = openai_client.chat.completions.create(
             model=model_to_use,
             messages=chat_history,
@@ -359,10 +536,12 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
             if redis_client:
                 try:
                     cached_audio = redis_client.get(tts_cache_key)
+                    record_cache_access('tts', tts_cache_key, 'get', len(cached_audio or ''), hit=bool(cached_audio))
                     if cached_audio:
                         performance_metrics['cache_hit_rates']['tts_hits'] += 1
                         cache_time = time.time() - tts_start_time
                         tts_generation_times.append(cache_time)
+                        trace.tts(cache_time, base64_decoded_size(cached_audio), hit=True)  # audio bytes, as on a miss
                         logger.info(f"🔊 TTS cache hit ({cache_time*1000:.1f}ms): '{text_chunk[:30]}...'")
                         return cached_audio
                 except Exception as e:
@@ -391,13 +570,15 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
                     try:
                         # Use pipeline for better performance
                         pipe = redis_client.pipeline()
-                        pipe.set(tts_cache_key, base64_audio, ex=7200)  # Cache for 2 hours
+                        pipe.set(tts_cache_key, base64_audio, ex=TTS_CACHE_TTL)
                         pipe.execute()
+                        record_cache_access('tts', tts_cache_key, 'set', len(base64_audio), TTS_CACHE_TTL)
                     except Exception as e:
                         logger.warning(f"Redis cache write failed: {e}")
                     
                 tts_time = time.time() - tts_start_time
                 tts_generation_times.append(tts_time)
+                trace.tts(tts_time, len(full_audio_bytes), hit=False)
                 logger.info(f"✅ TTS chunk generated ({len(full_audio_bytes)} bytes, {tts_time:.3f}s)")
                 return base64_audio
                 
@@ -413,6 +594,7 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
                 content_chunk = chunk.choices[0].delta.content
                 full_text_response += content_chunk
                 text_buffer += content_chunk
+                trace.token(content_chunk)
                 
                 # Track first token time
                 if first_token_time is None:
@@ -424,20 +606,10 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
                 yield {'type': 'text', 'content': content_chunk}
                 
                 # SIMPLIFIED: Only generate TTS for complete sentences to prevent overlaps
-                sentence_end_pos = -1
-                for ending in sentence_endings:
-                    pos = text_buffer.find(ending)
-                    if pos != -1:
-                        sentence_end_pos = max(sentence_end_pos, pos)
-                
-                if sentence_end_pos != -1:
-                    # Found a complete sentence
-                    sentence = text_buffer[:sentence_end_pos + 1].strip()
-                    text_buffer = text_buffer[sentence_end_pos + 1:]
-                    
+                sentence, text_buffer = split_complete_sentence(text_buffer)
+                if sentence is not None:
                     # Only generate TTS for substantial, complete sentences
-                    word_count = len(sentence.split())
-                    if len(sentence) >= min_sentence_length and word_count >= sentence_complete_words:
+                    if is_speakable(sentence):
                         logger.info(f"🎵 Generating TTS for complete sentence: '{sentence}'")
                         audio_data = generate_tts_for_chunk(sentence)
                         if audio_data:
@@ -458,8 +630,7 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
         if text_buffer.strip():
             final_text = text_buffer.strip()
             # Only generate TTS for substantial remaining text that could be a sentence
-            word_count = len(final_text.split())
-            if len(final_text) >= min_sentence_length and word_count >= sentence_complete_words:
+            if is_speakable(final_text):
                 logger.info(f"🎵 Generating final TTS for remaining text: '{final_text}'")
                 audio_data = generate_tts_for_chunk(final_text)
                 if audio_data:
@@ -476,7 +647,9 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
                     'audio_chunks': [],  # Audio will be regenerated for freshness
                     'timestamp': time.time()
                 }
-                redis_client.setex(query_cache_key, 1800, json.dumps(cache_data))  # Cache for 30 minutes
+                cache_json = json.dumps(cache_data)
+                redis_client.setex(query_cache_key, LLM_CACHE_TTL, cache_json)
+                record_cache_access('llm', query_cache_key, 'set', len(cache_json), LLM_CACHE_TTL)
                 logger.info(f"💾 Cached LLM response for future use")
             except Exception as e:
                 logger.warning(f"Failed to cache LLM response: {e}")
@@ -498,6 +671,8 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
         performance_metrics['concurrent_requests'] -= 1
         processing_time = time.time() - start_time
         
+        trace.finish()
+        
         # Log comprehensive performance data
         log_performance_metric('total_request_times', processing_time, {
             'response_length': len(full_text_response),
@@ -515,6 +690,7 @@ def get_llm_and_tts_stream_from_openai(app, user_message: str, video_frame: Opti
 
 @bp.route('/message', methods=['POST'])
 @jwt_required()
+@profile_if_requested
 def message():
     user_id = get_jwt_identity()
     data = request.json
@@ -528,70 +704,45 @@ def message():
     if not session or int(session.user_id) != int(user_id):
         return jsonify({"error": "Session not found or access denied"}), 403
 
-    # Add user message to DB immediately
-    user_msg = ChatMessage(session_id=session.id, sender='user', message=user_message_text)
-    db.session.add(user_msg)
-    db.session.commit()
-    
-    # Invalidate chat history cache when new message is added
-    if redis_client:
-        try:
-            cache_key = f"chat_history:{session.id}"
-            redis_client.delete(cache_key)
-        except Exception as e:
-            logger.warning(f"Failed to invalidate chat history cache: {e}")
+    app_instance = current_app._get_current_object()
+    writer = get_message_writer(app_instance, on_commit=invalidate_history_cache)
 
-    # Create a placeholder AI message and get its ID.
-    # We will update its 'message' field later in the 'finally' block of the generator.
-    ai_msg_placeholder = ChatMessage(session_id=session.id, sender='ai', message="")
-    db.session.add(ai_msg_placeholder)
-    db.session.flush() # Flush to assign an ID to ai_msg_placeholder without committing the transaction yet.
-    ai_message_id = ai_msg_placeholder.id # Store the ID for later retrieval
-
-    # Accumulate the full AI reply text here
-    full_ai_reply_text = []
+    # Persist the user message through the write-behind queue. Wait for its
+    # batch to commit so the history read below includes it.
+    if not writer.submit(session.id, 'user', user_message_text).wait(USER_MESSAGE_WRITE_TIMEOUT):
+        return jsonify({"error": "Could not save message, please retry"}), 503
+    db.session.remove()  # Release the request's connection before streaming
 
     def event_stream(app_instance): # Accept app_instance as an argument
-        nonlocal full_ai_reply_text # Declare intent to modify outer scope variable
         # Explicitly push an application context for the generator's lifetime
         app_context = app_instance.app_context() # Use the passed app_instance
         app_context.push()
+        full_ai_reply_text = []
+        saved = False
         
         try:
             # Pass the actual app object to the streaming function
             for chunk in get_llm_and_tts_stream_from_openai(app_instance, user_message_text, video_frame, session_id):
                 if chunk['type'] == 'text':
                     full_ai_reply_text.append(chunk['content'])
-                    yield f"data: {json.dumps({'type': 'text', 'content': chunk['content']})}\n\n"
-                elif chunk['type'] == 'audio':
-                    yield f"data: {json.dumps({'type': 'audio', 'content': chunk['content']})}\n\n"
                 elif chunk['type'] == 'end':
-                    yield f"data: {json.dumps({'type': 'end', 'processing_time': chunk['processing_time']})}\n\n"
-                elif chunk['type'] == 'error':
-                    yield f"data: {json.dumps({'type': 'error', 'content': chunk['content']})}\n\n"
+                    # The client only sees 'end' once the reply is committed
+                    saved = True
+                    if not writer.submit(session_id, 'ai', "".join(full_ai_reply_text)).wait(USER_MESSAGE_WRITE_TIMEOUT):
+                        logger.error(f"AI reply for session {session_id} was not saved")
+                        yield encode_sse_event({'type': 'error', 'content': "Could not save the answer"})
+                frame = encode_sse_event(chunk)
+                if frame:
+                    yield frame
         except GeneratorExit:
             # This block is executed if the client disconnects prematurely
             logger.info("Client disconnected, generator closing.")
         finally:
-            # This block ensures the AI message is saved and context is popped
-            # The app_context is already pushed above, so db operations should work.
-            ai_msg_to_update = db.session.get(ChatMessage, ai_message_id) # Use db.session.get for primary key lookup
-            if ai_msg_to_update:
-                ai_msg_to_update.message = "".join(full_ai_reply_text)
-                db.session.commit()
-                logger.info(f"AI message (ID: {ai_message_id}) updated in DB with full reply.")
-                
-                # Invalidate chat history cache after AI response
-                if redis_client:
-                    try:
-                        cache_key = f"chat_history:{session_id}"
-                        redis_client.delete(cache_key)
-                    except Exception as e:
-                        logger.warning(f"Failed to invalidate chat history cache after AI response: {e}")
-            else:
-                logger.error(f"Could not find AI message with ID {ai_message_id} to update.")
-            
+            if not saved:
+                # Partial reply (client disconnected or the stream failed): queued
+                # without waiting; the writer commits it within its batching delay.
+                writer.submit(session_id, 'ai', "".join(full_ai_reply_text))
             db.session.remove() # Clean up the session
             app_context.pop() # Pop the context
             
-    return Response(event_stream(current_app._get_current_object()), mimetype='text/event-stream') # Pass current_app here
\ No newline at end of file
+    return Response(event_stream(app_instance), mimetype='text/event-stream')
\ No newline at end of file
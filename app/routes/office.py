@@ -1,27 +1,50 @@
 # routes/office.py
 
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.db_models import User, Office, Enrollment
-import string
-import random
+from app.services import acl
+from app.services.password_hasher import get_password_hasher
+from app.services.roster import parse_roster, import_roster, RosterError
+from app.services.join_codes import get_allocator
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 
 bp = Blueprint("office", __name__, url_prefix="/office")
 
-def generate_join_code(length=6):
-    """Generate a random uppercase alphanumeric join code."""
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(characters, k=length))
+MAX_BULK_OFFICES = 1000
+
+def insert_offices(owner_id, names):
+    """Insert offices with freshly allocated join codes in one transaction."""
+    allocator = get_allocator(current_app)
+    for attempt in (1, 2):
+        codes = allocator.allocate(len(names))
+        try:
+            rows = db.session.execute(
+                insert(Office).returning(Office.id, Office.name, Office.join_code, sort_by_parameter_order=True),
+                [{"name": name, "owner_id": owner_id, "join_code": code} for name, code in zip(names, codes)],
+            ).all()
+            db.session.commit()
+            break
+        except IntegrityError:
+            # Another worker took one of the codes; reload the used set and redraw
+            db.session.rollback()
+            allocator.release(codes)
+            if attempt == 2:
+                raise
+            allocator.refresh()
+    acl.invalidate(owner_id)
+    return [{"id": row.id, "name": row.name, "join_code": row.join_code} for row in rows]
 
 @bp.route("/create", methods=["POST"])
 @jwt_required()
 def create_office():
     print("create_office route hit")
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
 
-    if user.role != "teacher":
+    if acl.user_role(user_id) != "teacher":
         return jsonify({"error": "Only teachers can create offices."}), 403
 
     data = request.get_json()
@@ -30,23 +53,35 @@ def create_office():
     if not name:
         return jsonify({"error": "Office name is required."}), 400
 
-    # Generate unique join code (retry if collision)
-    while True:
-        join_code = generate_join_code()
-        if not Office.query.filter_by(join_code=join_code).first():
-            break
-
-    new_office = Office(name=name, owner_id=user_id, join_code=join_code)
-    db.session.add(new_office)
-    db.session.commit()
+    office = insert_offices(int(user_id), [name])[0]
 
     return jsonify({
         "message": "Office created successfully",
-        "office": {
-            "id": new_office.id,
-            "name": new_office.name,
-            "join_code": new_office.join_code
-        }
+        "office": office
+    }), 201
+
+@bp.route("/bulk_create", methods=["POST"])
+@jwt_required()
+def bulk_create_offices():
+    """Create many offices at once. JSON body: {"names": ["CS 101 - 01", ...]}."""
+    user_id = get_jwt_identity()
+
+    if acl.user_role(user_id) != "teacher":
+        return jsonify({"error": "Only teachers can create offices."}), 403
+
+    names = (request.get_json(silent=True) or {}).get("names")
+    if not isinstance(names, list) or not names:
+        return jsonify({"error": "A non-empty list of office names is required."}), 400
+    if len(names) > MAX_BULK_OFFICES:
+        return jsonify({"error": f"At most {MAX_BULK_OFFICES} offices per request."}), 400
+    if not all(isinstance(name, str) and 0 < len(name.strip()) <= 100 for name in names):
+        return jsonify({"error": "Office names must be 1-100 characters."}), 400
+
+    offices = insert_offices(int(user_id), [name.strip() for name in names])
+
+    return jsonify({
+        "message": f"Created {len(offices)} offices",
+        "offices": offices
     }), 201
 
 @bp.route("/join", methods=["POST"])
@@ -72,6 +107,7 @@ def join_office():
     enrollment = Enrollment(user_id=user_id, office_id=office.id)
     db.session.add(enrollment)
     db.session.commit()
+    acl.invalidate(user_id)
 
     return jsonify({"message": f"Joined office '{office.name}' successfully."}), 201
 
@@ -105,5 +141,43 @@ def edit_office(office_id):
         }
     }), 200
 
+@bp.route("/<int:office_id>/roster", methods=["POST"])
+@jwt_required()
+def import_office_roster(office_id):
+    """Create missing student accounts and enroll them in bulk.
+
+    Accepts a CSV upload (`file`, header name,email[,password]), a JSON upload,
+    or a JSON body (a list or {"students": [...]}). Streams NDJSON: one result
+    per row, then a summary line.
+    """
+    user_id = get_jwt_identity()
+    if acl.user_role(user_id) != "teacher" or not acl.owns_office(user_id, office_id):
+        return jsonify({"error": "Only the owner can import a roster."}), 403
+
+    if "file" in request.files:
+        upload = request.files["file"]
+        is_json = upload.filename.lower().endswith(".json") or upload.mimetype == "application/json"
+        source, fmt = upload.stream, "json" if is_json else "csv"
+    elif request.is_json:
+        source, fmt = request.stream, "json"
+    else:
+        return jsonify({"error": "Provide a CSV/JSON file or a JSON body."}), 400
+
+    try:
+        rows = parse_roster(source, fmt)
+        first = next(rows, None)  # surface header/format errors before streaming
+    except (RosterError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    def with_first():
+        if first is not None:
+            yield first
+        yield from rows
+
+    hasher = get_password_hasher(current_app)
+    results = import_roster(office_id, with_first(), hasher)
+    return Response(stream_with_context(json.dumps(line) + "\n" for line in results),
+                    mimetype="application/x-ndjson")
+
 print("office.py loaded, blueprint name:", bp.name)
 
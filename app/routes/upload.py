@@ -1,11 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
+from sqlalchemy import select
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 import os
-import uuid
+import json
+import time
 from app import db
-from app.models.db_models import User, Office, Resource
-from app.utils.file_processor import extract_text_from_file
+from app.models.db_models import Office, Resource, ExtractionJob, UploadSession
+from app.services import extraction_queue, upload_store, chunked_upload, resource_text
+from app.services.profiler import profile_if_requested
+from app.services import acl
 
 bp = Blueprint('upload', __name__, url_prefix='/upload')
 
@@ -35,15 +39,67 @@ def get_file_type(filename):
         return 'video'
     return 'unknown'
 
+def store_resource(office_id, original_filename, content_hash, file_size, temp_path):
+    """Move a hashed temp file into the blob store and create its Resource.
+
+    Known content reuses its extracted text; otherwise an extraction job is
+    queued (progress at /upload/jobs/<job_id>/events). Commits and returns
+    (resource, job or None)."""
+    upload_dir = current_app.config['UPLOAD_FOLDER']
+    try:
+        file_path, duplicate = upload_store.acquire(
+            db.session, upload_dir, content_hash, file_size, temp_path,
+            original_filename.rsplit('.', 1)[1].lower())
+    except Exception:
+        upload_store.discard(temp_path)
+        raise
+    
+    try:
+        resource = Resource(
+            office_id=office_id,
+            file_path=file_path,
+            file_name=original_filename,
+            file_type=get_file_type(original_filename),
+            file_size=file_size,
+            content_hash=content_hash,
+            processed=False
+        )
+        db.session.add(resource)
+        db.session.flush()
+        
+        job = None
+        if not (duplicate and upload_store.reuse_extraction(db.session, resource)):
+            job = extraction_queue.enqueue(db.session, resource.id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        if not duplicate:  # the new blob's row was rolled back; don't leave its file in blobs/
+            upload_store.discard(file_path)
+        raise
+    return resource, job
+
+def upload_response(resource, job):
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'resource': {
+            'id': resource.id,
+            'filename': resource.file_name,
+            'file_type': resource.file_type,
+            'file_size': resource.file_size,
+            'processed': resource.processed
+        },
+        'job': extraction_queue.job_to_dict(job) if job else None
+    })
+
 @bp.route('/file', methods=['POST'])
 @jwt_required()
+@profile_if_requested
 def upload_file():
     try:
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
         
         # Check if user is a teacher
-        if user.role != 'teacher':
+        if acl.user_role(user_id) != 'teacher':
             return jsonify({'error': 'Only teachers can upload files'}), 403
         
         office_id = request.form.get('office_id')
@@ -51,8 +107,7 @@ def upload_file():
             return jsonify({'error': 'Office ID is required'}), 400
         
         # Verify teacher owns the office
-        office = Office.query.get(office_id)
-        if not office or office.owner_id != int(user_id):
+        if not acl.owns_office(user_id, office_id):
             return jsonify({'error': 'You can only upload to your own offices'}), 403
         
         # Check if file is present
@@ -66,58 +121,13 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'File type not allowed'}), 400
         
-        # Generate unique filename
         original_filename = secure_filename(file.filename)
-        file_extension = original_filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
         
-        # Ensure upload directory exists
-        upload_dir = current_app.config['UPLOAD_FOLDER']
-        office_upload_dir = os.path.join(upload_dir, f"office_{office_id}")
-        os.makedirs(office_upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(office_upload_dir, unique_filename)
-        file.save(file_path)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        file_type = get_file_type(original_filename)
-        
-        # Create resource record
-        resource = Resource(
-            office_id=office_id,
-            file_path=file_path,
-            file_name=original_filename,
-            file_type=file_type,
-            file_size=file_size,
-            processed=False
-        )
-        
-        db.session.add(resource)
-        db.session.commit()
-        
-        # Extract text in background (for now, do it immediately)
-        try:
-            extracted_text = extract_text_from_file(file_path, file_type)
-            if extracted_text:
-                resource.extracted_text = extracted_text
-                resource.processed = True
-                db.session.commit()
-        except Exception as e:
-            current_app.logger.error(f"Text extraction failed for {file_path}: {e}")
-            # File is saved but text extraction failed - that's ok
-        
-        return jsonify({
-            'message': 'File uploaded successfully',
-            'resource': {
-                'id': resource.id,
-                'filename': original_filename,
-                'file_type': file_type,
-                'file_size': file_size,
-                'processed': resource.processed
-            }
-        }), 201
+        # Stream to disk while hashing; identical content is stored once (see upload_store)
+        content_hash, file_size, temp_path = upload_store.save_stream(
+            file.stream, current_app.config['UPLOAD_FOLDER'])
+        resource, job = store_resource(office_id, original_filename, content_hash, file_size, temp_path)
+        return upload_response(resource, job), 201
         
     except Exception as e:
         current_app.logger.error(f"Upload error: {e}")
@@ -131,21 +141,18 @@ def get_office_files(office_id):
     user_id = get_jwt_identity()
     
     # Check if user has access to this office (owner or enrolled)
-    office = Office.query.get(office_id)
-    if not office:
-        return jsonify({'error': 'Office not found'}), 404
-    
-    # Check access
-    from app.models.db_models import Enrollment
-    has_access = (
-        office.owner_id == int(user_id) or
-        Enrollment.query.filter_by(user_id=user_id, office_id=office_id).first()
-    )
-    
-    if not has_access:
+    if not acl.can_access_office(user_id, office_id):
+        if not db.session.get(Office, office_id):
+            return jsonify({'error': 'Office not found'}), 404
         return jsonify({'error': 'Access denied'}), 403
     
-    resources = Resource.query.filter_by(office_id=office_id).all()
+    # Metadata only: the extracted text is in ResourceChunk rows (see /file/<id>/text)
+    resources = db.session.execute(
+        select(Resource.id, Resource.file_name, Resource.file_type, Resource.file_size,
+               Resource.processed, Resource.uploaded_at)
+        .where(Resource.office_id == office_id)
+        .order_by(Resource.id)
+    ).all()
     
     files_data = []
     for resource in resources:
@@ -165,9 +172,8 @@ def get_office_files(office_id):
 def delete_file(resource_id):
     """Delete a file (teacher only)"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
     
-    if user.role != 'teacher':
+    if acl.user_role(user_id) != 'teacher':
         return jsonify({'error': 'Only teachers can delete files'}), 403
     
     resource = Resource.query.get(resource_id)
@@ -175,19 +181,188 @@ def delete_file(resource_id):
         return jsonify({'error': 'File not found'}), 404
     
     # Check if teacher owns the office
-    office = Office.query.get(resource.office_id)
-    if office.owner_id != int(user_id):
+    if not acl.owns_office(user_id, resource.office_id):
         return jsonify({'error': 'You can only delete files from your own offices'}), 403
     
-    # Delete physical file
-    try:
-        if os.path.exists(resource.file_path):
-            os.remove(resource.file_path)
-    except Exception as e:
-        current_app.logger.error(f"Failed to delete file {resource.file_path}: {e}")
-    
-    # Delete database record
+    # Delete database record (and its extraction jobs) and drop its reference to the stored file
+    ExtractionJob.query.filter_by(resource_id=resource.id).delete()
+    resource_text.clear_chunks(db.session, resource.id)
+    content_hash, legacy_path = resource.content_hash, resource.file_path
+    unreferenced = upload_store.release(db.session, content_hash)
     db.session.delete(resource)
     db.session.commit()
     
-    return jsonify({'message': 'File deleted successfully'}), 200
\ No newline at end of file
+    # Physical file: the blob once no Resource uses it, or the per-upload file of a legacy resource
+    if content_hash:
+        upload_store.remove_if_unreferenced(db.session, content_hash, unreferenced)
+    else:
+        upload_store.discard(legacy_path)
+    
+    return jsonify({'message': 'File deleted successfully'}), 200
+
+@bp.route('/file/<int:resource_id>/text', methods=['GET'])
+@jwt_required()
+def get_file_text(resource_id):
+    """Extracted text as NDJSON, one page/slide/section per line, streamed from the database"""
+    from app.services.database import read_session
+    with read_session() as read_db:
+        office_id = read_db.scalar(select(Resource.office_id).where(Resource.id == resource_id))
+    if office_id is None or not acl.can_access_office(get_jwt_identity(), office_id):
+        return jsonify({'error': 'File not found'}), 404
+    app = current_app._get_current_object()
+    db.session.remove()
+
+    def lines():
+        with read_session(app) as read_db:
+            for chunk in resource_text.iter_chunks(read_db, resource_id):
+                yield json.dumps({'kind': chunk.kind, 'number': chunk.number, 'text': chunk.text}) + '\n'
+
+    return Response(lines(), mimetype='application/x-ndjson')
+
+JOB_EVENTS_POLL_SECONDS = 0.5
+JOB_EVENTS_KEEPALIVE_SECONDS = 15
+JOB_EVENTS_MAX_SECONDS = 900
+
+def _job_for_user(job_id, user_id):
+    """The job if the user can see its office, else None."""
+    from app.services.database import read_session
+    with read_session() as read_db:
+        row = read_db.execute(
+            select(ExtractionJob, Resource.office_id)
+            .join(Resource, Resource.id == ExtractionJob.resource_id)
+            .where(ExtractionJob.id == job_id)
+        ).one_or_none()
+    if row is None or not acl.can_access_office(user_id, row.office_id):
+        return None
+    return row.ExtractionJob
+
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Extraction job status"""
+    job = _job_for_user(job_id, get_jwt_identity())
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': extraction_queue.job_to_dict(job)}), 200
+
+@bp.route('/jobs/<int:job_id>/events', methods=['GET'])
+@jwt_required()
+def job_events(job_id):
+    """Server-sent events with the job's status and progress until it finishes"""
+    if _job_for_user(job_id, get_jwt_identity()) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    app = current_app._get_current_object()
+    db.session.remove()
+
+    def events():
+        from app.services.database import read_session
+        last, last_sent = None, time.monotonic()
+        deadline = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        while time.monotonic() < deadline:
+            with read_session(app) as read_db:
+                job = read_db.get(ExtractionJob, job_id)
+                state = extraction_queue.job_to_dict(job) if job else {'id': job_id, 'status': 'deleted'}
+            if state != last:
+                yield f"data: {json.dumps(state)}\n\n"
+                last, last_sent = state, time.monotonic()
+            elif time.monotonic() - last_sent > JOB_EVENTS_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            if state['status'] in ('done', 'failed', 'deleted'):
+                return
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Resumable uploads for files above MAX_CONTENT_LENGTH (see app/services/chunked_upload.py)
+
+def _session_for_user(upload_id, user_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or str(upload.user_id) != str(user_id):
+        return None
+    return upload
+
+@bp.route('/sessions', methods=['POST'])
+@jwt_required()
+def create_upload_session():
+    """Start a resumable upload: {office_id, filename, size}"""
+    user_id = get_jwt_identity()
+    if acl.user_role(user_id) != 'teacher':
+        return jsonify({'error': 'Only teachers can upload files'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    office_id, filename, size = data.get('office_id'), data.get('filename') or '', data.get('size')
+    if not office_id:
+        return jsonify({'error': 'Office ID is required'}), 400
+    if not acl.owns_office(user_id, office_id):
+        return jsonify({'error': 'You can only upload to your own offices'}), 403
+    if not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if not isinstance(size, int):
+        return jsonify({'error': 'size (bytes) is required'}), 400
+    
+    try:
+        upload = chunked_upload.create(db.session, current_app.config['UPLOAD_FOLDER'], int(user_id),
+                                       int(office_id), secure_filename(filename), size)
+    except chunked_upload.ChunkError as e:
+        return jsonify({'error': str(e)}), e.status
+    db.session.commit()
+    return jsonify({'upload': chunked_upload.to_dict(db.session, upload)}), 201
+
+@bp.route('/sessions/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload_session(upload_id):
+    """Received and missing chunk offsets, for resuming"""
+    upload = _session_for_user(upload_id, get_jwt_identity())
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify({'upload': chunked_upload.to_dict(db.session, upload)}), 200
+
+@bp.route('/sessions/<upload_id>/chunks/<int:offset>', methods=['PUT'])
+@jwt_required()
+def put_upload_chunk(upload_id, offset):
+    """Write one chunk (raw request body) at `offset`; X-Chunk-Sha256 is its hex SHA-256"""
+    upload = _session_for_user(upload_id, get_jwt_identity())
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        chunk = chunked_upload.write_chunk(db.session, upload, offset, request.stream,
+                                           request.headers.get('X-Chunk-Sha256'))
+    except chunked_upload.ChunkError as e:
+        return jsonify({'error': str(e)}), e.status
+    db.session.commit()
+    return jsonify({'chunk': chunk}), 200
+
+@bp.route('/sessions/<upload_id>/finalize', methods=['POST'])
+@jwt_required()
+@profile_if_requested
+def finalize_upload_session(upload_id):
+    """Create the Resource from a complete upload and queue its extraction"""
+    upload = _session_for_user(upload_id, get_jwt_identity())
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    try:
+        content_hash, file_size, temp_path = chunked_upload.begin_finalize(db.session, upload)
+    except chunked_upload.ChunkError as e:
+        return jsonify({'error': str(e), 'upload': chunked_upload.to_dict(db.session, upload)}), e.status
+    
+    try:
+        office_id, filename = upload.office_id, upload.file_name
+        chunked_upload.close(db.session, upload)  # store_resource moves the temp file into the blob store
+        resource, job = store_resource(office_id, filename, content_hash, file_size, temp_path)
+    except Exception as e:
+        current_app.logger.error(f"Upload finalize error: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Upload failed'}), 500
+    return upload_response(resource, job), 201
+
+@bp.route('/sessions/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def abort_upload_session(upload_id):
+    upload = _session_for_user(upload_id, get_jwt_identity())
+    if upload is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    chunked_upload.abort(db.session, upload)
+    db.session.commit()
+    return jsonify({'message': 'Upload aborted'}), 200
@@ -0,0 +1,188 @@
+# app/services/acl.py - Cached authorization facts (role, owned and enrolled offices)
+#
+# Protected routes used to load User, Office and Enrollment rows on every
+# request just to answer "is this a teacher?" and "may this user see office
+# N?". This module answers both from a per-user Access entry:
+#
+#     Access(role="teacher", owned=frozenset({3, 7}), enrolled=frozenset())
+#
+# Lookups go: JWT claims (role only) -> in-process cache -> Redis -> database.
+#
+# - Login puts the user's role in the access token (additional claim "role"),
+#   so role checks never need the cache. Roles are fixed at registration.
+# - Entries are versioned per user. invalidate(user_id) bumps the version
+#   (INCR acl:v:<id> in Redis, a counter in process) whenever a user's
+#   memberships change: office created, joined or deleted. Redis entries
+#   are keyed acl:<id>:<version>, so a stale entry is never read again and
+#   simply expires. A load that raced an invalidation is not cached.
+# - Only grants are trusted from the local cache. When a cached entry denies
+#   access it is reloaded once before answering, so an office joined through
+#   another worker is visible immediately. Invalidation is immediate in the
+#   worker that made the change; other workers see a revocation within
+#   ACL_LOCAL_TTL (5) seconds, with or without Redis. Without Redis every
+#   worker reloads from the database at that rate.
+#
+# ACL_CACHE_TTL (300) bounds Redis and local entries, ACL_CACHE_MAX (10000)
+# bounds the number of users cached per worker.
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+from flask import current_app
+from flask_jwt_extended import get_jwt
+from sqlalchemy import select
+
+from app.services import metrics
+from app.services.database import read_session
+
+logger = logging.getLogger(__name__)
+
+Access = namedtuple("Access", "role owned enrolled")
+
+
+class AccessCache:
+    def __init__(self, app, redis_client=None):
+        self.app = app
+        self.redis = redis_client
+        self.ttl = int(os.getenv("ACL_CACHE_TTL", "300"))
+        self.local_ttl = float(os.getenv("ACL_LOCAL_TTL", "5"))
+        self.max_entries = int(os.getenv("ACL_CACHE_MAX", "10000"))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # user_id -> (expires_at, Access)
+        self._versions = {}
+
+    def get(self, user_id: int, refresh: bool = False) -> Optional[Access]:
+        if not refresh:
+            with self._lock:
+                cached = self._entries.get(user_id)
+            if cached and cached[0] > time.monotonic():
+                metrics.increment("acl.lookups", result="hit")
+                return cached[1]
+        return self._load(user_id)
+
+    def _load(self, user_id: int) -> Optional[Access]:
+        with self._lock:
+            local_version = self._versions.get(user_id, 0)
+        version = self._redis_version(user_id)
+        access = self._redis_get(user_id, version) if version is not None else None
+        if access is not None:
+            metrics.increment("acl.lookups", result="redis")
+        else:
+            metrics.increment("acl.lookups", result="db")
+            access = load_access(self.app, user_id)
+            if access is not None and version is not None:
+                self._redis_set(user_id, version, access)
+        if access is not None:
+            with self._lock:
+                if self._versions.get(user_id, 0) == local_version:
+                    self._entries[user_id] = (time.monotonic() + self.local_ttl, access)
+                    self._entries.move_to_end(user_id)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return access
+
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                self._entries.pop(user_id, None)
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for user_id in user_ids:
+                    pipe.incr(f"acl:v:{user_id}")
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"ACL invalidation for {len(user_ids)} user(s) did not reach Redis: {e}")
+        metrics.increment("acl.invalidations", len(user_ids))
+
+    def _redis_version(self, user_id: int) -> Optional[int]:
+        if not self.redis:
+            return None
+        try:
+            return int(self.redis.get(f"acl:v:{user_id}") or 0)
+        except Exception:
+            return None
+
+    def _redis_get(self, user_id: int, version: int) -> Optional[Access]:
+        try:
+            raw = self.redis.get(f"acl:{user_id}:{version}")
+        except Exception:
+            return None
+        if not raw:
+            return None
+        data = json.loads(raw)
+        return Access(data["role"], frozenset(data["owned"]), frozenset(data["enrolled"]))
+
+    def _redis_set(self, user_id: int, version: int, access: Access):
+        payload = json.dumps({"role": access.role, "owned": sorted(access.owned), "enrolled": sorted(access.enrolled)})
+        try:
+            self.redis.setex(f"acl:{user_id}:{version}", self.ttl, payload)
+        except Exception:
+            pass
+
+
+def load_access(app, user_id: int) -> Optional[Access]:
+    from app.models.db_models import User, Office, Enrollment
+    with read_session(app) as read_db:
+        role = read_db.scalar(select(User.role).where(User.id == user_id))
+        if role is None:
+            return None
+        owned = read_db.scalars(select(Office.id).where(Office.owner_id == user_id)).all()
+        enrolled = read_db.scalars(select(Enrollment.office_id).where(Enrollment.user_id == user_id)).all()
+    return Access(role, frozenset(owned), frozenset(enrolled))
+
+
+def init_app(app, redis_client=None) -> AccessCache:
+    cache = AccessCache(app, redis_client)
+    app.extensions["acl"] = cache
+    return cache
+
+
+def _cache() -> AccessCache:
+    return current_app.extensions["acl"]
+
+
+def get_access(user_id, refresh: bool = False) -> Optional[Access]:
+    return _cache().get(int(user_id), refresh)
+
+
+def user_role(user_id) -> Optional[str]:
+    """The caller's role, from the token when it carries one."""
+    role = get_jwt().get("role")
+    if role:
+        return role
+    access = get_access(user_id)
+    return access.role if access else None
+
+
+def owns_office(user_id, office_id) -> bool:
+    return _check(user_id, office_id, lambda access, oid: oid in access.owned)
+
+
+def can_access_office(user_id, office_id) -> bool:
+    """Owner or enrolled student."""
+    return _check(user_id, office_id, lambda access, oid: oid in access.owned or oid in access.enrolled)
+
+
+def _check(user_id, office_id, allowed) -> bool:
+    try:
+        office_id = int(office_id)
+    except (TypeError, ValueError):
+        return False
+    access = get_access(user_id)
+    if access and allowed(access, office_id):
+        return True
+    # Denials skip the local cache (a grant may be newer than it)
+    access = get_access(user_id, refresh=True)
+    return bool(access and allowed(access, office_id))
+
+
+def invalidate(*user_ids):
+    """Call after users' memberships change (office created, joined or deleted)."""
+    _cache().invalidate(*(int(user_id) for user_id in user_ids))
@@ -0,0 +1,251 @@
+# app/services/archive.py - Compressed archive tier for idle chat sessions
+#
+# The compactor moves every hot ChatMessage of sessions that have been idle
+# for ARCHIVE_AFTER_DAYS into chat_message_archive, ARCHIVE_SEGMENT_SIZE
+# messages per row, each segment a zstd (if the zstandard package is
+# installed) or zlib compressed JSON array. A session is moved in one short
+# transaction; rows written after the compactor read the session stay hot.
+#
+# Because only whole idle sessions are archived, every archived message of a
+# session sorts before its hot messages on (timestamp, id). Readers therefore
+# get the full history by reading archived segments first, then hot rows:
+# archived_messages() decodes segments in key order and chat.py stitches the
+# two together for /chat/history, exports and the LLM context.
+#
+# Each pass is recorded in archive_run with the hot/archive table sizes, so
+# GET /admin/archive/report shows space reclaimed and hot-table growth over time.
+# Set ARCHIVE_AFTER_DAYS to run the compactor every ARCHIVE_INTERVAL_HOURS (6).
+
+import os
+import json
+import time
+import zlib
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, func, delete, text, tuple_
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SIZE = 500
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+ArchivedMessage = namedtuple("ArchivedMessage", "id session_id sender message timestamp video_url")
+
+
+# --- Segment encoding ---
+
+def compress(raw: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(payload: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Archive segment is zstd compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return zlib.decompress(payload)
+
+
+def encode_segment(rows: List[Any], codec: str) -> Tuple[bytes, int]:
+    """Compressed payload and uncompressed size for ChatMessage-like rows."""
+    raw = json.dumps(
+        [[r.id, r.sender, r.message, r.timestamp.isoformat(), r.video_url] for r in rows],
+        separators=(",", ":"), ensure_ascii=False,
+    ).encode("utf-8")
+    return compress(raw, codec), len(raw)
+
+
+def decode_segment(segment) -> List[ArchivedMessage]:
+    raw = decompress(segment.payload, segment.codec)
+    return [ArchivedMessage(m[0], segment.session_id, m[1], m[2], datetime.fromisoformat(m[3]), m[4])
+            for m in json.loads(raw)]
+
+
+# --- Reads ---
+
+def archived_messages(read_db, session_id: int, before=None, after=None,
+                      descending: bool = False) -> Iterator[ArchivedMessage]:
+    """Archived messages of a session in (timestamp, id) order, optionally
+    strictly before/after a (timestamp, id) key. Segments are decoded lazily."""
+    from app.models.db_models import ChatMessageArchive as Segment
+
+    query = select(Segment).where(Segment.session_id == session_id)
+    if before:
+        query = query.where(tuple_(Segment.first_timestamp, Segment.first_message_id) < tuple_(*before))
+    if after:
+        query = query.where(tuple_(Segment.last_timestamp, Segment.last_message_id) > tuple_(*after))
+    if descending:
+        query = query.order_by(Segment.first_timestamp.desc(), Segment.first_message_id.desc())
+    else:
+        query = query.order_by(Segment.first_timestamp, Segment.first_message_id)
+
+    for segment in read_db.scalars(query):
+        messages = decode_segment(segment)
+        if descending:
+            messages.reverse()
+        for m in messages:
+            key = (m.timestamp, m.id)
+            if (before and key >= tuple(before)) or (after and key <= tuple(after)):
+                continue
+            yield m
+
+
+def archived_count(read_db, session_id: int) -> int:
+    from app.models.db_models import ChatMessageArchive as Segment
+    return read_db.execute(
+        select(func.coalesce(func.sum(Segment.message_count), 0)).where(Segment.session_id == session_id)
+    ).scalar()
+
+
+# --- Compaction ---
+
+def idle_sessions(session, cutoff: datetime, limit: Optional[int] = None) -> List[int]:
+    from app.models.db_models import ChatMessage
+    query = (select(ChatMessage.session_id)
+             .group_by(ChatMessage.session_id)
+             .having(func.max(ChatMessage.timestamp) < cutoff))
+    if limit:
+        query = query.limit(limit)
+    return list(session.scalars(query))
+
+
+def archive_session(session, session_id: int, cutoff: datetime, segment_size: int, codec: str) -> Dict[str, int]:
+    """Move one idle session's hot messages into archive segments (caller commits)."""
+    from app.models.db_models import ChatMessage, ChatMessageArchive as Segment
+
+    rows = session.execute(
+        select(ChatMessage).where(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.timestamp, ChatMessage.id)
+    ).scalars().all()
+    if not rows or rows[-1].timestamp >= cutoff:
+        return {"messages": 0, "raw_bytes": 0, "compressed_bytes": 0}  # became active again
+
+    raw_total = compressed_total = 0
+    for start in range(0, len(rows), segment_size):
+        chunk = rows[start:start + segment_size]
+        payload, raw_size = encode_segment(chunk, codec)
+        session.add(Segment(
+            session_id=session_id,
+            first_message_id=chunk[0].id, last_message_id=chunk[-1].id,
+            first_timestamp=chunk[0].timestamp, last_timestamp=chunk[-1].timestamp,
+            message_count=len(chunk), codec=codec, raw_bytes=raw_size, payload=payload,
+        ))
+        # Delete exactly the archived ids; anything written meanwhile stays hot
+        session.execute(delete(ChatMessage).where(ChatMessage.id.in_([r.id for r in chunk])),
+                        execution_options={"synchronize_session": False})
+        raw_total += raw_size
+        compressed_total += len(payload)
+    session.expunge_all()
+    return {"messages": len(rows), "raw_bytes": raw_total, "compressed_bytes": compressed_total}
+
+
+def table_sizes(session) -> Dict[str, Optional[int]]:
+    """Bytes used by the hot and archive tables including their indexes, when the backend can tell."""
+    dialect = session.get_bind().dialect.name
+    sizes = {"hot_bytes": None, "archive_bytes": None}
+    try:
+        if dialect == "sqlite":
+            rows = session.execute(text(
+                "SELECT CASE WHEN tbl_name = 'chat_message' THEN 'hot_bytes' ELSE 'archive_bytes' END, SUM(pgsize) "
+                "FROM dbstat JOIN sqlite_master ON dbstat.name = sqlite_master.name "
+                "WHERE tbl_name IN ('chat_message', 'chat_message_archive') GROUP BY 1"
+            )).all()
+        elif dialect == "postgresql":
+            rows = [("hot_bytes", session.execute(text("SELECT pg_total_relation_size('chat_message')")).scalar()),
+                    ("archive_bytes", session.execute(text("SELECT pg_total_relation_size('chat_message_archive')")).scalar())]
+        else:
+            rows = []
+        sizes.update({name: int(size) for name, size in rows if size is not None})
+    except Exception as e:  # dbstat is a compile-time SQLite option
+        session.rollback()
+        logger.debug(f"Table sizes unavailable: {e}")
+    return sizes
+
+
+def compact(app, idle_days: float, segment_size: int = DEFAULT_SEGMENT_SIZE,
+            max_sessions: Optional[int] = None, codec: Optional[str] = None) -> Dict[str, Any]:
+    """Archive every session idle for idle_days. Returns (and records) the run's stats."""
+    from app import db
+    from app.models.db_models import ChatMessage, ArchiveRun
+
+    codec = codec or ("zstd" if ZSTD_AVAILABLE else "zlib")
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(days=idle_days)
+    totals = {"sessions": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    with app.app_context():
+        for session_id in idle_sessions(db.session, cutoff, max_sessions):
+            try:
+                moved = archive_session(db.session, session_id, cutoff, segment_size, codec)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Archiving session {session_id} failed: {e}")
+                continue
+            if moved["messages"]:
+                totals["sessions"] += 1
+                for key in ("messages", "raw_bytes", "compressed_bytes"):
+                    totals[key] += moved[key]
+
+        run = ArchiveRun(
+            idle_days=idle_days, **totals,
+            hot_rows=db.session.execute(select(func.count(ChatMessage.id))).scalar(),
+            duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            **table_sizes(db.session),
+        )
+        db.session.add(run)
+        db.session.commit()
+        result = run_to_dict(run)
+        db.session.remove()
+    logger.info(f"🗜️ Archived {totals['messages']} messages from {totals['sessions']} sessions "
+                f"({totals['raw_bytes']} -> {totals['compressed_bytes']} bytes, {codec})")
+    return result
+
+
+def run_to_dict(run) -> Dict[str, Any]:
+    return {
+        "ran_at": run.ran_at.isoformat() if run.ran_at else None,
+        "idle_days": run.idle_days,
+        "sessions": run.sessions,
+        "messages": run.messages,
+        "raw_bytes": run.raw_bytes,
+        "compressed_bytes": run.compressed_bytes,
+        "compression_ratio": round(run.raw_bytes / run.compressed_bytes, 2) if run.compressed_bytes else None,
+        "hot_rows": run.hot_rows,
+        "hot_bytes": run.hot_bytes,
+        "archive_bytes": run.archive_bytes,
+        "duration_ms": run.duration_ms,
+    }
+
+
+def start_compactor(app):
+    """Run compact() periodically in a daemon thread when ARCHIVE_AFTER_DAYS is set."""
+    idle_days = os.getenv("ARCHIVE_AFTER_DAYS")
+    if not idle_days:
+        return None
+    interval = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "6")) * 3600
+    segment_size = int(os.getenv("ARCHIVE_SEGMENT_SIZE", str(DEFAULT_SEGMENT_SIZE)))
+
+    def run():
+        while True:
+            try:
+                compact(app, float(idle_days), segment_size)
+            except Exception as e:
+                logger.error(f"Archive compactor failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="archive-compactor", daemon=True)
+    thread.start()
+    return thread
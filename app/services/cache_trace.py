@@ -0,0 +1,77 @@
+# app/services/cache_trace.py - Sampled cache access logging
+#
+# Set CACHE_TRACE_FILE=/path/cache_trace.log to log every Redis cache access
+# made by chat.py (TTS audio, LLM responses, chat history). Keys are hashed,
+# so the log holds no user content. Lines are space separated:
+#
+#   <ts_ms> <namespace> <key_hash> <op> <size_bytes> <ttl_s> <hit>
+#
+# op is get/set/del; hit is 1/0 for gets and - otherwise.
+#
+# CACHE_TRACE_SAMPLE_RATE (0-1, default 1) samples by key hash rather than by
+# request, so every access to a sampled key is kept and reuse distances stay
+# intact. benchmarks/cache_sim.py scales capacities back up by the same rate.
+
+import os
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_HASH_SPACE = 1 << 32
+_FLUSH_EVERY = 200
+
+
+class CacheTraceLog:
+    def __init__(self, path: str, sample_rate: float = 1.0):
+        self.path = path
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self._threshold = int(self.sample_rate * _HASH_SPACE)
+        self._lock = threading.Lock()
+        self._buffer = []
+
+    def _key_hash(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "big")
+        return value, digest.hex()
+
+    def record(self, namespace: str, key: str, op: str, size: int = 0, ttl: int = 0, hit=None):
+        value, key_hash = self._key_hash(key)
+        if (value & (_HASH_SPACE - 1)) >= self._threshold:
+            return
+        hit_flag = "-" if hit is None else ("1" if hit else "0")
+        line = f"{int(time.time() * 1000)} {namespace} {key_hash} {op} {int(size)} {int(ttl)} {hit_flag}\n"
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= _FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        try:
+            with open(self.path, "a", encoding="ascii") as f:
+                f.writelines(self._buffer)
+        except OSError as e:
+            logger.warning(f"Failed to write cache trace: {e}")
+        self._buffer = []
+
+
+_trace_log = None
+if os.getenv("CACHE_TRACE_FILE"):
+    _trace_log = CacheTraceLog(os.getenv("CACHE_TRACE_FILE"), float(os.getenv("CACHE_TRACE_SAMPLE_RATE", "1.0")))
+    import atexit
+    atexit.register(_trace_log.flush)
+    logger.info(f"📒 Cache access tracing enabled ({_trace_log.sample_rate:.0%} of keys) -> {_trace_log.path}")
+
+
+def record_cache_access(namespace: str, key: str, op: str, size: int = 0, ttl: int = 0, hit=None):
+    """Log one cache access if tracing is enabled (cheap no-op otherwise)."""
+    if _trace_log is not None:
+        _trace_log.record(namespace, key, op, size, ttl, hit)
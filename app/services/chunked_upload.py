@@ -0,0 +1,204 @@
+# app/services/chunked_upload.py - Resumable uploads in fixed-size chunks
+#
+# /upload/file takes the whole file in one request, capped by
+# MAX_CONTENT_LENGTH (16 MB), and a dropped connection starts over. Lecture
+# videos go through upload sessions instead:
+#
+#   POST   /upload/sessions                     {office_id, filename, size}
+#   GET    /upload/sessions/<id>                received chunk offsets, to resume
+#   PUT    /upload/sessions/<id>/chunks/<offset> raw bytes, X-Chunk-Sha256 header
+#   POST   /upload/sessions/<id>/finalize       creates the Resource
+#   DELETE /upload/sessions/<id>                abort
+#
+# create() preallocates a temp file of the full size. Chunks start at
+# multiples of UPLOAD_CHUNK_SIZE (8 MB), so they can arrive in any order and
+# in parallel: each request writes its own byte range straight from the
+# request stream, verifying the hex SHA-256 the client sent. A chunk is only
+# recorded in upload_chunk once its size and checksum match; re-sending a
+# chunk overwrites it, and a failed re-send (wrong size or checksum, dropped
+# connection) un-records it.
+#
+# begin_finalize() hashes the assembled file from disk in COPY_CHUNK pieces (the
+# content hash cannot be built from out-of-order chunks) and hands the temp
+# file to upload_store.acquire(), which renames it into the blob store, so the
+# file is never held in memory or copied.
+#
+# UPLOAD_MAX_BYTES (2000 MB) caps a session; sessions not finalized within
+# UPLOAD_SESSION_TTL_HOURS (24) are deleted with their temp file whenever a
+# new session is created.
+
+import os
+import uuid
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import select, update, delete
+
+from app.services import metrics, upload_store
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2000 * 1024 * 1024)))
+SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+
+class ChunkError(ValueError):
+    """A request the upload session cannot accept; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def chunk_count(upload) -> int:
+    return -(-upload.total_size // upload.chunk_size)
+
+
+def create(session, upload_dir: str, user_id: int, office_id: int, file_name: str, total_size: int):
+    """Start a session with a preallocated temp file."""
+    from app.models.db_models import UploadSession
+
+    if total_size <= 0 or total_size > MAX_UPLOAD_BYTES:
+        raise ChunkError(f"size must be between 1 and {MAX_UPLOAD_BYTES} bytes")
+    expire(session)
+    upload_id = uuid.uuid4().hex
+    tmp_dir = os.path.join(upload_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    temp_path = os.path.join(tmp_dir, f"{upload_id}.part")
+    with open(temp_path, "wb") as f:
+        f.truncate(total_size)
+    now = datetime.utcnow()
+    upload = UploadSession(id=upload_id, user_id=user_id, office_id=office_id, file_name=file_name,
+                           total_size=total_size, chunk_size=CHUNK_SIZE, temp_path=temp_path, status="open",
+                           created_at=now, expires_at=now + timedelta(hours=SESSION_TTL_HOURS))
+    session.add(upload)
+    metrics.increment("chunked_upload.sessions")
+    return upload
+
+
+def expire(session) -> int:
+    """Delete sessions past their expiry and their temp files."""
+    from app.models.db_models import UploadSession, UploadChunk
+
+    expired = session.execute(select(UploadSession.id, UploadSession.temp_path)
+                              .where(UploadSession.expires_at < datetime.utcnow())).all()
+    if not expired:
+        return 0
+    ids = [row.id for row in expired]
+    session.execute(delete(UploadChunk).where(UploadChunk.upload_id.in_(ids)))
+    session.execute(delete(UploadSession).where(UploadSession.id.in_(ids)))
+    for row in expired:
+        upload_store.discard(row.temp_path)
+    logger.info(f"Expired {len(ids)} upload sessions")
+    return len(ids)
+
+
+def close(session, upload):
+    """Delete the session's rows; its temp file is left to the caller."""
+    from app.models.db_models import UploadChunk
+
+    session.execute(delete(UploadChunk).where(UploadChunk.upload_id == upload.id))
+    session.delete(upload)
+
+
+def abort(session, upload):
+    close(session, upload)
+    upload_store.discard(upload.temp_path)
+
+
+def write_chunk(session, upload, offset: int, stream, checksum: str) -> Dict[str, Any]:
+    """Write one chunk from `stream` at `offset` and record it if its SHA-256 matches `checksum`."""
+    from app.models.db_models import UploadChunk
+
+    if upload.status != "open":
+        raise ChunkError("Upload is being finalized", 409)
+    if offset < 0 or offset >= upload.total_size or offset % upload.chunk_size:
+        raise ChunkError(f"offset must be a multiple of {upload.chunk_size} below {upload.total_size}")
+    checksum = (checksum or "").strip().lower()
+    if len(checksum) != 64:
+        raise ChunkError("X-Chunk-Sha256 header with the chunk's hex SHA-256 is required")
+    expected = min(upload.chunk_size, upload.total_size - offset)
+
+    digest, size = hashlib.sha256(), 0
+    try:
+        with open(upload.temp_path, "r+b") as f:
+            f.seek(offset)
+            while size <= expected:
+                data = stream.read(min(upload_store.COPY_CHUNK, expected + 1 - size))
+                if not data:
+                    break
+                size += len(data)
+                if size > expected:
+                    break
+                digest.update(data)
+                f.write(data)
+        if size != expected:
+            raise ChunkError(f"Chunk at offset {offset} must be {expected} bytes")
+        if digest.hexdigest() != checksum:
+            metrics.increment("chunked_upload.checksum_mismatches")
+            raise ChunkError(f"Checksum mismatch for chunk at offset {offset}", 422)
+    except Exception:
+        # Bytes were written over the range, so it no longer holds a previously
+        # accepted copy of this chunk (wrong size, bad checksum or a dropped stream)
+        session.execute(delete(UploadChunk).where(UploadChunk.upload_id == upload.id, UploadChunk.offset == offset))
+        session.commit()
+        raise
+
+    session.merge(UploadChunk(upload_id=upload.id, offset=offset, size=size, sha256=checksum,
+                              received_at=datetime.utcnow()))
+    metrics.increment("chunked_upload.bytes", size)
+    return {"offset": offset, "size": size}
+
+
+def received_offsets(session, upload) -> List[int]:
+    from app.models.db_models import UploadChunk
+
+    return list(session.scalars(select(UploadChunk.offset).where(UploadChunk.upload_id == upload.id)
+                                .order_by(UploadChunk.offset)))
+
+
+def to_dict(session, upload) -> Dict[str, Any]:
+    received = received_offsets(session, upload)
+    return {
+        "id": upload.id,
+        "filename": upload.file_name,
+        "size": upload.total_size,
+        "chunk_size": upload.chunk_size,
+        "chunk_count": chunk_count(upload),
+        "received": received,
+        "missing": sorted(set(range(0, upload.total_size, upload.chunk_size)) - set(received)),
+        "status": upload.status,
+        "expires_at": upload.expires_at.isoformat(),
+    }
+
+
+def begin_finalize(session, upload) -> Tuple[str, int, str]:
+    """Claim the session for finalizing and hash the assembled file.
+
+    Returns (sha256, size, temp_path) for upload_store.acquire(). Raises
+    ChunkError (and leaves the session open) while chunks are missing."""
+    from app.models.db_models import UploadSession
+
+    claimed = session.execute(update(UploadSession)
+                              .where(UploadSession.id == upload.id, UploadSession.status == "open")
+                              .values(status="finalizing")).rowcount
+    session.commit()
+    if not claimed:
+        raise ChunkError("Upload is already being finalized", 409)
+    try:
+        missing = len(range(0, upload.total_size, upload.chunk_size)) - len(received_offsets(session, upload))
+        if missing:
+            raise ChunkError(f"{missing} chunks have not been received", 409)
+        digest = hashlib.sha256()
+        with open(upload.temp_path, "rb") as f:
+            for data in iter(lambda: f.read(upload_store.COPY_CHUNK), b""):
+                digest.update(data)
+    except Exception:
+        session.rollback()
+        session.execute(update(UploadSession).where(UploadSession.id == upload.id).values(status="open"))
+        session.commit()
+        raise
+    return digest.hexdigest(), upload.total_size, upload.temp_path
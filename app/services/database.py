@@ -0,0 +1,141 @@
+# app/services/database.py - Engine configuration for SQLite (WAL) and PostgreSQL
+#
+# create_app() calls engine_options() for SQLALCHEMY_ENGINE_OPTIONS and then
+# init_app() once Flask-SQLAlchemy has built its engine.
+#
+# SQLite (file databases):
+#   SQLITE_JOURNAL_MODE=WAL       readers never block on the writer (DELETE = old behaviour)
+#   SQLITE_SYNCHRONOUS=NORMAL     with WAL, durable across app crashes, fsyncs at checkpoints only
+#   SQLITE_CACHE_KB=32768         page cache per connection
+#   SQLITE_MMAP_MB=128            memory-mapped reads
+#   SQLITE_BUSY_TIMEOUT_MS=5000   wait for the write lock instead of failing with "database is locked"
+#
+# PostgreSQL (DATABASE_URL=postgresql://...; needs psycopg2):
+#   DB_POOL_SIZE=10, DB_MAX_OVERFLOW=20, DB_POOL_TIMEOUT=10, DB_POOL_RECYCLE=1800
+#
+# Reads: read_session() opens a session on a separate read engine. For SQLite
+# that is a second pool on the same file with PRAGMA query_only, so history and
+# listing reads have their own connections and, under WAL, read the last
+# committed snapshot while the message writer holds the write lock. Set
+# DATABASE_READ_URL to send reads to a Postgres replica. In-memory SQLite
+# (tests) has a single connection, so reads fall back to the primary engine.
+# DATABASE_SEPARATE_READS=0 also keeps reads on the primary engine.
+
+import os
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_url(url: str) -> str:
+    """Accept the postgres:// scheme some hosts still hand out."""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def is_sqlite_file(url) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def sqlite_pragmas(read_only: bool = False) -> Dict[str, str]:
+    pragmas = {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "cache_size": str(-int(os.getenv("SQLITE_CACHE_KB", "32768"))),
+        "mmap_size": str(int(os.getenv("SQLITE_MMAP_MB", "128")) * 1024 * 1024),
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+        "temp_store": "MEMORY",
+    }
+    if read_only:
+        del pragmas["journal_mode"]  # persistent per file; the primary engine sets it
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def _apply_sqlite_pragmas(engine, read_only: bool = False):
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URL."""
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        if not is_sqlite_file(url):
+            return {}
+        return {
+            "connect_args": {"check_same_thread": False,
+                             "timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")) / 1000.0},
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        }
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+
+def init_app(app, db):
+    """Apply per-connection settings to the primary engine and build the read engine."""
+    with app.app_context():
+        engine = db.engine
+    # Flask-SQLAlchemy resolves relative SQLite paths against the instance
+    # folder, so take the URL from the engine rather than from the config.
+    url = engine.url
+    if is_sqlite_file(url):
+        _apply_sqlite_pragmas(engine)
+
+    read_url = app.config.get("DATABASE_READ_URL")
+    if os.getenv("DATABASE_SEPARATE_READS", "1") == "0":
+        read_engine = engine
+    elif read_url:
+        read_engine = create_engine(read_url, **engine_options(read_url))
+        if is_sqlite_file(read_url):
+            _apply_sqlite_pragmas(read_engine, read_only=True)
+    elif is_sqlite_file(url):
+        read_engine = create_engine(url, **engine_options(url))
+        _apply_sqlite_pragmas(read_engine, read_only=True)
+    else:
+        read_engine = engine  # Postgres primary without a replica, or in-memory SQLite
+    app.extensions["read_engine"] = read_engine
+    logger.info(f"Database: {engine.url.get_backend_name()} "
+                f"(reads on {'a separate engine' if read_engine is not engine else 'the primary engine'})")
+
+
+def get_read_engine(app):
+    engine = app.extensions.get("read_engine")
+    if engine is None:
+        from app import db
+        with app.app_context():
+            engine = db.engine
+    return engine
+
+
+@contextmanager
+def read_session(app=None):
+    """Short-lived session on the read engine. Use it for queries only."""
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+    session = Session(bind=get_read_engine(app), expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,417 @@
+# app/services/extraction_queue.py - Durable text-extraction jobs run in worker processes
+#
+# upload_file stores the file, inserts a Resource and an ExtractionJob in one
+# transaction and returns at once with processed=False. Extraction happens
+# here, never on a request thread:
+#
+#   extraction_job (the app database) is the durable queue. A worker claims
+#   the oldest runnable job with a conditional UPDATE ... WHERE status='queued',
+#   so several web workers or standalone runners can share the table.
+#
+#   Every ExtractionWorker thread owns one persistent, non-daemonic child
+#   process (spawn context). The child runs the extractor and reports progress
+#   and the result over a pipe. The child is non-daemonic so extractors may
+#   start their own process pools. The parent enforces:
+#     EXTRACTION_TIMEOUT=300      seconds per job; the child is killed and replaced
+#     EXTRACTION_MEMORY_MB=2048   address-space limit (RLIMIT_AS) of each child
+#     EXTRACTION_MAX_ATTEMPTS=3   attempts before a job is marked failed
+#     EXTRACTION_RETRY_BACKOFF=10 seconds, doubled per attempt
+#   A segfault, MemoryError, os._exit or timeout in an extractor only costs
+#   that child; the job is retried with backoff and the child restarted.
+#
+#   The default extractor, file_processor.iter_text_segments, is a generator:
+#   the child sends every page/slide/section over the pipe as soon as it is
+#   extracted (PDF page ranges run on a pool of PDF_EXTRACT_WORKERS processes
+#   inside the child), so neither side builds the text by concatenation. The
+#   worker stores them as resource_chunk rows CHUNK_WRITE_BATCH at a time
+#   while the job runs (resource_text.write_chunks). A finished job marks its
+#   Resource processed even when no text came out (job message "No text
+#   extracted"), so it does not look pending forever.
+#
+#   Running jobs send a heartbeat with their progress. A job whose heartbeat
+#   is older than EXTRACTION_TIMEOUT + LEASE_GRACE (its worker died with the
+#   web process) is put back in the queue by the next claim.
+#
+# A claimed job whose file content has meanwhile been extracted for another
+# Resource copies that text instead (upload_store.reuse_extraction).
+#
+# EXTRACTION_WORKERS=2 threads/children are started by create_app (0 disables
+# them in the web process). `python -m app.services.extraction_queue` runs
+# the same workers standalone. GET /upload/jobs/<id>/events streams progress.
+
+import os
+import sys
+import time
+import signal
+import atexit
+import logging
+import importlib
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select, update, func
+
+from app.services import metrics, upload_store, resource_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXTRACTOR = "app.utils.file_processor:iter_text_segments"
+LEASE_GRACE_SECONDS = 60
+PROGRESS_WRITE_INTERVAL = 0.5
+POLL_INTERVAL = 1.0
+CHUNK_WRITE_BATCH = 32
+
+
+def _resolve(path: str) -> Callable:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def _child_main(conn, extractor_path: str, memory_mb: int):
+    """Worker process: run extraction requests from the pipe until told to stop."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # shutdown comes from the parent
+    extractor = _resolve(extractor_path)
+    if memory_mb:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break  # parent went away
+        if request is None:
+            break
+        job_id, file_path, file_type = request
+
+        def progress(fraction: float, message: Optional[str] = None):
+            conn.send(("progress", job_id, float(fraction), message))
+
+        before = metrics.snapshot_counters()
+        try:
+            result = extractor(file_path, file_type, progress=progress)
+            if result is not None and not isinstance(result, str):
+                # A segment generator: stream each page/slide/section as it is extracted
+                for segment in result:
+                    conn.send(("segment", job_id, tuple(segment)))
+                result = None
+            conn.send(("metrics", job_id, metrics.counters_since(before)))  # e.g. OCR latency
+            conn.send(("done", job_id, result))
+        except BaseException as e:  # MemoryError included; keep serving
+            conn.send(("error", job_id, f"{type(e).__name__}: {e}"))
+
+
+class WorkerProcess:
+    """One extraction child process, restarted after a crash or timeout."""
+
+    def __init__(self, extractor: str, memory_mb: int):
+        self.extractor = extractor
+        self.memory_mb = memory_mb
+        self.ctx = multiprocessing.get_context("spawn")
+        self.proc = None
+        self.conn = None
+
+    def _start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.proc = self.ctx.Process(target=_child_main, args=(child_conn, self.extractor, self.memory_mb),
+                                     name="extraction-worker", daemon=False)
+        self.proc.start()
+        child_conn.close()
+        metrics.increment("extraction.worker_starts")
+
+    def _kill(self):
+        if self.proc is not None and self.proc.is_alive():
+            self.proc.kill()
+        if self.proc is not None:
+            self.proc.join(5)
+        if self.conn is not None:
+            self.conn.close()
+        self.proc = self.conn = None
+
+    def run(self, job_id: int, file_path: str, file_type: str, timeout: float,
+            on_progress: Callable[[float, Optional[str]], None],
+            on_segment: Optional[Callable[[tuple], None]] = None) -> Tuple[bool, Any]:
+        """(True, text) on success, (False, error message) otherwise. A segment
+        generator's (kind, number, text) tuples go to on_segment and the text is None."""
+        if self.proc is None or not self.proc.is_alive():
+            self._start()
+        self.conn.send((job_id, file_path, file_type))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._kill()
+                return False, f"Timed out after {timeout:.0f}s"
+            try:
+                ready = self.conn.poll(min(remaining, 1.0))
+                message = self.conn.recv() if ready else None
+            except (EOFError, OSError):
+                message, ready = None, False
+                self.proc.join(1)
+            if message is None:
+                if not self.proc.is_alive():
+                    code = self.proc.exitcode
+                    self._kill()
+                    return False, f"Extractor process died (exit code {code})"
+                continue
+            kind, _, *payload = message
+            if kind == "progress":
+                on_progress(*payload)
+            elif kind == "metrics":
+                metrics.add_counters(payload[0])
+            elif kind == "segment":
+                if on_segment is not None:
+                    on_segment(payload[0])
+            elif kind == "done":
+                return True, payload[0]
+            else:
+                return False, payload[0]
+
+    def stop(self):
+        if self.proc is not None and self.proc.is_alive():
+            try:
+                self.conn.send(None)
+                self.proc.join(5)
+            except (OSError, BrokenPipeError):
+                pass
+        self._kill()
+
+
+# --- Queue operations (call inside an app context) ---
+
+def enqueue(session, resource_id: int, max_attempts: Optional[int] = None):
+    """Add a job for the resource to the caller's transaction."""
+    from app.models.db_models import ExtractionJob
+    job = ExtractionJob(resource_id=resource_id, status="queued",
+                        max_attempts=max_attempts or int(os.getenv("EXTRACTION_MAX_ATTEMPTS", "3")))
+    session.add(job)
+    metrics.increment("extraction.jobs", status="queued")
+    return job
+
+
+def requeue_expired(session, lease_seconds: float) -> int:
+    """Put back running jobs whose worker stopped sending heartbeats."""
+    from app.models.db_models import ExtractionJob
+    expired = datetime.utcnow() - timedelta(seconds=lease_seconds)
+    stale = (ExtractionJob.status == "running") & (ExtractionJob.heartbeat_at < expired)
+    failed = session.execute(update(ExtractionJob).where(stale, ExtractionJob.attempts >= ExtractionJob.max_attempts)
+                             .values(status="failed", error="Worker lost", finished_at=datetime.utcnow())).rowcount
+    requeued = session.execute(update(ExtractionJob).where(stale)
+                               .values(status="queued", run_after=datetime.utcnow(), worker=None)).rowcount
+    if failed or requeued:
+        session.commit()
+        logger.warning(f"Extraction leases expired: {requeued} requeued, {failed} failed")
+    return requeued
+
+
+def claim(session, worker: str) -> Optional[Dict[str, Any]]:
+    """Atomically take the oldest runnable job. Returns the job and its file, or None."""
+    from app.models.db_models import ExtractionJob, Resource
+    now = datetime.utcnow()
+    for _ in range(5):  # lost races with other workers
+        job_id = session.scalar(select(ExtractionJob.id)
+                                .where(ExtractionJob.status == "queued", ExtractionJob.run_after <= now)
+                                .order_by(ExtractionJob.id).limit(1))
+        if job_id is None:
+            return None
+        claimed = session.execute(update(ExtractionJob)
+                                  .where(ExtractionJob.id == job_id, ExtractionJob.status == "queued")
+                                  .values(status="running", worker=worker, attempts=ExtractionJob.attempts + 1,
+                                          started_at=now, heartbeat_at=now, progress=0.0, message=None)).rowcount
+        session.commit()
+        if claimed:
+            row = session.execute(select(ExtractionJob.id, ExtractionJob.attempts, ExtractionJob.max_attempts,
+                                         Resource.id.label("resource_id"), Resource.file_path, Resource.file_type)
+                                  .join(Resource, Resource.id == ExtractionJob.resource_id)
+                                  .where(ExtractionJob.id == job_id)).one_or_none()
+            if row is None:  # resource deleted meanwhile
+                session.execute(update(ExtractionJob).where(ExtractionJob.id == job_id)
+                                .values(status="failed", error="Resource deleted", finished_at=now))
+                session.commit()
+                continue
+            return dict(row._mapping)
+    return None
+
+
+def job_to_dict(job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "resource_id": job.resource_id,
+        "status": job.status,
+        "progress": round(job.progress or 0.0, 3),
+        "message": job.message,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class ExtractionWorker:
+    """Claims jobs and runs them in its own child process."""
+
+    def __init__(self, app, name: str, extractor: str = DEFAULT_EXTRACTOR):
+        self.app = app
+        self.name = name
+        self.timeout = float(os.getenv("EXTRACTION_TIMEOUT", "300"))
+        self.backoff = float(os.getenv("EXTRACTION_RETRY_BACKOFF", "10"))
+        self.process = WorkerProcess(extractor, int(os.getenv("EXTRACTION_MEMORY_MB", "2048")))
+        self._stop = threading.Event()
+
+    def run_once(self) -> bool:
+        """Process one job if there is one. Returns False when the queue was empty."""
+        from app import db
+        from app.models.db_models import ExtractionJob, Resource
+
+        with self.app.app_context():
+            requeue_expired(db.session, self.timeout + LEASE_GRACE_SECONDS)
+            job = claim(db.session, self.name)
+            db.session.remove()
+        if job is None:
+            return False
+
+        with self.app.app_context():
+            # A copy of the same file may have finished extracting since this job was queued
+            resource = db.session.get(Resource, job["resource_id"])
+            if resource is not None and upload_store.reuse_extraction(db.session, resource):
+                db.session.execute(update(ExtractionJob).where(ExtractionJob.id == job["id"])
+                                   .values(status="done", progress=1.0, message="Reused", error=None,
+                                           finished_at=datetime.utcnow()))
+                db.session.commit()
+                db.session.remove()
+                metrics.increment("extraction.jobs", status="reused")
+                return True
+            db.session.remove()
+
+        last_write = [0.0]
+
+        def on_progress(fraction: float, message: Optional[str]):
+            if time.monotonic() - last_write[0] < PROGRESS_WRITE_INTERVAL:
+                return
+            last_write[0] = time.monotonic()
+            with self.app.app_context():
+                db.session.execute(update(ExtractionJob).where(ExtractionJob.id == job["id"])
+                                   .values(progress=min(max(fraction, 0.0), 1.0), message=(message or "")[:200] or None,
+                                           heartbeat_at=datetime.utcnow()))
+                db.session.commit()
+                db.session.remove()
+
+        # Segments are stored as they arrive, CHUNK_WRITE_BATCH per transaction
+        with self.app.app_context():
+            resource_text.clear_chunks(db.session, job["resource_id"])  # left by an earlier attempt
+            db.session.commit()
+            db.session.remove()
+        pending, stored = [], {"position": 0, "chars": 0, "error": None}
+
+        def flush():
+            if not pending or stored["error"]:
+                pending.clear()
+                return
+            try:
+                with self.app.app_context():
+                    stored["chars"] += resource_text.write_chunks(db.session, job["resource_id"], pending,
+                                                                  stored["position"])
+                    db.session.commit()
+                    db.session.remove()
+            except Exception as e:
+                stored["error"] = f"Storing text failed: {e}"
+                logger.error(f"Extraction job {job['id']}: {stored['error']}")
+            stored["position"] += len(pending)
+            pending.clear()
+
+        def on_segment(segment: tuple):
+            pending.append(segment)
+            if len(pending) >= CHUNK_WRITE_BATCH:
+                flush()
+
+        started = time.perf_counter()
+        ok, result = self.process.run(job["id"], job["file_path"], job["file_type"], self.timeout, on_progress,
+                                      on_segment)
+        metrics.increment("extraction.seconds", time.perf_counter() - started, file_type=job["file_type"])
+        if ok:
+            if isinstance(result, str):  # extractors that return one string store it as one chunk
+                pending.append(("document", 1, result))
+            flush()
+            if stored["error"]:
+                ok, result = False, stored["error"]
+
+        with self.app.app_context():
+            now = datetime.utcnow()
+            resource = db.session.get(Resource, job["resource_id"])
+            if not ok or resource is None:
+                resource_text.clear_chunks(db.session, job["resource_id"])
+            if ok:
+                if resource is not None:
+                    resource.processed = True
+                values = {"status": "done", "progress": 1.0, "message": None if stored["chars"] else "No text extracted",
+                          "error": None, "finished_at": now}
+            elif job["attempts"] < job["max_attempts"]:
+                delay = self.backoff * 2 ** (job["attempts"] - 1)
+                values = {"status": "queued", "error": result, "worker": None,
+                          "run_after": now + timedelta(seconds=delay)}
+                logger.warning(f"Extraction job {job['id']} attempt {job['attempts']} failed ({result}); retry in {delay:.0f}s")
+            else:
+                values = {"status": "failed", "error": result, "finished_at": now}
+                logger.error(f"Extraction job {job['id']} failed after {job['attempts']} attempts: {result}")
+            db.session.execute(update(ExtractionJob).where(ExtractionJob.id == job["id"]).values(**values))
+            db.session.commit()
+            db.session.remove()
+        metrics.increment("extraction.jobs", status=values["status"] if values["status"] != "queued" else "retried")
+        return True
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(POLL_INTERVAL)
+            except Exception as e:  # e.g. database unavailable or not migrated yet
+                logger.error(f"Extraction worker {self.name} error: {e}")
+                self._stop.wait(POLL_INTERVAL * 30)
+        self.process.stop()
+
+    def stop(self):
+        self._stop.set()
+
+
+def queue_depth(app) -> int:
+    from app.models.db_models import ExtractionJob
+    from app.services.database import read_session
+    with read_session(app) as read_db:
+        return read_db.scalar(select(func.count(ExtractionJob.id)).where(ExtractionJob.status.in_(("queued", "running"))))
+
+
+def start_workers(app, count: Optional[int] = None, extractor: str = DEFAULT_EXTRACTOR):
+    """Start `count` (EXTRACTION_WORKERS) worker threads, each with its own child process."""
+    count = int(os.getenv("EXTRACTION_WORKERS", "2")) if count is None else count
+    workers = [ExtractionWorker(app, f"{os.getpid()}-{i}", extractor) for i in range(count)]
+    for worker in workers:
+        threading.Thread(target=worker.run_forever, name=f"extraction-{worker.name}", daemon=True).start()
+
+    def shutdown():
+        for worker in workers:
+            worker.stop()
+            worker.process.stop()
+
+    atexit.register(shutdown)
+    if workers:
+        metrics.register_gauge("extraction.queue_depth", lambda: queue_depth(app), periodic=True)
+    app.extensions["extraction_workers"] = workers
+    return workers
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from app import create_app
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("EXTRACTION_WORKERS", "2"))
+    os.environ["EXTRACTION_WORKERS"] = "0"  # create_app must not start a second set
+    flask_app = create_app()
+    workers = start_workers(flask_app, count)
+    print(f"🧵 {count} extraction workers running; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,320 @@
+# app/services/llm_provider.py - Pluggable LLM/TTS provider layer
+#
+# chat.py talks to whatever object `create_llm_client()` returns. In production
+# that is the real OpenAI client; for benchmarking and CI it can be swapped for
+# a deterministic local stand-in that mimics the chat-completions streaming and
+# audio/speech shapes without touching the network.
+#
+# Select the provider with LLM_PROVIDER=openai|mock|replay (default: openai).
+# `replay` re-emits recorded traces (see app/services/trace_recorder.py).
+# The mock is tuned with the MOCK_* environment variables below, or can be run
+# as a tiny HTTP server that the real OpenAI client points at:
+#
+#     python -m app.services.llm_provider --port 8900
+#     OPENAI_API_KEY=mock OPENAI_BASE_URL=http://localhost:8900/v1 python run.py
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional, Iterator, List
+
+import openai
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Sentences the mock "model" answers with. Fixed so runs are reproducible.
+MOCK_CORPUS = [
+    "That is a great question about the course material.",
+    "Let's break the problem down into smaller steps first.",
+    "The derivative measures how fast a function changes at a point.",
+    "Remember that the chain rule applies to composed functions.",
+    "Try writing out a small example by hand before generalizing.",
+    "Gradient descent moves parameters against the slope of the loss.",
+    "Linear algebra gives us a compact language for these transformations.",
+    "Check your units at every step to catch mistakes early.",
+    "Bayes' theorem relates a conditional probability to its inverse.",
+    "If anything is unclear, ask about the specific step that confuses you.",
+]
+
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz): 417 bytes, ~26 ms.
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+MP3_FRAMES_PER_SECOND = 38.28
+
+
+@dataclass
+class MockConfig:
+    """Knobs for the deterministic mock provider."""
+    first_token_delay: float = 0.35  # seconds before the first streamed token
+    tokens_per_sec: float = 60.0  # streaming rate after the first token
+    sentences: int = 4  # sentences per answer
+    tts_latency_mean: float = 0.25  # seconds per audio/speech call
+    tts_latency_jitter: float = 0.10  # +/- uniform jitter around the mean
+    words_per_second: float = 2.5  # speaking rate used to size MP3 payloads
+    error_rate: float = 0.0  # probability a chat completion fails
+    tts_error_rate: float = 0.0  # probability a TTS call fails
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls):
+        def _env(name, default, cast=float):
+            value = os.getenv(name)
+            return cast(value) if value not in (None, "") else default
+
+        return cls(
+            first_token_delay=_env("MOCK_LLM_FIRST_TOKEN_DELAY", cls.first_token_delay),
+            tokens_per_sec=_env("MOCK_LLM_TOKENS_PER_SEC", cls.tokens_per_sec),
+            sentences=_env("MOCK_LLM_SENTENCES", cls.sentences, int),
+            tts_latency_mean=_env("MOCK_TTS_LATENCY_MEAN", cls.tts_latency_mean),
+            tts_latency_jitter=_env("MOCK_TTS_LATENCY_JITTER", cls.tts_latency_jitter),
+            words_per_second=_env("MOCK_TTS_WORDS_PER_SEC", cls.words_per_second),
+            error_rate=_env("MOCK_LLM_ERROR_RATE", cls.error_rate),
+            tts_error_rate=_env("MOCK_TTS_ERROR_RATE", cls.tts_error_rate),
+            seed=_env("MOCK_SEED", cls.seed, int),
+        )
+
+
+def _rng_for(config: MockConfig, *parts) -> random.Random:
+    """Per-request RNG seeded from the input so concurrency doesn't change results."""
+    digest = hashlib.sha256("\x1f".join([str(config.seed), *map(str, parts)]).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _last_user_text(messages) -> str:
+    for msg in reversed(messages or []):
+        if msg.get("role") != "user":
+            continue
+        content = msg.get("content")
+        if isinstance(content, str):
+            return content
+        return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return ""
+
+
+def mock_answer_tokens(config: MockConfig, messages, max_tokens: Optional[int] = None) -> List[str]:
+    """Deterministic token stream (word pieces with leading spaces) for a prompt."""
+    rng = _rng_for(config, "llm", _last_user_text(messages), len(messages or []))
+    sentences = [rng.choice(MOCK_CORPUS) for _ in range(max(1, config.sentences))]
+    tokens = []
+    for sentence in sentences:
+        for word in sentence.split(" "):
+            tokens.append(word if not tokens else " " + word)
+    if max_tokens:
+        tokens = tokens[:max_tokens]
+    return tokens
+
+
+def synthetic_mp3(text: str, words_per_second: float = 2.5) -> bytes:
+    """Silent MP3 whose duration roughly matches speaking `text` aloud."""
+    seconds = max(len(text.split()), 1) / max(words_per_second, 0.1)
+    return MP3_FRAME * max(1, int(seconds * MP3_FRAMES_PER_SECOND))
+
+
+def _injected_error(message: str) -> openai.APIStatusError:
+    request = httpx.Request("POST", "http://mock.local/v1")
+    response = httpx.Response(500, request=request)
+    return openai.InternalServerError(message, response=response, body=None)
+
+
+class _MockCompletions:
+    def __init__(self, config: MockConfig):
+        self._config = config
+
+    def create(self, model=None, messages=None, max_tokens=None, stream=False, **kwargs):
+        config = self._config
+        rng = _rng_for(config, "err", _last_user_text(messages), len(messages or []))
+        if config.error_rate and rng.random() < config.error_rate:
+            raise _injected_error("Injected mock LLM failure")
+        tokens = mock_answer_tokens(config, messages, max_tokens)
+        if not stream:
+            message = SimpleNamespace(role="assistant", content="".join(tokens))
+            return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")])
+        return self._stream(model, tokens)
+
+    def _stream(self, model, tokens) -> Iterator[SimpleNamespace]:
+        config = self._config
+        time.sleep(config.first_token_delay)
+        interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        for i, token in enumerate(tokens):
+            if i and interval:
+                time.sleep(interval)
+            delta = SimpleNamespace(role="assistant" if i == 0 else None, content=token)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=SimpleNamespace(role=None, content=None), finish_reason="stop")])
+
+
+class _MockSpeechResponse:
+    def __init__(self, payload: bytes):
+        self.content = payload
+
+    def iter_bytes(self, chunk_size: int = 4096) -> Iterator[bytes]:
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class _MockSpeech:
+    def __init__(self, config: MockConfig):
+        self._config = config
+
+    def create(self, model=None, voice=None, input="", response_format="mp3", **kwargs):
+        config = self._config
+        rng = _rng_for(config, "tts", input)
+        if config.tts_error_rate and rng.random() < config.tts_error_rate:
+            raise _injected_error("Injected mock TTS failure")
+        jitter = rng.uniform(-config.tts_latency_jitter, config.tts_latency_jitter)
+        time.sleep(max(0.0, config.tts_latency_mean + jitter))
+        return _MockSpeechResponse(synthetic_mp3(input, config.words_per_second))
+
+
+class MockOpenAIClient:
+    """In-process stand-in exposing `chat.completions.create` and `audio.speech.create`."""
+
+    def __init__(self, config: Optional[MockConfig] = None):
+        self.config = config or MockConfig.from_env()
+        self.chat = SimpleNamespace(completions=_MockCompletions(self.config))
+        self.audio = SimpleNamespace(speech=_MockSpeech(self.config))
+
+
+def _create_openai_client():
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        logger.warning("⚠️ OPENAI_API_KEY not found in environment variables. OpenAI features will be disabled.")
+        return None
+
+    # Initialize with optimized HTTP client for performance
+    client = openai.OpenAI(
+        api_key=openai_api_key,
+        timeout=httpx.Timeout(30.0, connect=5.0),  # Faster timeouts
+        max_retries=1,  # Reduce retries for speed
+        http_client=httpx.Client(
+            limits=httpx.Limits(
+                max_connections=100,  # Connection pooling
+                max_keepalive_connections=20,
+                keepalive_expiry=30.0
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            http2=True  # Enable HTTP/2 for better performance
+        )
+    )
+    logger.info("✅ OpenAI client initialized with performance optimizations.")
+    return client
+
+
+def create_llm_client(provider: Optional[str] = None):
+    """Return the client chat.py should use, or None if none is available."""
+    provider = (provider or os.getenv("LLM_PROVIDER", "openai")).lower()
+    try:
+        if provider == "mock":
+            client = MockOpenAIClient()
+            logger.info(f"🧪 Using mock LLM/TTS provider: {client.config}")
+            return client
+        if provider == "replay":
+            from app.services.trace_recorder import ReplayOpenAIClient
+            client = ReplayOpenAIClient.from_env()
+            logger.info(f"🔁 Using replay LLM/TTS provider (speed={client.speed}x)")
+            return client
+        if provider != "openai":
+            logger.warning(f"⚠️ Unknown LLM_PROVIDER '{provider}', falling back to OpenAI.")
+        return _create_openai_client()
+    except Exception as e:
+        logger.error(f"❌ Error initializing LLM client ({provider}): {e}")
+        return None
+
+
+# --- Optional HTTP server speaking the OpenAI wire format ---
+
+def serve_mock_http(host: str = "127.0.0.1", port: int = 8900, config: Optional[MockConfig] = None):
+    """Serve the mock over HTTP so the real OpenAI SDK (and its HTTP stack) is exercised."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    client = MockOpenAIClient(config)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            logger.debug(fmt % args)
+
+        def _json_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _send(self, status, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self._json_body()
+            try:
+                if self.path.endswith("/chat/completions"):
+                    self._chat(body)
+                elif self.path.endswith("/audio/speech"):
+                    speech = client.audio.speech.create(**body)
+                    self._send(200, speech.content, "audio/mpeg")
+                else:
+                    self._send(404, b'{"error": {"message": "not found"}}', "application/json")
+            except openai.APIStatusError as e:
+                payload = json.dumps({"error": {"message": str(e), "type": "server_error"}}).encode()
+                self._send(500, payload, "application/json")
+
+        def _chat(self, body):
+            created = int(time.time())
+            if not body.get("stream"):
+                result = client.chat.completions.create(**body)
+                payload = {
+                    "id": "chatcmpl-mock", "object": "chat.completion", "created": created,
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": result.choices[0].message.content}}],
+                }
+                self._send(200, json.dumps(payload).encode(), "application/json")
+                return
+
+            stream = client.chat.completions.create(**body)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write_chunk(data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            for chunk in stream:
+                choice = chunk.choices[0]
+                delta = {k: v for k, v in vars(choice.delta).items() if v is not None}
+                event = {
+                    "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": choice.finish_reason}],
+                }
+                write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            write_chunk(b"data: [DONE]\n\n")
+            write_chunk(b"")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    logger.info(f"🧪 Mock OpenAI server listening on http://{host}:{port}/v1")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic mock OpenAI chat/TTS server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = serve_mock_http(args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
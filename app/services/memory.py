@@ -0,0 +1,148 @@
+# app/services/memory.py - tracemalloc snapshots grouped by module
+#
+# Tracing is off by default (it costs ~30% CPU on allocation-heavy paths).
+# Start it with TRACEMALLOC_FRAMES=<n> at boot or via POST /admin/memory/start,
+# then take snapshots through /admin/memory/snapshot. Each snapshot is diffed
+# against the previous one, so "snapshot, run load, snapshot" shows what grew.
+#
+# Allocation sites are rolled up into groups so the usual suspects stand out:
+# chat.py, file_processor.py, sqlalchemy, werkzeug, openai/httpx, PIL, other
+# app modules by file name, and everything else by top-level package.
+
+import os
+import time
+import threading
+import tracemalloc
+from collections import defaultdict
+from typing import Optional, Dict, Any, List
+
+_project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_site_marker = "site-packages" + os.sep
+
+_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+_last_taken_at: Optional[float] = None
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _display_path(filename: str) -> str:
+    if filename.startswith(_project_root):
+        return os.path.relpath(filename, _project_root)
+    if _site_marker in filename:
+        return filename.split(_site_marker, 1)[1]
+    return filename
+
+
+def module_group(filename: str) -> str:
+    """Map an allocation's file to a reporting group."""
+    if filename.startswith(_project_root):
+        return os.path.basename(filename) if filename.endswith(".py") else os.path.relpath(filename, _project_root)
+    if _site_marker in filename:
+        package = filename.split(_site_marker, 1)[1].split(os.sep, 1)[0]
+        return package.split(".", 1)[0].lower()
+    return "stdlib"
+
+
+def start(frames: int = 1) -> bool:
+    """Start tracing; returns False if it was already running."""
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def stop():
+    global _last_snapshot, _last_taken_at
+    tracemalloc.stop()
+    with _lock:
+        _last_snapshot = None
+        _last_taken_at = None
+
+
+def status() -> Dict[str, Any]:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        "tracing": tracing,
+        "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+        "last_snapshot_at": _last_taken_at,
+    }
+
+
+def _site(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {
+        "file": _display_path(frame.filename),
+        "line": frame.lineno,
+        "group": module_group(frame.filename),
+        "size_bytes": stat.size,
+        "count": stat.count,
+    }
+
+
+def _diff_site(stat) -> Dict[str, Any]:
+    site = _site(stat)
+    site["size_diff_bytes"] = stat.size_diff
+    site["count_diff"] = stat.count_diff
+    return site
+
+
+def _group_totals(stats, diff: bool) -> List[Dict[str, Any]]:
+    groups = defaultdict(lambda: {"size_bytes": 0, "count": 0, "size_diff_bytes": 0, "count_diff": 0})
+    for stat in stats:
+        entry = groups[module_group(stat.traceback[0].filename)]
+        entry["size_bytes"] += stat.size
+        entry["count"] += stat.count
+        if diff:
+            entry["size_diff_bytes"] += stat.size_diff
+            entry["count_diff"] += stat.count_diff
+    key = "size_diff_bytes" if diff else "size_bytes"
+    rows = [{"group": name, **values} for name, values in groups.items()]
+    if not diff:
+        for row in rows:
+            del row["size_diff_bytes"], row["count_diff"]
+    return sorted(rows, key=lambda r: abs(r[key]), reverse=True)
+
+
+def take_snapshot(top: int = 25) -> Dict[str, Any]:
+    """Snapshot now, report top sites and groups, and diff against the previous snapshot."""
+    global _last_snapshot, _last_taken_at
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+    taken_at = time.time()
+
+    stats = snapshot.statistics("lineno")
+    report = {
+        "taken_at": taken_at,
+        "total_bytes": sum(s.size for s in stats),
+        "groups": _group_totals(stats, diff=False),
+        "top_sites": [_site(s) for s in stats[:top]],
+    }
+
+    with _lock:
+        previous, previous_at = _last_snapshot, _last_taken_at
+        _last_snapshot, _last_taken_at = snapshot, taken_at
+    if previous is not None:
+        diff = snapshot.compare_to(previous, "lineno")
+        report["diff"] = {
+            "since": previous_at,
+            "seconds": round(taken_at - previous_at, 1),
+            "total_diff_bytes": sum(s.size_diff for s in diff),
+            "groups": _group_totals(diff, diff=True),
+            "top_growth": [_diff_site(s) for s in diff[:top] if s.size_diff > 0],
+        }
+    return report
+
+
+if os.getenv("TRACEMALLOC_FRAMES"):
+    start(int(os.getenv("TRACEMALLOC_FRAMES")))
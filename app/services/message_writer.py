@@ -0,0 +1,186 @@
+# app/services/message_writer.py - Write-behind persistence for chat messages
+#
+# Chat routes hand finished messages to a per-app MessageWriter instead of
+# writing them on the request's session. A single background thread drains
+# the queue and inserts everything waiting (at most MESSAGE_WRITER_MAX_BATCH
+# rows) in one short transaction; messages that arrive during a commit go into
+# the next one. Concurrent streams therefore share commits instead of queueing
+# on the SQLite write lock, and no transaction stays open while an answer
+# streams. MESSAGE_WRITER_MAX_DELAY_MS (default 0) makes the writer linger
+# for more rows before each commit, trading latency for bigger batches.
+#
+# Guarantees:
+#   - submit() stamps the message's timestamp immediately, so ordering within a
+#     session is the order of submit() calls, not of commits.
+#   - A PendingWrite is acknowledged only after its batch committed; callers
+#     that need read-your-writes (the user's own message, before the LLM reads
+#     history) wait() on it, and /chat/message waits on the AI reply before
+#     sending the stream's 'end' event. Fire-and-forget writes (a partial
+#     reply after a disconnect) land within one commit (plus max_delay) of
+#     being queued, and are lost if the process dies before that.
+#   - A failed batch is retried row by row so one bad row can't drop the rest.
+#   - Pending writes are flushed at interpreter exit (atexit) and by close().
+
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_create_lock = threading.Lock()
+
+
+class PendingWrite:
+    """Handle for one submitted message; wait() blocks until it is committed."""
+
+    def __init__(self, row: dict):
+        self.row = row
+        self.error: Optional[Exception] = None
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once committed. False on timeout or if the write failed."""
+        return self._done.wait(timeout) and self.error is None
+
+    def _resolve(self, error: Optional[Exception] = None):
+        self.error = error
+        self._done.set()
+
+
+class MessageWriter:
+    def __init__(self, app, max_batch: int = None, max_delay: float = None,
+                 on_commit: Optional[Callable[[Iterable[int]], None]] = None):
+        self.app = app
+        self.max_batch = max_batch or int(os.getenv("MESSAGE_WRITER_MAX_BATCH", "200"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("MESSAGE_WRITER_MAX_DELAY_MS", "0")) / 1000.0
+        self.on_commit = on_commit
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+        self._closed = False
+        self._thread.start()
+        metrics.register_gauge("message_writer.queue_depth", self._queue.qsize)
+
+    def submit(self, session_id: int, sender: str, message: str, video_url: str = None) -> PendingWrite:
+        if self._closed:
+            raise RuntimeError("MessageWriter is closed")
+        write = PendingWrite({
+            "session_id": session_id,
+            "sender": sender,
+            "message": message,
+            "timestamp": datetime.utcnow(),
+            "video_url": video_url,
+        })
+        self._queue.put(write)
+        return write
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything submitted so far is committed."""
+        marker = PendingWrite(None)
+        self._queue.put(marker)
+        return marker._done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # --- Background thread ---
+
+    def _next_batch(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            writes = [w for w in batch if w is not _STOP and w.row is not None]
+            if writes:
+                try:
+                    self._write(writes)
+                except Exception as e:  # never let the writer thread die
+                    logger.error(f"Message writer failed on a batch of {len(writes)}: {e}")
+                    for w in writes:
+                        w._resolve(e)
+            for marker in batch:
+                if marker is not _STOP and marker.row is None:
+                    marker._resolve()
+            if stop:
+                return
+
+    def _write(self, writes: List[PendingWrite]):
+        from app import db
+        from app.models.db_models import ChatMessage
+
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                db.session.execute(ChatMessage.__table__.insert(), [w.row for w in writes])
+                db.session.commit()
+                failed = []
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Message batch of {len(writes)} failed ({e}); retrying row by row")
+                failed = self._write_individually(writes)
+            finally:
+                db.session.remove()
+
+        committed = [w for w in writes if w not in failed]
+        for w in committed:
+            w._resolve()
+        metrics.increment("message_writer.batches")
+        metrics.increment("message_writer.rows", len(committed))
+        metrics.increment("message_writer.failed_rows", len(failed))
+        metrics.increment("message_writer.commit_ms", (time.perf_counter() - start) * 1000.0)
+        if self.on_commit and committed:
+            try:
+                self.on_commit({w.row["session_id"] for w in committed})
+            except Exception as e:
+                logger.warning(f"Message writer on_commit hook failed: {e}")
+
+    def _write_individually(self, writes: List[PendingWrite]) -> List[PendingWrite]:
+        from app import db
+        from app.models.db_models import ChatMessage
+
+        failed = []
+        for w in writes:
+            try:
+                db.session.execute(ChatMessage.__table__.insert(), [w.row])
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Dropping chat message for session {w.row['session_id']}: {e}")
+                w._resolve(e)
+                failed.append(w)
+        return failed
+
+
+def get_message_writer(app, on_commit: Optional[Callable[[Iterable[int]], None]] = None) -> MessageWriter:
+    """The app's MessageWriter, started on first use."""
+    writer = app.extensions.get("message_writer")
+    if writer is None:
+        with _create_lock:
+            writer = app.extensions.get("message_writer")
+            if writer is None:
+                writer = MessageWriter(app, on_commit=on_commit)
+                app.extensions["message_writer"] = writer
+                atexit.register(writer.close)
+    return writer
+
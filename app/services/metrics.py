@@ -0,0 +1,191 @@
+# app/services/metrics.py - Process-wide gauges and counters for /chat/metrics
+#
+# Modules register gauges as zero-argument callables:
+#
+#     register_gauge("memory.rss_bytes", read_rss_bytes)
+#
+# and bump counters with increment("db.queries", route="chat.message").
+# Worker processes ship their counter increases to the web process with
+# counters_since() / add_counters().
+# collect() evaluates every gauge and returns a JSON-friendly dict.
+#
+# Gauges that are too expensive to read per request (Redis SCANs, deep object
+# sizes) are registered with periodic=True: a background sampler evaluates
+# them every METRICS_SAMPLE_INTERVAL seconds (default 30) and keeps a short
+# history, so /chat/metrics only returns the last sample.
+
+import os
+import sys
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORY_POINTS = 120
+
+_lock = threading.Lock()
+_gauges: Dict[str, Callable[[], Any]] = {}
+_periodic: Dict[str, Callable[[], Any]] = {}
+_samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=HISTORY_POINTS))
+_counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+_sampler: Optional[threading.Thread] = None
+
+
+def register_gauge(name: str, fn: Callable[[], Any], periodic: bool = False):
+    """Register (or replace) a gauge. Periodic gauges are read by the sampler thread."""
+    with _lock:
+        (_periodic if periodic else _gauges)[name] = fn
+
+
+def increment(name: str, amount: float = 1, **labels):
+    """Add to a counter. Labels become part of the key, e.g. db.queries{route=chat.message}."""
+    label = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    with _lock:
+        _counters[name][label] += amount
+
+
+def counter_values(name: str) -> Dict[str, float]:
+    with _lock:
+        return dict(_counters.get(name, {}))
+
+
+def snapshot_counters() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {name: dict(values) for name, values in _counters.items()}
+
+
+def counters_since(before: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Counter increases since a snapshot_counters() result (to ship from a child process)."""
+    delta = {}
+    for name, values in snapshot_counters().items():
+        changed = {label: value - before.get(name, {}).get(label, 0) for label, value in values.items()}
+        changed = {label: value for label, value in changed.items() if value}
+        if changed:
+            delta[name] = changed
+    return delta
+
+
+def add_counters(delta: Dict[str, Dict[str, float]]):
+    """Merge counters_since() output from another process into this one."""
+    with _lock:
+        for name, values in delta.items():
+            for label, value in values.items():
+                _counters[name][label] += value
+
+
+def _read(name: str, fn: Callable[[], Any]):
+    try:
+        return fn()
+    except Exception as e:
+        logger.debug(f"Gauge {name} failed: {e}")
+        return None
+
+
+def sample_periodic():
+    """Evaluate the periodic gauges once and append them to their history."""
+    with _lock:
+        periodic = list(_periodic.items())
+    now = time.time()
+    for name, fn in periodic:
+        value = _read(name, fn)
+        with _lock:
+            _samples[name].append((now, value))
+
+
+def collect(history: bool = False, fresh: bool = False) -> Dict[str, Any]:
+    """Current gauge values and counters. fresh=True reads periodic gauges now
+    instead of returning their last background sample."""
+    with _lock:
+        gauges = list(_gauges.items())
+        periodic = list(_periodic.items())
+        counters = {name: dict(values) for name, values in _counters.items()}
+        samples = {name: list(_samples[name]) for name, _ in periodic if _samples.get(name)}
+    out = {"gauges": {name: _read(name, fn) for name, fn in gauges}, "counters": counters}
+    for name, fn in periodic:
+        if fresh:
+            out["gauges"][name] = _read(name, fn)
+        elif name in samples:
+            out["gauges"][name] = samples[name][-1][1]
+    if history:
+        out["history"] = {name: [{"ts": round(ts, 1), "value": v} for ts, v in points]
+                          for name, points in samples.items()}
+    return out
+
+
+def start_sampler(interval: Optional[float] = None):
+    """Start the periodic gauge sampler once per process."""
+    global _sampler
+    interval = interval or float(os.getenv("METRICS_SAMPLE_INTERVAL", "30"))
+    with _lock:
+        if _sampler is not None:
+            return
+        _sampler = threading.Thread(target=_run_sampler, args=(interval,), name="metrics-sampler", daemon=True)
+    _sampler.start()
+
+
+def _run_sampler(interval: float):
+    while True:
+        sample_periodic()
+        time.sleep(interval)
+
+
+# --- Process memory ---
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux /proc), falling back to peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def deep_sizeof(obj, _seen=None) -> int:
+    """Approximate bytes held by a container tree of builtins (dict/list/str/bytes...)."""
+    seen = _seen if _seen is not None else set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+    return total
+
+
+def redis_namespace_sizes(client, prefixes, max_keys: int = 500) -> Dict[str, Dict[str, Any]]:
+    """Key count and value bytes per key prefix. Namespaces with more than
+    max_keys keys are extrapolated from the first max_keys found by SCAN."""
+    sizes = {}
+    for prefix in prefixes:
+        keys = []
+        total_keys = 0
+        for key in client.scan_iter(match=f"{prefix}*", count=max_keys):
+            total_keys += 1
+            if len(keys) < max_keys:
+                keys.append(key)
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.strlen(key)
+        sampled_bytes = sum(pipe.execute()) if keys else 0
+        scale = total_keys / len(keys) if keys else 0
+        sizes[prefix.rstrip(":")] = {"keys": total_keys, "bytes": int(sampled_bytes * scale),
+                                     "estimated": total_keys > len(keys)}
+    return sizes
+
+
+register_gauge("memory.rss_bytes", read_rss_bytes, periodic=True)
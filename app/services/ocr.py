@@ -0,0 +1,244 @@
+# app/services/ocr.py - Image OCR with preprocessing, a process pool and a result cache
+#
+# extract_from_image used to hand the full-resolution photo to Tesseract,
+# whose run time grows with the pixel count and suffers on uneven whiteboard
+# lighting. Every image now goes through:
+#
+#   preprocess()  grayscale, downscaled so the longest side is at most
+#                 OCR_MAX_SIDE (2000) px (JPEGs are decoded at reduced size
+#                 via draft()), autocontrast, then binarized at the Otsu
+#                 threshold of its histogram
+#   Tesseract     with OCR_TIMEOUT (30) seconds per image; pytesseract kills
+#                 the tesseract process when it runs over
+#   the cache     results keyed by the file's SHA-256 plus the settings above,
+#                 one small file per image under OCR_CACHE_DIR, so any process
+#                 (web, extraction workers, pool) can share it
+#
+# ocr_image() handles one image on the calling process (the extraction worker
+# child). ocr_many() handles a batch (e.g. video keyframes): cache hits are
+# answered at once, misses run on OCR_WORKERS processes, at most two per
+# process in flight, and results come back in input order.
+#
+# Metrics: ocr.images{status=ok|cached|timeout|error|unavailable},
+# ocr.seconds (time spent in preprocessing + Tesseract), ocr.batch_seconds
+# (wall time of ocr_many batches; images / batch_seconds is the throughput)
+# and ocr.latency_ms{le=...}, a histogram of per-image latency. Extraction
+# workers forward them to the web process's /chat/metrics.
+
+import os
+import time
+import uuid
+import hashlib
+import logging
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Iterable, Iterator, Optional
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2000"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "30"))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or os.cpu_count() or 1
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "ocr_cache"))
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+HASH_CHUNK = 1024 * 1024
+
+# status: ok, cached, timeout, error or unavailable (no Tesseract/Pillow)
+OcrResult = namedtuple("OcrResult", "path text status seconds")
+
+
+def settings_key() -> str:
+    """Part of the cache key that changes when preprocessing or Tesseract settings do."""
+    return hashlib.sha256(f"{OCR_MAX_SIDE}:{OCR_LANG}:otsu:v1".encode()).hexdigest()[:12]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def _cache_path(sha256: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, sha256[:2], f"{sha256}-{settings_key()}.txt")
+
+
+def cache_get(sha256: str) -> Optional[str]:
+    try:
+        with open(_cache_path(sha256), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def cache_put(sha256: str, text: str):
+    path = _cache_path(sha256)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp, path)  # readers never see a partial entry
+    except OSError as e:
+        logger.warning(f"OCR cache write failed for {sha256}: {e}")
+
+
+def otsu_threshold(histogram) -> int:
+    """Gray level that best separates dark from light pixels (Otsu's method)."""
+    total = sum(histogram)
+    if not total:
+        return 128
+    sum_all = sum(level * count for level, count in enumerate(histogram))
+    sum_dark, weight_dark, best, threshold = 0.0, 0, -1.0, 128
+    for level, count in enumerate(histogram):
+        weight_dark += count
+        if not weight_dark:
+            continue
+        weight_light = total - weight_dark
+        if not weight_light:
+            break
+        sum_dark += level * count
+        mean_dark = sum_dark / weight_dark
+        mean_light = (sum_all - sum_dark) / weight_light
+        between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+        if between > best:
+            best, threshold = between, level
+    return threshold
+
+
+def preprocess(image):
+    """Grayscale, downscaled to OCR_MAX_SIDE and binarized copy of a PIL image."""
+    from PIL import Image, ImageOps
+
+    if image.format == "JPEG":
+        image.draft("L", (OCR_MAX_SIDE, OCR_MAX_SIDE))  # decode at a reduced scale
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L")
+    if max(image.size) > OCR_MAX_SIDE:
+        image.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.Resampling.BILINEAR)
+    image = ImageOps.autocontrast(image, cutoff=1)
+    threshold = otsu_threshold(image.histogram())
+    return image.point(lambda level: 255 if level > threshold else 0, mode="1")
+
+
+def _run_tesseract(path: str):
+    """(status, text, seconds) for one image; runs in the caller or a pool process."""
+    started = time.perf_counter()
+    try:
+        from PIL import Image
+        import pytesseract
+    except ImportError:
+        return "unavailable", None, 0.0
+    try:
+        with Image.open(path) as image:
+            prepared = preprocess(image)
+        text = pytesseract.image_to_string(prepared, lang=OCR_LANG, timeout=OCR_TIMEOUT)
+        return "ok", text.strip(), time.perf_counter() - started
+    except pytesseract.TesseractNotFoundError:
+        return "unavailable", None, 0.0
+    except RuntimeError as e:
+        if "timeout" in str(e).lower():
+            return "timeout", None, time.perf_counter() - started
+        return "error", f"{e}", time.perf_counter() - started
+    except Exception as e:
+        return "error", f"{type(e).__name__}: {e}", time.perf_counter() - started
+
+
+def _record(result: OcrResult):
+    metrics.increment("ocr.images", status=result.status)
+    if result.status == "cached":
+        return
+    metrics.increment("ocr.seconds", result.seconds)
+    latency_ms = result.seconds * 1000
+    bucket = next((str(b) for b in LATENCY_BUCKETS_MS if latency_ms <= b), "inf")
+    metrics.increment("ocr.latency_ms", le=bucket)
+
+
+def _finish(path: str, sha256: Optional[str], status: str, text: Optional[str], seconds: float) -> OcrResult:
+    if status == "ok":
+        if sha256:
+            cache_put(sha256, text)
+    elif status == "error":
+        logger.warning(f"OCR failed for {os.path.basename(path)}: {text}")
+        text = None
+    result = OcrResult(path, text, status, seconds)
+    _record(result)
+    return result
+
+
+def _cached(path: str):
+    """(sha256, cached OcrResult or None)."""
+    try:
+        sha256 = file_hash(path)
+    except OSError:
+        return None, None
+    text = cache_get(sha256)
+    if text is None:
+        return sha256, None
+    result = OcrResult(path, text, "cached", 0.0)
+    _record(result)
+    return sha256, result
+
+
+def ocr_image(path: str) -> OcrResult:
+    """OCR one image on this process, using the cache."""
+    sha256, cached = _cached(path)
+    if cached:
+        return cached
+    return _finish(path, sha256, *_run_tesseract(path))
+
+
+def ocr_many(paths: Iterable[str], workers: Optional[int] = None, progress=None) -> Iterator[OcrResult]:
+    """OCR a batch of images across a process pool; results in input order.
+    progress, if given, is called as progress(done, total)."""
+    from app.utils.file_processor import pool_context
+
+    paths = list(paths)
+    workers = min(OCR_WORKERS if workers is None else workers, len(paths))
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(workers, mp_context=pool_context()) if workers > 1 else None
+    try:
+        pending, in_flight, done = deque(enumerate(paths)), deque(), 0
+        while pending or in_flight:
+            while pending and len(in_flight) < max(workers, 1) * 2:
+                index, path = pending.popleft()
+                sha256, cached = _cached(path)
+                if cached is None and pool is not None:
+                    in_flight.append((path, sha256, pool.submit(_run_tesseract, path)))
+                else:
+                    in_flight.append((path, sha256, cached))
+            path, sha256, item = in_flight.popleft()
+            if item is None:
+                result = _finish(path, sha256, *_run_tesseract(path))
+            elif isinstance(item, OcrResult):
+                result = item
+            else:
+                try:
+                    # Tesseract itself is stopped after OCR_TIMEOUT; this covers a stuck decode
+                    result = _finish(path, sha256, *item.result(timeout=OCR_TIMEOUT * 2 + 10))
+                except FutureTimeout:
+                    item.cancel()
+                    result = _finish(path, sha256, "timeout", None, OCR_TIMEOUT * 2 + 10)
+            done += 1
+            if progress:
+                progress(done, len(paths))
+            yield result
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        metrics.increment("ocr.batch_seconds", time.perf_counter() - started)
+
+
+def text_or_placeholder(result: OcrResult) -> str:
+    """The OCR text, or the placeholder extract_from_image has always returned on failure."""
+    if result.status in ("ok", "cached"):
+        return result.text
+    name = os.path.basename(result.path)
+    if result.status == "unavailable":
+        return f"[IMAGE: {name} - OCR not available]"
+    return f"[IMAGE: {name} - text extraction failed]"
@@ -0,0 +1,157 @@
+# app/services/password_hasher.py - Password hashing off the request threads
+#
+# scrypt/PBKDF2 are deliberately expensive (~100 ms of CPU each). Run inline,
+# a burst of logins at the start of a lecture takes every core away from the
+# threads streaming chat answers. PasswordHasher runs hashing in a small
+# process pool instead:
+#
+#   PASSWORD_HASH_WORKERS=2     processes (0 = hash inline on the caller's thread)
+#   PASSWORD_HASH_QUEUE=32      hashes allowed in flight (running + queued; 0 = no limit)
+#   PASSWORD_HASH_TIMEOUT=10    seconds a request waits for its result
+#   PASSWORD_HASH_METHOD=scrypt werkzeug method for new hashes
+#
+# When PASSWORD_HASH_QUEUE hashes are already in flight, hash()/verify() raise
+# HasherBusy at once and auth routes answer 503 with Retry-After instead of
+# queueing the request behind work it would time out on anyway.
+#
+# Hashes created with other parameters (an older method or iteration count)
+# still verify; needs_rehash() spots them and auth.login stores a fresh hash
+# in the background after a successful login.
+
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Iterable, List, Optional
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """Too many hashes in flight; the caller should shed load (503)."""
+
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(hashed: str, password: str) -> bool:
+    return check_password_hash(hashed, password)
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = 2, max_pending: int = 32, timeout: float = 10.0, method: str = "scrypt"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._current_prefix: Optional[str] = None
+        # spawn: forking a threaded web worker can copy held locks into the child
+        self._pool = (ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+                      if workers > 0 else None)
+        metrics.register_gauge("password_hash.in_flight", lambda: self._pending)
+
+    def _submit(self, fn, *args, block: bool = False) -> Future:
+        if self._slots is not None:
+            acquired = self._slots.acquire(timeout=self.timeout) if block else self._slots.acquire(blocking=False)
+            if not acquired:
+                metrics.increment("password_hash.rejected")
+                raise HasherBusy(f"{self.max_pending} password hashes already in flight")
+        with self._lock:
+            self._pending += 1
+        try:
+            if self._pool:
+                future = self._pool.submit(fn, *args)
+            else:
+                future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def _wait(self, future: Future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            metrics.increment("password_hash.timeouts")
+            raise HasherBusy(f"Password hash did not finish within {self.timeout}s")
+
+    def submit_hash(self, password: str) -> Future:
+        return self._submit(_hash, password, self.method)
+
+    def hash(self, password: str) -> str:
+        return self._wait(self.submit_hash(password))
+
+    def hash_many(self, passwords: Iterable[str], method: Optional[str] = None) -> List[str]:
+        """Hash a batch in parallel for bulk jobs. Waits for slots instead of
+        failing, but keeps at most `workers` of its own hashes in flight so
+        interactive logins still find free slots."""
+        window = threading.BoundedSemaphore(max(self.workers, 1))
+        futures = []
+        for password in passwords:
+            window.acquire()
+            try:
+                future = self._submit(_hash, password, method or self.method, block=True)
+            except Exception:
+                window.release()
+                raise
+            future.add_done_callback(lambda _f: window.release())
+            futures.append(future)
+        return [self._wait(f) for f in futures]
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._wait(self._submit(_verify, hashed, password))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if `hashed` was made with different parameters than new hashes get."""
+        if self._current_prefix is None:
+            # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1")
+            self._current_prefix = _hash("", self.method).split("$", 1)[0]
+        return hashed.split("$", 1)[0] != self._current_prefix
+
+    def close(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_create_lock = threading.Lock()
+
+
+def get_password_hasher(app) -> PasswordHasher:
+    hasher = app.extensions.get("password_hasher")
+    if hasher is not None:
+        return hasher
+    with _create_lock:
+        hasher = app.extensions.get("password_hasher")
+        if hasher is not None:
+            return hasher
+        hasher = PasswordHasher(
+            workers=int(app.config.get("PASSWORD_HASH_WORKERS", os.getenv("PASSWORD_HASH_WORKERS", "2"))),
+            max_pending=int(os.getenv("PASSWORD_HASH_QUEUE", "32")),
+            timeout=float(os.getenv("PASSWORD_HASH_TIMEOUT", "10")),
+            method=os.getenv("PASSWORD_HASH_METHOD", "scrypt"),
+        )
+        app.extensions["password_hasher"] = hasher
+        atexit.register(hasher.close)
+        return hasher
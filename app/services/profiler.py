@@ -0,0 +1,220 @@
+# app/services/profiler.py - Low-overhead sampling profiler for live workers
+#
+# A background thread snapshots every thread's stack with sys._current_frames()
+# at a fixed interval (default 5ms). Nothing is instrumented, so the cost is one
+# stack walk per thread per tick and only while a profile is running.
+#
+# Output formats:
+#   collapsed   - "thread;outer;...;inner <count>" lines (flamegraph.pl, speedscope)
+#   speedscope  - speedscope.app sampled-profile JSON, one profile per thread
+#
+# Whole-worker profiles are taken through /admin/profile. Admins can also send
+# `X-Profile: 1` on /chat/message or /upload/file to profile just that request;
+# the response carries X-Profile-Id and the result is kept in RECENT_PROFILES.
+
+import os
+import sys
+import time
+import uuid
+import threading
+from collections import Counter, OrderedDict
+from functools import wraps
+from typing import Optional, Set, Dict, Any
+
+from flask import request, make_response
+
+from app.services.metrics import register_gauge, deep_sizeof
+
+DEFAULT_INTERVAL = 0.005
+MAX_STACK_DEPTH = 128
+MAX_RECENT_PROFILES = 20
+
+RECENT_PROFILES: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_recent_lock = threading.Lock()
+
+_project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _short_path(path: str) -> str:
+    if path.startswith(_project_root):
+        return os.path.relpath(path, _project_root)
+    marker = "site-packages" + os.sep
+    if marker in path:
+        return path.split(marker, 1)[1]
+    return path
+
+
+class SamplingProfiler:
+    """Samples thread stacks until stopped. Restrict to `thread_ids` to profile one request."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, thread_ids: Optional[Set[int]] = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.time() - self.started_at
+        return self
+
+    def add_thread(self, ident: int):
+        if self.thread_ids is not None:
+            self.thread_ids.add(ident)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        code_names = {}
+        while not self._stop.is_set():
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    label = code_names.get(code)
+                    if label is None:
+                        label = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+                        code_names[code] = label
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+            self.sample_count += 1
+            self._stop.wait(self.interval)
+
+    # --- Exporters ---
+
+    def to_collapsed(self) -> str:
+        lines = []
+        for (thread_name, stack), count in self.samples.most_common():
+            frames = [thread_name] + [f"{name} ({path}:{line})" for name, path, line in stack]
+            lines.append(";".join(frame.replace(";", ":") for frame in frames) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self, name: str = "officehours-worker") -> Dict[str, Any]:
+        frame_index: Dict[tuple, int] = {}
+        frames = []
+        per_thread: Dict[str, Dict[str, list]] = {}
+        weight = self.interval * 1000.0
+        for (thread_name, stack), count in self.samples.items():
+            indexes = []
+            for label in stack:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label[0], "file": label[1], "line": label[2]})
+                indexes.append(frame_index[label])
+            profile = per_thread.setdefault(thread_name, {"samples": [], "weights": []})
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * weight)
+        profiles = []
+        for thread_name, data in sorted(per_thread.items()):
+            total = sum(data["weights"])
+            profiles.append({
+                "type": "sampled", "name": thread_name, "unit": "milliseconds",
+                "startValue": 0, "endValue": total,
+                "samples": data["samples"], "weights": data["weights"],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "officehours-sampling-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "duration_s": round(self.duration, 3),
+            "interval_ms": self.interval * 1000.0,
+            "ticks": self.sample_count,
+            "unique_stacks": len(self.samples),
+        }
+
+
+def render_profile(profiler: SamplingProfiler, fmt: str, name: str):
+    """Flask response for a finished profile in the requested format."""
+    if fmt == "collapsed":
+        response = make_response(profiler.to_collapsed())
+        response.mimetype = "text/plain"
+        return response
+    response = make_response(profiler.to_speedscope(name))
+    response.headers["Content-Disposition"] = f'attachment; filename="{name}.speedscope.json"'
+    return response
+
+
+def recent_profiles_bytes() -> int:
+    with _recent_lock:
+        return sum(deep_sizeof(entry["profiler"].samples) for entry in RECENT_PROFILES.values())
+
+
+def _remember(profile_id: str, profiler: SamplingProfiler, endpoint: str):
+    with _recent_lock:
+        RECENT_PROFILES[profile_id] = {"endpoint": endpoint, "profiler": profiler}
+        while len(RECENT_PROFILES) > MAX_RECENT_PROFILES:
+            RECENT_PROFILES.popitem(last=False)
+
+
+register_gauge("cache.recent_profiles_bytes", recent_profiles_bytes, periodic=True)
+
+
+def profile_if_requested(view):
+    """Profile this request when an admin sends `X-Profile: 1`.
+
+    Must sit below @jwt_required(). Streaming responses keep being sampled
+    (on whichever thread iterates them) until the response is closed.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.headers.get("X-Profile") != "1":
+            return view(*args, **kwargs)
+        from flask_jwt_extended import get_jwt_identity
+        from app.utils.auth_utils import is_admin
+        if not is_admin(get_jwt_identity()):
+            return view(*args, **kwargs)
+
+        profile_id = uuid.uuid4().hex[:12]
+        profiler = SamplingProfiler(interval=DEFAULT_INTERVAL / 5, thread_ids={threading.get_ident()}).start()
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            profiler.stop()
+            _remember(profile_id, profiler, request.endpoint)
+            raise
+
+        endpoint = request.endpoint
+        if response.is_streamed:
+            inner = response.response
+
+            def sampled_stream():
+                profiler.add_thread(threading.get_ident())
+                yield from inner
+
+            response.response = sampled_stream()
+
+            def finish():
+                profiler.stop()
+                _remember(profile_id, profiler, endpoint)
+
+            response.call_on_close(finish)
+        else:
+            profiler.stop()
+            _remember(profile_id, profiler, endpoint)
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+    return wrapper
@@ -0,0 +1,167 @@
+# app/services/query_monitor.py - Per-request SQL timing, slow-query log and N+1 detection
+#
+# Every statement executed through SQLAlchemy is timed with cursor events and
+# attributed to the current Flask request (endpoint + X-Request-Id). Queries
+# run outside a request (streaming generators with their own app context,
+# background threads) are attributed to "background".
+#
+#   SLOW_QUERY_MS=100          log statements slower than this, with the shape
+#                              of their parameters (types, never values)
+#   N_PLUS_ONE_THRESHOLD=5     warn when one request runs the same statement
+#                              shape more than this many times
+#   QUERY_MONITOR=0            turn the hooks off entirely
+#
+# Per-route totals are exported through app.services.metrics as the counters
+# db.requests, db.queries, db.time_ms and db.n_plus_one (label route=...),
+# and summarised as the db.routes gauge on /chat/metrics.
+
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+from collections import Counter
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_ROUTE = "background"
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*,)+\s*(?:\?|%s|:\w+|__\[POSTCOMPILE_\w+\])\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def statement_shape(statement: str) -> str:
+    """Normalise a statement so repeats with different values compare equal."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("(?, ...)", shape)
+    return _LITERAL.sub("?", shape)
+
+
+def parameter_shape(parameters, executemany: bool = False) -> str:
+    """Describe parameters by type only, e.g. "(int, str)" or "37 x (int, str)"."""
+    def describe(params):
+        if isinstance(params, dict):
+            return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+        if isinstance(params, (list, tuple)):
+            return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+        return type(params).__name__
+
+    if executemany and parameters:
+        return f"{len(parameters)} x {describe(parameters[0])}"
+    return describe(parameters) if parameters else "()"
+
+
+def _request_stats():
+    if not has_request_context():
+        return None
+    stats = g.get("_query_stats")
+    if stats is None:
+        stats = g._query_stats = {"count": 0, "seconds": 0.0, "shapes": Counter()}
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    config = _config()
+
+    stats = _request_stats()
+    if stats is not None:
+        stats["count"] += 1
+        stats["seconds"] += elapsed
+        stats["shapes"][statement_shape(statement)] += 1
+        route = request.endpoint or "unknown"
+        request_id = g.get("request_id", "-")
+    else:
+        route = BACKGROUND_ROUTE
+        request_id = "-"
+        metrics.increment("db.queries", route=route)
+        metrics.increment("db.time_ms", elapsed * 1000.0, route=route)
+
+    if elapsed * 1000.0 >= config["slow_ms"]:
+        metrics.increment("db.slow_queries", route=route)
+        logger.warning(f"SLOW_QUERY {elapsed * 1000.0:.1f}ms route={route} request={request_id} "
+                       f"params={parameter_shape(parameters, executemany)} sql={statement_shape(statement)[:500]}")
+
+
+def _config():
+    return {
+        "slow_ms": float(os.getenv("SLOW_QUERY_MS", "100")),
+        "n_plus_one": int(os.getenv("N_PLUS_ONE_THRESHOLD", "5")),
+    }
+
+
+def _start_request():
+    g.request_id = request.headers.get("X-Request-Id") or uuid.uuid4().hex[:16]
+
+
+def _finish_request(response):
+    stats = g.pop("_query_stats", None)
+    route = request.endpoint or "unknown"
+    metrics.increment("db.requests", route=route)
+    if stats is None:
+        return response
+    metrics.increment("db.queries", stats["count"], route=route)
+    metrics.increment("db.time_ms", stats["seconds"] * 1000.0, route=route)
+
+    threshold = _config()["n_plus_one"]
+    for shape, count in stats["shapes"].items():
+        if count > threshold:
+            metrics.increment("db.n_plus_one", route=route)
+            logger.warning(f"N_PLUS_ONE route={route} request={g.get('request_id', '-')} "
+                           f"ran {count}x: {shape[:300]}")
+    response.headers["X-Request-Id"] = g.get("request_id", "")
+    return response
+
+
+def route_summary():
+    """Per-route request count, queries/request and DB ms/request."""
+    requests = metrics.counter_values("db.requests")
+    queries = metrics.counter_values("db.queries")
+    time_ms = metrics.counter_values("db.time_ms")
+    flagged = metrics.counter_values("db.n_plus_one")
+    summary = {}
+    for label in set(requests) | set(queries):
+        route = label.split("=", 1)[1] if "=" in label else label
+        n = requests.get(label, 0)
+        summary[route] = {
+            "requests": int(n),
+            "queries": int(queries.get(label, 0)),
+            "db_time_ms": round(time_ms.get(label, 0.0), 2),
+            "queries_per_request": round(queries.get(label, 0) / n, 2) if n else None,
+            "db_ms_per_request": round(time_ms.get(label, 0.0) / n, 2) if n else None,
+            "n_plus_one_flags": int(flagged.get(label, 0)),
+        }
+    return summary
+
+
+def init_app(app):
+    """Register the request hooks on app and the cursor hooks on every Engine (once)."""
+    global _installed
+    if os.getenv("QUERY_MONITOR", "1") == "0":
+        return
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            metrics.register_gauge("db.routes", route_summary)
+            _installed = True
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,120 @@
+# app/services/resource_text.py - Extracted text stored per page/slide/section
+#
+# Resource.extracted_text held a whole document in one Text column that came
+# along with every Resource row, so listing an office's files loaded
+# megabytes of text. Extraction results now go to resource_chunk, one row per
+# Segment (see file_processor.iter_text_segments), in document order:
+#
+#   write_chunks() inserts segments as the extraction worker receives them.
+#   Chunks of at least RESOURCE_CHUNK_COMPRESS_MIN chars (2048) are stored
+#   compressed with the archive codec (zstd if installed, else zlib) when
+#   that is smaller.
+#
+#   iter_chunks() streams a resource's chunks back RESOURCE_CHUNK_BATCH (64)
+#   rows at a time, so readers never hold more than a batch in memory.
+#
+#   copy_chunks() duplicates another resource's chunks with INSERT ... SELECT,
+#   for uploads of content that was already extracted (upload_store).
+#
+# Resource.extracted_text is deferred and only still set for resources
+# extracted before chunks existed; iter_chunks() falls back to it.
+
+import os
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select, insert, delete, literal
+
+from app.services import metrics
+from app.services.archive import compress, decompress, ZSTD_AVAILABLE
+
+COMPRESS_MIN_CHARS = int(os.getenv("RESOURCE_CHUNK_COMPRESS_MIN", "2048"))
+READ_BATCH = int(os.getenv("RESOURCE_CHUNK_BATCH", "64"))
+CODEC = "zstd" if ZSTD_AVAILABLE else "zlib"
+
+Chunk = namedtuple("Chunk", "resource_id position kind number text")
+
+
+def encode(text: str):
+    """(codec, payload) for one chunk's text."""
+    raw = text.encode("utf-8")
+    if len(text) >= COMPRESS_MIN_CHARS:
+        packed = compress(raw, CODEC)
+        if len(packed) < len(raw):
+            return CODEC, packed
+    return "none", raw
+
+
+def decode(codec: str, payload: bytes) -> str:
+    return (payload if codec == "none" else decompress(payload, codec)).decode("utf-8")
+
+
+def write_chunks(session, resource_id: int, segments: Iterable, start_position: int = 0) -> int:
+    """Insert (kind, number, text) segments from `start_position` on; empty
+    ones are skipped. Returns the number of characters stored."""
+    from app.models.db_models import ResourceChunk
+
+    rows, chars = [], 0
+    for position, (kind, number, text) in enumerate(segments, start=start_position):
+        if not text or not text.strip():
+            continue
+        codec, payload = encode(text)
+        rows.append({"resource_id": resource_id, "position": position, "kind": kind, "number": number,
+                     "codec": codec, "char_count": len(text), "payload": payload})
+        chars += len(text)
+    if rows:
+        session.execute(insert(ResourceChunk), rows)
+        metrics.increment("resource_text.chunks_written", len(rows))
+    return chars
+
+
+def clear_chunks(session, resource_id: int):
+    from app.models.db_models import ResourceChunk
+
+    session.execute(delete(ResourceChunk).where(ResourceChunk.resource_id == resource_id))
+
+
+def copy_chunks(session, source_id: int, target_id: int) -> int:
+    """Give `target_id` a copy of `source_id`'s chunks, without loading them. Returns rows copied."""
+    from app.models.db_models import ResourceChunk
+
+    columns = ("position", "kind", "number", "codec", "char_count", "payload")
+    source = select(literal(target_id), *(getattr(ResourceChunk, c) for c in columns)).where(
+        ResourceChunk.resource_id == source_id)
+    return session.execute(insert(ResourceChunk).from_select(("resource_id",) + columns, source)).rowcount
+
+
+def iter_chunks(session, resource_id: int) -> Iterator[Chunk]:
+    """A resource's text chunk by chunk, in document order, READ_BATCH rows per fetch."""
+    from app.models.db_models import Resource, ResourceChunk
+
+    query = (select(ResourceChunk.position, ResourceChunk.kind, ResourceChunk.number,
+                    ResourceChunk.codec, ResourceChunk.payload)
+             .where(ResourceChunk.resource_id == resource_id)
+             .order_by(ResourceChunk.position)
+             .execution_options(yield_per=READ_BATCH))
+    found = False
+    for row in session.execute(query):
+        found = True
+        yield Chunk(resource_id, row.position, row.kind, row.number, decode(row.codec, row.payload))
+    if not found:
+        legacy = session.scalar(select(Resource.extracted_text).where(Resource.id == resource_id))
+        if legacy:
+            yield Chunk(resource_id, 0, "document", 1, legacy)
+
+
+def iter_office_chunks(session, office_id: int) -> Iterator[Chunk]:
+    """Chunks of every processed resource in an office, resource by resource."""
+    from app.models.db_models import Resource
+
+    resource_ids = session.scalars(select(Resource.id).where(Resource.office_id == office_id,
+                                                             Resource.processed.is_(True))
+                                   .order_by(Resource.id)).all()
+    for resource_id in resource_ids:
+        yield from iter_chunks(session, resource_id)
+
+
+def full_text(session, resource_id: int) -> Optional[str]:
+    """The whole extracted text, for callers that really need one string."""
+    return "\n".join(chunk.text for chunk in iter_chunks(session, resource_id)).strip() or None
+
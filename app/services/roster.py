@@ -0,0 +1,176 @@
+# app/services/roster.py - Bulk roster import for an office
+#
+# POST /office/<id>/roster takes a CSV (name,email[,password]) or JSON roster
+# and streams one NDJSON result line per row, then a summary line. Rows are
+# processed ROSTER_BATCH (500) at a time, each batch in one transaction:
+#
+#   1. one SELECT ... WHERE lower(email) IN (...) finds the batch's existing users
+#   2. passwords for new users are hashed in parallel on the PasswordHasher pool
+#   3. new users are inserted with one executemany INSERT ... RETURNING
+#   4. one SELECT finds existing enrollments, one INSERT adds the missing ones
+#
+# Rows without a password get a random temporary password, returned in that
+# row's result. Temporary passwords are high-entropy, so they are hashed with
+# the cheap ROSTER_TEMP_HASH_METHOD; auth.login upgrades the hash to the full
+# PASSWORD_HASH_METHOD on the student's first login.
+#
+# If a batch hits a unique-constraint race (someone registered or joined while
+# it ran) it is rolled back and retried once, which re-reads existing rows.
+
+import io
+import os
+import csv
+import json
+import secrets
+import string
+import logging
+from typing import Dict, Any, Iterable, Iterator, List
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+ROSTER_BATCH = int(os.getenv("ROSTER_BATCH", "500"))
+TEMP_HASH_METHOD = os.getenv("ROSTER_TEMP_HASH_METHOD", "pbkdf2:sha256:1000")
+TEMP_PASSWORD_LENGTH = 14
+MAX_FIELD_LENGTH = 100
+
+
+class RosterError(ValueError):
+    """The roster as a whole cannot be read (bad format or missing columns)."""
+
+
+def parse_roster(stream, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Rows as dicts with name, email and optional password, read lazily from CSV."""
+    if fmt == "json":
+        data = json.load(stream)
+        rows = data.get("students") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise RosterError('JSON roster must be a list or {"students": [...]}')
+        yield from rows
+        return
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="") if not isinstance(stream, io.TextIOBase) else stream
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or "email" not in [f.strip().lower() for f in reader.fieldnames]:
+        raise RosterError("CSV roster needs a header row with at least an email column")
+    for row in reader:
+        yield {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+
+
+def _validate(index: int, raw: Any, seen: set) -> Dict[str, Any]:
+    row = {"row": index}
+    if not isinstance(raw, dict):
+        return {**row, "status": "error", "error": "Row must be an object"}
+    email = str(raw.get("email") or "").strip()
+    name = str(raw.get("name") or "").strip() or email.split("@")[0]
+    row["email"] = email
+    if "@" not in email or len(email) > MAX_FIELD_LENGTH or len(name) > MAX_FIELD_LENGTH:
+        return {**row, "status": "error", "error": "Invalid email or name"}
+    if email.lower() in seen:
+        return {**row, "status": "error", "error": "Duplicate email in roster"}
+    seen.add(email.lower())
+    return {**row, "status": None, "key": email.lower(), "name": name, "password": raw.get("password") or None}
+
+
+def _batches(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def temporary_password() -> str:
+    alphabet = string.ascii_letters + string.digits
+    return "".join(secrets.choice(alphabet) for _ in range(TEMP_PASSWORD_LENGTH))
+
+
+def _import_batch(session, office_id: int, rows: List[Dict[str, Any]], hasher) -> List[int]:
+    """Resolve one batch of validated rows in place; returns users newly enrolled."""
+    from app.models.db_models import User, Enrollment
+
+    # Emails are stored as registered; match them case-insensitively (ix_user_email_lower)
+    existing = {email.lower(): (user_id, role) for user_id, email, role in session.execute(
+        select(User.id, User.email, User.role).where(func.lower(User.email).in_([r["key"] for r in rows])))}
+
+    new_rows = [r for r in rows if r["key"] not in existing]
+    for r in new_rows:
+        if not r["password"]:
+            r["temporary_password"] = temporary_password()
+    given = [r for r in new_rows if r["password"]]
+    temporary = [r for r in new_rows if not r["password"]]
+    hashes = dict(zip(map(id, given), hasher.hash_many(r["password"] for r in given)))
+    hashes.update(zip(map(id, temporary), hasher.hash_many((r["temporary_password"] for r in temporary),
+                                                           method=TEMP_HASH_METHOD)))
+    if new_rows:
+        created = session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{"name": r["name"], "email": r["email"], "password": hashes[id(r)], "role": "student"}
+             for r in new_rows],
+        ).scalars().all()
+        for r, user_id in zip(new_rows, created):
+            existing[r["key"]] = (user_id, "student")
+            r["created"] = True
+
+    students = {}
+    for r in rows:
+        user_id, role = existing[r["key"]]
+        if role != "student":
+            r["status"], r["error"] = "error", f"Account exists with role '{role}'"
+        else:
+            r["user_id"] = user_id
+            students[user_id] = r
+    enrolled = set(session.scalars(select(Enrollment.user_id).where(
+        Enrollment.office_id == office_id, Enrollment.user_id.in_(list(students)))))
+    to_enroll = [user_id for user_id in students if user_id not in enrolled]
+    if to_enroll:
+        session.execute(insert(Enrollment), [{"user_id": u, "office_id": office_id} for u in to_enroll])
+    for user_id, r in students.items():
+        r["status"] = "already_enrolled" if user_id in enrolled else "enrolled"
+    return to_enroll
+
+
+def import_roster(office_id: int, raw_rows: Iterable[Any], hasher,
+                  batch_size: int = ROSTER_BATCH) -> Iterator[Dict[str, Any]]:
+    """Import rows and yield one result per row, then {"summary": {...}}."""
+    from app import db
+    from app.services import acl, metrics
+
+    summary = {"rows": 0, "created": 0, "enrolled": 0, "already_enrolled": 0, "errors": 0}
+    seen = set()
+    validated = (_validate(i, raw, seen) for i, raw in enumerate(raw_rows, start=1))
+    for batch in _batches(validated, batch_size):
+        pending = [r for r in batch if r["status"] is None]
+        for attempt in (1, 2):
+            try:
+                newly_enrolled = _import_batch(db.session, office_id, pending, hasher) if pending else []
+                db.session.commit()
+                break
+            except IntegrityError as e:
+                db.session.rollback()
+                for r in pending:
+                    for key in ("status", "error", "created", "user_id", "temporary_password"):
+                        r.pop(key, None)
+                    r["status"] = None
+                if attempt == 2:
+                    logger.error(f"Roster batch for office {office_id} failed: {e}")
+                    for r in pending:
+                        r["status"], r["error"] = "error", "Conflicting concurrent change, retry the row"
+                    newly_enrolled = []
+        if newly_enrolled:
+            acl.invalidate(*newly_enrolled)
+
+        for r in batch:
+            result = {k: r[k] for k in ("row", "email", "status", "error", "temporary_password") if r.get(k)}
+            if r.get("created"):
+                result["created"] = True
+                summary["created"] += 1
+            summary["rows"] += 1
+            summary["errors" if r["status"] == "error" else r["status"]] += 1
+            yield result
+    metrics.increment("roster.rows", summary["rows"])
+    yield {"summary": summary}
@@ -0,0 +1,212 @@
+# app/services/trace_recorder.py - Record-and-replay of chat streams
+#
+# Recording: set CHAT_TRACE_FILE=/path/traces.jsonl and every call to
+# get_llm_and_tts_stream_from_openai appends one compact JSON line:
+#
+#   {"v": 1, "id": "...", "ts": 1718000000.0, "prompt": "...", "vision": false,
+#    "history_len": 4, "cache": {"history": "miss", "llm": "miss"},
+#    "tokens": [[ms_since_llm_call, "text"], ...],
+#    "tts": [[ms_since_llm_call, latency_ms, audio_bytes, cache_hit], ...],
+#    "total_ms": 2150}
+#
+# CHAT_TRACE_REDACT=1 masks letters/digits in prompts and tokens while keeping
+# lengths, whitespace and punctuation, so segmentation behaves identically.
+#
+# Replay: LLM_PROVIDER=replay with CHAT_REPLAY_FILE (and optional
+# CHAT_REPLAY_SPEED) makes create_llm_client() return a ReplayOpenAIClient that
+# re-emits the recorded token timings and TTS latencies/sizes. See
+# benchmarks/replay_traces.py for the driver and diff report.
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import defaultdict, deque
+from types import SimpleNamespace
+from typing import Optional, List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+
+_write_lock = threading.Lock()
+
+
+def _redact(text: str) -> str:
+    return "".join("x" if ch.isalpha() else "0" if ch.isdigit() else ch for ch in text)
+
+
+class NullTrace:
+    """No-op recorder used when tracing is disabled."""
+    enabled = False
+
+    def history(self, length: int):
+        pass
+
+    def cache(self, namespace: str, outcome: str):
+        pass
+
+    def llm_started(self):
+        pass
+
+    def token(self, content: str):
+        pass
+
+    def tts(self, latency: float, size: int, hit: bool):
+        pass
+
+    def finish(self):
+        pass
+
+
+class ChatTrace(NullTrace):
+    """Collects timings for one streamed chat answer."""
+    enabled = True
+
+    def __init__(self, path: str, user_message: str, vision: bool, redact: bool = False):
+        self.path = path
+        self.redact = redact
+        self.started = time.time()
+        self.llm_t0 = None
+        self.record = {
+            "v": TRACE_VERSION,
+            "id": uuid.uuid4().hex[:12],
+            "ts": round(self.started, 3),
+            "prompt": _redact(user_message) if redact else user_message,
+            "vision": bool(vision),
+            "history_len": 0,
+            "cache": {},
+            "tokens": [],
+            "tts": [],
+        }
+
+    def _offset_ms(self) -> int:
+        base = self.llm_t0 if self.llm_t0 is not None else self.started
+        return int((time.time() - base) * 1000)
+
+    def history(self, length: int):
+        self.record["history_len"] = length
+
+    def cache(self, namespace: str, outcome: str):
+        self.record["cache"][namespace] = outcome
+
+    def llm_started(self):
+        self.llm_t0 = time.time()
+
+    def token(self, content: str):
+        self.record["tokens"].append([self._offset_ms(), _redact(content) if self.redact else content])
+
+    def tts(self, latency: float, size: int, hit: bool):
+        start_ms = self._offset_ms() - int(latency * 1000)
+        self.record["tts"].append([start_ms, int(latency * 1000), int(size), bool(hit)])
+
+    def finish(self):
+        self.record["total_ms"] = int((time.time() - self.started) * 1000)
+        line = json.dumps(self.record, separators=(",", ":"))
+        try:
+            with _write_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Failed to write chat trace: {e}")
+
+
+def start_trace(user_message: str, vision: bool):
+    """Return a ChatTrace if CHAT_TRACE_FILE is set, otherwise a NullTrace."""
+    path = os.getenv("CHAT_TRACE_FILE")
+    if not path:
+        return NullTrace()
+    return ChatTrace(path, user_message, vision, redact=os.getenv("CHAT_TRACE_REDACT") == "1")
+
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                traces.append(json.loads(line))
+    return traces
+
+
+# --- Replay ---
+
+_current = threading.local()
+
+
+class _ReplayCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model=None, messages=None, max_tokens=None, stream=False, **kwargs):
+        from app.services.llm_provider import _last_user_text
+        trace = self._client.next_trace(_last_user_text(messages))
+        _current.trace = trace
+        _current.tts_index = 0
+        return self._stream(model, trace)
+
+    def _stream(self, model, trace):
+        speed = self._client.speed
+        t0 = time.time()
+        for i, (offset_ms, content) in enumerate(trace["tokens"]):
+            wait = offset_ms / 1000.0 / speed - (time.time() - t0)
+            if wait > 0:
+                time.sleep(wait)
+            delta = SimpleNamespace(role="assistant" if i == 0 else None, content=content)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+
+
+class _ReplaySpeech:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model=None, voice=None, input="", response_format="mp3", **kwargs):
+        from app.services.llm_provider import _MockSpeechResponse, MP3_FRAME
+        trace = getattr(_current, "trace", None)
+        recorded = trace["tts"] if trace else []
+        if recorded:
+            # The i-th TTS call of the replayed request gets the i-th recorded
+            # latency/size; extra calls (e.g. after a segmentation change)
+            # reuse the last one so totals stay comparable.
+            _, latency_ms, size, _ = recorded[min(_current.tts_index, len(recorded) - 1)]
+            _current.tts_index += 1
+        else:
+            latency_ms, size = 250, 20 * len(MP3_FRAME)
+        time.sleep(latency_ms / 1000.0 / self._client.speed)
+        frames = max(1, size // len(MP3_FRAME))
+        return _MockSpeechResponse(MP3_FRAME * frames)
+
+
+class ReplayOpenAIClient:
+    """Re-emits recorded traces through the OpenAI client interface.
+
+    Requests are matched to traces by their prompt text; unmatched prompts and
+    repeated prompts cycle through the remaining traces in order.
+    """
+
+    def __init__(self, traces: List[Dict[str, Any]], speed: float = 1.0):
+        if not traces:
+            raise ValueError("No traces to replay")
+        self.speed = max(speed, 0.001)
+        self._lock = threading.Lock()
+        self._by_prompt = defaultdict(deque)
+        self._all = deque(traces)
+        for trace in traces:
+            self._by_prompt[trace.get("prompt", "")].append(trace)
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(self))
+        self.audio = SimpleNamespace(speech=_ReplaySpeech(self))
+
+    def next_trace(self, prompt: str) -> Dict[str, Any]:
+        with self._lock:
+            queue = self._by_prompt.get(prompt) or self._all
+            trace = queue[0]
+            queue.rotate(-1)
+            return trace
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("CHAT_REPLAY_FILE")
+        if not path:
+            raise ValueError("CHAT_REPLAY_FILE must be set when LLM_PROVIDER=replay")
+        return cls(load_traces(path), speed=float(os.getenv("CHAT_REPLAY_SPEED", "1.0")))
@@ -0,0 +1,157 @@
+# app/services/upload_store.py - Content-addressed storage for uploaded files
+#
+# Uploads used to be saved under a fresh uuid4 name per office, so the same
+# syllabus uploaded to 12 sections was stored and extracted 12 times. Files
+# are now stored once per content hash:
+#
+#   save_stream() copies the request stream to a temp file in UPLOAD_FOLDER/tmp
+#   in COPY_CHUNK pieces, computing the SHA-256 on the way, so the file is
+#   read once and never held in memory.
+#
+#   acquire() turns the temp file into a reference on stored_blob. A new hash
+#   is moved to UPLOAD_FOLDER/blobs/<aa>/<sha256>.<ext>; a known hash just
+#   gets ref_count + 1 and the temp file is dropped (no extra disk).
+#
+#   release() drops one reference when a Resource is deleted; the last one
+#   deletes the row, and the caller removes the file after committing.
+#
+# Each Resource records its content_hash. reuse_extraction() copies the text
+# chunks of an already processed Resource with the same hash, so a duplicate
+# upload is done at upload time (or when its job is claimed, if the first copy
+# was still being extracted) without running the extractor again.
+
+import os
+import uuid
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.services import metrics
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK = 1024 * 1024
+
+
+def save_stream(stream, upload_dir: str) -> Tuple[str, int, str]:
+    """Write `stream` to a temp file while hashing it. Returns (sha256, size, temp_path)."""
+    tmp_dir = os.path.join(upload_dir, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    temp_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.part")
+    digest, size = hashlib.sha256(), 0
+    try:
+        with open(temp_path, "wb") as out:
+            while True:
+                chunk = stream.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        discard(temp_path)
+        raise
+    return digest.hexdigest(), size, temp_path
+
+
+def blob_path(upload_dir: str, sha256: str, extension: str) -> str:
+    return os.path.join(upload_dir, "blobs", sha256[:2], f"{sha256}.{extension}")
+
+
+def discard(path: Optional[str]):
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        logger.error(f"Failed to delete file {path}: {e}")
+
+
+def acquire(session, upload_dir: str, sha256: str, size: int, temp_path: str, extension: str) -> Tuple[str, bool]:
+    """Add a reference to the blob for `sha256`, storing `temp_path` if it is new.
+
+    Returns (file_path, duplicate). Runs in the caller's transaction, so a
+    rolled-back upload also rolls back its reference."""
+    from app.models.db_models import StoredBlob
+
+    moved = None
+    for attempt in (1, 2):
+        existing = session.execute(
+            update(StoredBlob).where(StoredBlob.sha256 == sha256)
+            .values(ref_count=StoredBlob.ref_count + 1)
+            .returning(StoredBlob.file_path)).scalar_one_or_none()
+        if existing is not None:
+            if not os.path.exists(existing):  # row survived but the file was lost: restore it
+                logger.warning(f"Restoring missing blob {sha256}")
+                os.makedirs(os.path.dirname(existing), exist_ok=True)
+                os.replace(moved or temp_path, existing)
+            elif moved != existing:
+                discard(moved or temp_path)
+            metrics.increment("upload_store.duplicates")
+            metrics.increment("upload_store.bytes_saved", size)
+            return existing, True
+        path = blob_path(upload_dir, sha256, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        moved = path
+        try:
+            with session.begin_nested():
+                session.add(StoredBlob(sha256=sha256, file_path=path, size=size, ref_count=1))
+            metrics.increment("upload_store.blobs")
+            return path, False
+        except IntegrityError:
+            # A concurrent upload of the same content inserted the row first; take a reference on it
+            if attempt == 2:
+                owner = session.execute(select(StoredBlob.file_path)
+                                        .where(StoredBlob.sha256 == sha256)).scalar_one_or_none()
+                if owner != moved:  # the temp file is gone; don't leave it orphaned in blobs/
+                    discard(moved)
+                raise
+    raise RuntimeError(f"Could not store blob {sha256}")
+
+
+def release(session, sha256: Optional[str]) -> Optional[str]:
+    """Drop one reference. Returns the file path to delete after commit once
+    the last reference is gone, else None."""
+    from app.models.db_models import StoredBlob
+
+    if not sha256:
+        return None
+    session.execute(update(StoredBlob).where(StoredBlob.sha256 == sha256)
+                    .values(ref_count=StoredBlob.ref_count - 1))
+    path = session.execute(delete(StoredBlob).where(StoredBlob.sha256 == sha256, StoredBlob.ref_count <= 0)
+                           .returning(StoredBlob.file_path)).scalar_one_or_none()
+    return path
+
+
+def remove_if_unreferenced(session, sha256: str, path: Optional[str]):
+    """Delete a released blob's file unless a concurrent upload has re-created its row."""
+    from app.models.db_models import StoredBlob
+
+    if path and session.get(StoredBlob, sha256) is None:
+        discard(path)
+
+
+def reuse_extraction(session, resource) -> bool:
+    """Copy extraction results from a processed Resource with the same content. True if reused."""
+    from app.models.db_models import Resource
+    from app.services import resource_text
+
+    if not resource.content_hash or resource.processed:
+        return False
+    source_id = session.scalar(
+        select(Resource.id).where(Resource.content_hash == resource.content_hash,
+                                  Resource.processed.is_(True), Resource.id != resource.id)
+        .limit(1))
+    if source_id is None:
+        return False
+    resource_text.clear_chunks(session, resource.id)
+    if not resource_text.copy_chunks(session, source_id, resource.id):
+        # Extracted before text was chunked: copy the column inside the database
+        session.execute(update(Resource).where(Resource.id == resource.id).values(
+            extracted_text=select(Resource.extracted_text).where(Resource.id == source_id).scalar_subquery()))
+    resource.processed = True
+    metrics.increment("upload_store.extractions_reused")
+    return True
@@ -0,0 +1,230 @@
+# app/services/video.py - Slide text from lecture videos via keyframes and OCR
+#
+# extract_from_video used to return a placeholder. A lecture recording is
+# mostly slides, so its text is recovered without looking at every frame:
+#
+#   sample_frames()    decodes the video locally at one frame per
+#                      VIDEO_SAMPLE_SECONDS (2), as THUMB_SIZE (160x90)
+#                      grayscale thumbnails. With ffmpeg only the video's
+#                      own keyframes are decoded (-skip_frame nokey), so
+#                      this pass costs little even for long recordings;
+#                      OpenCV (cv2) is used when ffmpeg is not installed.
+#   select_keyframes() keeps the samples where the picture has changed by
+#                      more than VIDEO_SCENE_THRESHOLD (mean absolute
+#                      difference, 0-1) from the last kept one, once it has
+#                      settled (the next sample is close to it), so slide
+#                      transitions and animations yield one frame per slide
+#   OCR                only those keyframes are grabbed at full resolution and
+#                      sent through ocr.ocr_many() in batches of
+#                      VIDEO_OCR_BATCH (16), in parallel
+#
+# So the expensive part scales with the number of distinct slides, not the
+# length of the video. Each keyframe becomes a Segment('keyframe', second,
+# "[mm:ss] text"); a keyframe whose text repeats the previous one's (the
+# speaker moved in front of the same slide) is dropped, and so is one that
+# cannot be grabbed (video.keyframes_skipped) rather than failing the video.
+#
+# Metrics: video.frames_sampled, video.keyframes, video.keyframes_skipped.
+
+import os
+import shutil
+import contextlib
+import logging
+import tempfile
+import subprocess
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional
+
+from app.services import metrics, ocr
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SECONDS = float(os.getenv("VIDEO_SAMPLE_SECONDS", "2"))
+SCENE_THRESHOLD = float(os.getenv("VIDEO_SCENE_THRESHOLD", "0.06"))
+OCR_BATCH = int(os.getenv("VIDEO_OCR_BATCH", "16"))
+THUMB_SIZE = (160, 90)
+GRAB_TIMEOUT = 60
+
+# seconds from the start; thumb is THUMB_SIZE grayscale pixels, one byte each
+Frame = namedtuple("Frame", "seconds thumb")
+
+
+def backend() -> Optional[str]:
+    """'ffmpeg', 'cv2' or None when the video cannot be decoded here."""
+    if shutil.which("ffmpeg"):
+        return "ffmpeg"
+    try:
+        import cv2  # noqa: F401
+        return "cv2"
+    except ImportError:
+        return None
+
+
+def duration(path: str) -> Optional[float]:
+    """Length of the video in seconds, if it can be determined."""
+    if backend() == "ffmpeg":
+        if not shutil.which("ffprobe"):
+            return None
+        try:
+            out = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                                  "-of", "default=noprint_wrappers=1:nokey=1", path],
+                                 capture_output=True, text=True, timeout=GRAB_TIMEOUT).stdout
+            return float(out.strip()) or None
+        except (ValueError, subprocess.SubprocessError, OSError):
+            return None
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        fps, frames = capture.get(cv2.CAP_PROP_FPS), capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        return frames / fps if fps and frames else None
+    finally:
+        capture.release()
+
+
+def _sample_ffmpeg(path: str, interval: float) -> Iterator[Frame]:
+    width, height = THUMB_SIZE
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-skip_frame", "nokey", "-i", path,
+               "-an", "-sn", "-vf", f"fps=1/{interval},scale={width}:{height},format=gray",
+               "-f", "rawvideo", "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        index, size = 0, width * height
+        while True:
+            thumb = process.stdout.read(size)
+            if len(thumb) < size:
+                break
+            yield Frame(index * interval, thumb)
+            index += 1
+    finally:
+        process.kill()
+        process.stdout.close()
+        process.wait()
+    if index == 0 and process.returncode not in (0, -9):
+        raise ValueError(f"ffmpeg could not decode {os.path.basename(path)}")
+
+
+def _sample_cv2(path: str, interval: float) -> Iterator[Frame]:
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"OpenCV could not open {os.path.basename(path)}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, round(fps * interval))
+        index = 0
+        while True:
+            # grab() skips frames without converting them; only samples are retrieved
+            ok = capture.grab()
+            if not ok:
+                break
+            if index % step == 0:
+                ok, image = capture.retrieve()
+                if not ok:
+                    break
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                yield Frame(index / fps, cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA).tobytes())
+            index += 1
+    finally:
+        capture.release()
+
+
+def sample_frames(path: str, interval: Optional[float] = None) -> Iterator[Frame]:
+    """Grayscale thumbnails every `interval` (VIDEO_SAMPLE_SECONDS) seconds."""
+    interval = interval or SAMPLE_SECONDS
+    name = backend()
+    if name is None:
+        raise ImportError("ffmpeg or OpenCV is required to decode video")
+    frames = _sample_ffmpeg(path, interval) if name == "ffmpeg" else _sample_cv2(path, interval)
+    for frame in frames:
+        metrics.increment("video.frames_sampled")
+        yield frame
+
+
+def grab_frame(path: str, seconds: float, out_path: str):
+    """Write the full-resolution frame at `seconds` to `out_path` (PNG)."""
+    if backend() == "ffmpeg":
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-ss", f"{seconds:.3f}", "-i", path,
+                        "-frames:v", "1", "-y", out_path],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=GRAB_TIMEOUT)
+        return
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        capture.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+        ok, image = capture.read()
+        if not ok or not cv2.imwrite(out_path, image):
+            raise ValueError(f"No frame at {seconds:.1f}s in {os.path.basename(path)}")
+    finally:
+        capture.release()
+
+
+def frame_difference(a: bytes, b: bytes) -> float:
+    """Mean absolute difference of two thumbnails, from 0 (same) to 1."""
+    from PIL import Image, ImageChops, ImageStat
+
+    first, second = (Image.frombytes("L", THUMB_SIZE, thumb) for thumb in (a, b))
+    return ImageStat.Stat(ImageChops.difference(first, second)).mean[0] / 255
+
+
+def select_keyframes(frames: Iterable[Frame], threshold: Optional[float] = None) -> Iterator[Frame]:
+    """Frames that start a new scene, taken once the picture has settled."""
+    threshold = SCENE_THRESHOLD if threshold is None else threshold
+    keyframe = previous = None
+    for frame in frames:
+        if previous is not None and frame_difference(previous.thumb, frame.thumb) <= threshold:
+            if keyframe is None or frame_difference(keyframe.thumb, frame.thumb) > threshold:
+                keyframe = frame
+                yield frame
+        previous = frame
+    if keyframe is None and previous is not None:  # too short (or too busy) to settle
+        yield previous
+
+
+def timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def iter_keyframe_segments(path: str, progress=None) -> Iterator:
+    """Segment('keyframe', second, "[mm:ss] text") per distinct slide, in order.
+    progress, if given, is called as progress(fraction, message)."""
+    from app.utils.file_processor import Segment
+
+    total = duration(path) if progress else None
+    last_text = None
+
+    def ocr_batch(batch, work_dir):
+        nonlocal last_text
+        grabbed = []
+        for index, frame in enumerate(batch):
+            out_path = os.path.join(work_dir, f"{index}.png")
+            try:
+                grab_frame(path, frame.seconds, out_path)
+            except Exception as e:  # ffmpeg exit status, cv2 errors: lose this slide, not the video
+                logger.warning(f"Skipping keyframe at {timestamp(frame.seconds)} of {os.path.basename(path)}: {e}")
+                metrics.increment("video.keyframes_skipped")
+                continue
+            grabbed.append((frame, out_path))
+        for (frame, _), result in zip(grabbed, ocr.ocr_many(out_path for _, out_path in grabbed)):
+            with contextlib.suppress(OSError):
+                os.remove(result.path)
+            text = result.text if result.status in ("ok", "cached") else None
+            if text and text != last_text:
+                last_text = text
+                yield Segment('keyframe', int(frame.seconds), f"[{timestamp(frame.seconds)}] {text}")
+
+    with tempfile.TemporaryDirectory(prefix="keyframes-") as work_dir:
+        batch = []
+        for frame in select_keyframes(sample_frames(path)):
+            metrics.increment("video.keyframes")
+            batch.append(frame)
+            if len(batch) >= OCR_BATCH:
+                yield from ocr_batch(batch, work_dir)
+                batch = []
+                if total:
+                    progress(min(frame.seconds / total, 1.0), f"Video at {timestamp(frame.seconds)}")
+        if batch:
+            yield from ocr_batch(batch, work_dir)
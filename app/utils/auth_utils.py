@@ -2,8 +2,10 @@ import jwt
 import datetime
 import secrets
 import string
+from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask import current_app
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 
 def hash_password(password):
     return generate_password_hash(password)
@@ -40,4 +42,24 @@ def is_token_expired(expiry_time):
     """Check if a token has expired"""
     if not expiry_time:
         return True
-    return datetime.datetime.utcnow() > expiry_time
\ No newline at end of file
+    return datetime.datetime.utcnow() > expiry_time
+
+def is_admin(user_id):
+    """Admins are configured by email (ADMIN_EMAILS) rather than by role."""
+    admin_emails = current_app.config.get('ADMIN_EMAILS')
+    if not user_id or not admin_emails:
+        return False
+    from app import db
+    from app.models.db_models import User
+    user = db.session.get(User, int(user_id))
+    return bool(user and user.email.lower() in admin_emails)
+
+def admin_required(view):
+    """Like @jwt_required(), but also requires the caller to be an admin."""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not is_admin(get_jwt_identity()):
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -1,52 +1,159 @@
 import os
+import codecs
 import mimetypes
+import threading
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def extract_text_from_file(file_path, file_type):
+# Extractors are generators of Segments (a page, slide or section of text), so
+# callers can store and report progress per segment instead of building one
+# big string. extract_text_from_file() joins them for callers that want text.
+Segment = namedtuple("Segment", "kind number text")
+
+SECTION_CHARS = int(os.getenv("EXTRACT_SECTION_CHARS", "8000"))  # text/docx section size
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or os.cpu_count() or 1
+
+def iter_text_segments(file_path, file_type, progress=None):
+    """
+    Yield Segment(kind, number, text) for a file, in document order
+    progress, if given, is called as progress(fraction, message) for multi-page files
+    Raises on unreadable files; extract_text_from_file() is the forgiving wrapper
+    """
+    if file_type == 'text':
+        yield from iter_txt_sections(file_path)
+    elif file_type == 'pdf':
+        yield from iter_pdf_pages(file_path, progress)
+    elif file_type == 'document':
+        yield from iter_doc_sections(file_path)
+    elif file_type == 'presentation':
+        yield from iter_ppt_slides(file_path, progress)
+    elif file_type == 'image':
+        yield Segment('image', 1, extract_from_image(file_path))
+    elif file_type == 'video':
+        yield from iter_video_segments(file_path, progress)
+
+def join_segments(segments):
+    """Text of segments as one string, or None if there is none"""
+    return "\n".join(segment.text for segment in segments if segment.text).strip() or None
+
+def extract_text_from_file(file_path, file_type, progress=None):
     """
     Extract text from various file types
     Returns extracted text or None if extraction fails
+    progress, if given, is called as progress(fraction, message) for multi-page files
     """
     try:
-        if file_type == 'text':
-            return extract_from_txt(file_path)
-        elif file_type == 'pdf':
-            return extract_from_pdf(file_path)
-        elif file_type == 'document':
-            return extract_from_doc(file_path)
-        elif file_type == 'presentation':
-            return extract_from_ppt(file_path)
-        elif file_type == 'image':
-            return extract_from_image(file_path)
-        elif file_type == 'video':
-            return extract_from_video(file_path)
-        else:
-            return None
+        return join_segments(iter_text_segments(file_path, file_type, progress))
+    except ImportError as e:
+        print(f"Extraction dependency missing for {file_path}: {e}")
+        return None
     except Exception as e:
         print(f"Error extracting text from {file_path}: {e}")
         return None
 
+def _sections(pieces, kind='section', separator="\n"):
+    """Group consecutive pieces of text into Segments of about SECTION_CHARS"""
+    buffer, size, number = [], 0, 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= SECTION_CHARS:
+            number += 1
+            yield Segment(kind, number, separator.join(buffer))
+            buffer, size = [], 0
+    if buffer:
+        yield Segment(kind, number + 1, separator.join(buffer))
+
+def _text_encoding(file_path):
+    """'utf-8' if the whole file decodes as utf-8, else 'latin-1' (checked incrementally)"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as file:
+            for raw in iter(lambda: file.read(1024 * 1024), b''):
+                decoder.decode(raw)
+        decoder.decode(b'', final=True)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def _read_text(file_path):
+    """A text file in line-sized pieces (long lines split at SECTION_CHARS bytes),
+    utf-8 with a latin-1 fallback for the whole file, read incrementally"""
+    decoder = codecs.getincrementaldecoder(_text_encoding(file_path))()
+    with open(file_path, 'rb') as file:
+        for raw in iter(lambda: file.readline(SECTION_CHARS), b''):
+            yield decoder.decode(raw).replace('\r\n', '\n')
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def iter_txt_sections(file_path):
+    """Sections of about SECTION_CHARS of a plain text file, split at line ends
+    (a line longer than SECTION_CHARS is split too)"""
+    for segment in _sections(_read_text(file_path), separator=""):
+        yield segment._replace(text=segment.text[:-1] if segment.text.endswith('\n') else segment.text)
+
 def extract_from_txt(file_path):
     """Extract text from plain text files"""
+    return join_segments(iter_txt_sections(file_path))
+
+def _pdf_page_count(file_path):
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def _pdf_page_range(file_path, start, stop):
+    """Text of pages [start, stop); runs in a pool process with its own reader"""
+    import PyPDF2
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+def pool_context():
+    # fork is cheap, but only safe from a process without other threads
+    # (the extraction worker child); a threaded web process uses spawn
+    if threading.active_count() == 1 and 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context('spawn')
+
+def iter_pdf_pages(file_path, progress=None, workers=None):
+    """
+    Pages of a PDF, in order, extracted PDF_PAGES_PER_TASK at a time across
+    PDF_EXTRACT_WORKERS processes. At most two ranges per worker are in
+    flight, so memory stays bounded however long the document is.
+    """
+    total = _pdf_page_count(file_path)
+    workers = min(PDF_EXTRACT_WORKERS if workers is None else workers, -(-total // PDF_PAGES_PER_TASK))
+    ranges = deque((start, min(start + PDF_PAGES_PER_TASK, total)) for start in range(0, total, PDF_PAGES_PER_TASK))
+    if workers <= 1:
+        pool, submit = None, lambda start, stop: _pdf_page_range(file_path, start, stop)
+    else:
+        pool = ProcessPoolExecutor(workers, mp_context=pool_context())
+        submit = lambda start, stop: pool.submit(_pdf_page_range, file_path, start, stop)
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except UnicodeDecodeError:
-        # Try with different encoding
-        with open(file_path, 'r', encoding='latin-1') as file:
-            return file.read()
+        in_flight = deque()
+        while ranges or in_flight:
+            while ranges and len(in_flight) < max(workers, 1) * 2:
+                start, stop = ranges.popleft()
+                in_flight.append((start, submit(start, stop)))
+            start, result = in_flight.popleft()
+            texts = result.result() if pool else result
+            for offset, text in enumerate(texts):
+                yield Segment('page', start + offset + 1, text)
+            if progress:
+                done = start + len(texts)
+                progress(done / total, f"page {done}/{total}")
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
 
-def extract_from_pdf(file_path):
+def extract_from_pdf(file_path, progress=None):
     """Extract text from PDF files using PyPDF2"""
     try:
-        import PyPDF2
-        
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text.strip()
+        return join_segments(iter_pdf_pages(file_path, progress))
     except ImportError:
         print("PyPDF2 not installed. Install with: pip install PyPDF2")
         return None
@@ -54,16 +161,29 @@ def extract_from_pdf(file_path):
         print(f"PDF extraction error: {e}")
         return None
 
+def iter_doc_sections(file_path):
+    """Sections of a Word document: a new one starts at each heading or after SECTION_CHARS"""
+    from docx import Document
+
+    doc = Document(file_path)
+    # paragraph.style resolves the style part on every call; match style ids instead
+    heading_ids = {style.style_id for style in doc.styles if (style.name or "").startswith("Heading")}
+    buffer, size, number = [], 0, 0
+    for paragraph in doc.paragraphs:
+        is_heading = paragraph._p.style in heading_ids
+        if buffer and (is_heading or size >= SECTION_CHARS):
+            number += 1
+            yield Segment('section', number, "\n".join(buffer))
+            buffer, size = [], 0
+        buffer.append(paragraph.text)
+        size += len(paragraph.text)
+    if buffer:
+        yield Segment('section', number + 1, "\n".join(buffer))
+
 def extract_from_doc(file_path):
     """Extract text from Word documents using python-docx"""
     try:
-        from docx import Document
-        
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text.strip()
+        return join_segments(iter_doc_sections(file_path))
     except ImportError:
         print("python-docx not installed. Install with: pip install python-docx")
         return None
@@ -71,19 +191,21 @@ def extract_from_doc(file_path):
         print(f"Word document extraction error: {e}")
         return None
 
-def extract_from_ppt(file_path):
+def iter_ppt_slides(file_path, progress=None):
+    """One segment per slide of a PowerPoint presentation"""
+    from pptx import Presentation
+
+    prs = Presentation(file_path)
+    total = len(prs.slides)
+    for number, slide in enumerate(prs.slides, start=1):
+        yield Segment('slide', number, "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text")))
+        if progress:
+            progress(number / total, f"slide {number}/{total}")
+
+def extract_from_ppt(file_path, progress=None):
     """Extract text from PowerPoint presentations using python-pptx"""
     try:
-        from pptx import Presentation
-        
-        prs = Presentation(file_path)
-        text = ""
-        
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
-        return text.strip()
+        return join_segments(iter_ppt_slides(file_path, progress))
     except ImportError:
         print("python-pptx not installed. Install with: pip install python-pptx")
         return None
@@ -92,33 +214,30 @@ def extract_from_ppt(file_path):
         return None
 
 def extract_from_image(file_path):
-    """Extract text from images using OCR (Tesseract)"""
-    try:
-        from PIL import Image
-        import pytesseract
-        
-        # Open image
-        image = Image.open(file_path)
-        
-        # Extract text using OCR
-        text = pytesseract.image_to_string(image)
-        return text.strip()
-    except ImportError:
-        print("OCR dependencies not installed. Install with: pip install pillow pytesseract")
-        print("Also install Tesseract OCR: https://github.com/tesseract-ocr/tesseract")
-        return f"[IMAGE: {os.path.basename(file_path)} - OCR not available]"
-    except Exception as e:
-        print(f"Image OCR extraction error: {e}")
-        return f"[IMAGE: {os.path.basename(file_path)} - text extraction failed]"
+    """Extract text from images using OCR (Tesseract), see app/services/ocr.py"""
+    from app.services import ocr
+
+    return ocr.text_or_placeholder(ocr.ocr_image(file_path))
+
+def iter_video_segments(file_path, progress=None):
+    """Slide text of a video, one Segment per keyframe (see app/services/video.py)"""
+    from app.services import video
+    if video.backend() is None:
+        yield Segment('video', 1, _video_placeholder(file_path, "no video decoder available"))
+        return
+    found = False
+    for segment in video.iter_keyframe_segments(file_path, progress):
+        found = True
+        yield segment
+    if not found:
+        yield Segment('video', 1, _video_placeholder(file_path, "no slide text found"))
+
+def _video_placeholder(file_path, reason):
+    return f"[VIDEO: {os.path.basename(file_path)} - {reason}]"
 
 def extract_from_video(file_path):
-    """Extract metadata/transcript from video files"""
-    # For now, just return a placeholder
-    # In the future, you could integrate with:
-    # - Speech-to-text APIs (OpenAI Whisper, Google Speech-to-Text)
-    # - Video frame analysis for slides/text
-    filename = os.path.basename(file_path)
-    return f"[VIDEO: {filename} - transcript extraction not yet implemented]"
+    """Extract slide text from video keyframes"""
+    return join_segments(iter_video_segments(file_path))
 
 def get_file_summary(file_path, extracted_text):
     """
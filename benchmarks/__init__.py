@@ -0,0 +1,3 @@
+# benchmarks/ - Offline benchmark and load tools for OfficeHours AI
+#
+# Run modules from the project root, e.g. `python -m benchmarks.replay_traces`.
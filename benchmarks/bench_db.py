@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Database throughput under concurrent chat load.
+
+    python -m benchmarks.bench_db                                  # all SQLite profiles
+    python -m benchmarks.bench_db --profiles wal+writer --readers 16 --writers 8
+    python -m benchmarks.bench_db --url postgresql://user:pw@localhost/officehours_bench
+
+Reader threads load LLM chat history (get_chat_history_for_llm, Redis off)
+for random sessions; writer threads append chat messages. Each profile runs
+against a fresh database seeded with --sessions sessions of --seed-messages
+messages and reports reads/sec, writes/sec, latency percentiles and errors
+such as "database is locked".
+
+Profiles (SQLite; with --url only the write mode applies):
+    baseline     rollback journal, synchronous=FULL, reads share the write pool,
+                 one commit per message (the pre-WAL configuration)
+    wal          WAL, synchronous=NORMAL, separate read engine, one commit per message
+    wal+writer   as wal, with messages group-committed by the MessageWriter
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from typing import Dict, Any, List
+
+from benchmarks.common import summarize, report_meta, write_report
+
+PROFILES = {
+    "baseline": ({"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "DATABASE_SEPARATE_READS": "0"}, "direct"),
+    "wal": ({"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL", "DATABASE_SEPARATE_READS": "1"}, "direct"),
+    "wal+writer": ({"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL", "DATABASE_SEPARATE_READS": "1"}, "behind"),
+}
+
+
+def build_app(url: str, sessions: int, seed_messages: int):
+    os.environ["DATABASE_URL"] = url
+    from app import create_app, db
+    from app.models.db_models import User, Office, ChatSession, ChatMessage
+    from benchmarks import corpus
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(name="DB Bench", email="db-bench@example.com", password="x", role="student")
+        db.session.add(user)
+        db.session.flush()
+        office = Office(name="DB Bench", join_code="DBBNCH", owner_id=user.id)
+        db.session.add(office)
+        db.session.flush()
+        session_ids = []
+        for _ in range(sessions):
+            session = ChatSession(user_id=user.id, office_id=office.id)
+            db.session.add(session)
+            db.session.flush()
+            session_ids.append(session.id)
+            db.session.execute(ChatMessage.__table__.insert(), [
+                {"session_id": session.id, "sender": "user" if i % 2 == 0 else "ai",
+                 "message": corpus.make_text(40, seed=i)}
+                for i in range(seed_messages)
+            ])
+        db.session.commit()
+    return app, session_ids
+
+
+def run_load(app, session_ids: List[int], readers: int, writers: int, duration: float, write_mode: str) -> Dict[str, Any]:
+    from app import db
+    from app.models.db_models import ChatMessage
+    from app.routes import chat
+    from app.services.message_writer import MessageWriter
+
+    chat.redis_client = None
+    writer = MessageWriter(app) if write_mode == "behind" else None
+    read_latencies, write_latencies = [], []
+    errors = {"read": 0, "write": 0}
+    error_samples = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def record_error(kind, e):
+        with lock:
+            errors[kind] += 1
+            if len(error_samples) < 5:
+                error_samples.append(f"{kind}: {e}")
+
+    def reader(seed):
+        rng = random.Random(seed)
+        with app.app_context():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    chat.get_chat_history_for_llm(app, rng.choice(session_ids))
+                except Exception as e:
+                    record_error("read", e)
+                    continue
+                with lock:
+                    read_latencies.append(time.perf_counter() - start)
+
+    def write_direct(session_id, text):
+        db.session.add(ChatMessage(session_id=session_id, sender="user", message=text))
+        db.session.commit()
+
+    def write_behind(session_id, text):
+        if not writer.submit(session_id, "user", text).wait(10):
+            raise RuntimeError("write not acknowledged")
+
+    def write_loop(seed):
+        rng = random.Random(seed)
+        write = write_behind if writer else write_direct
+        with app.app_context():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    write(rng.choice(session_ids), f"benchmark message {rng.random()}")
+                except Exception as e:
+                    db.session.rollback()
+                    record_error("write", e)
+                    continue
+                with lock:
+                    write_latencies.append(time.perf_counter() - start)
+            db.session.remove()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(1000 + i,)) for i in range(writers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    if writer:
+        writer.close()
+
+    return {
+        "reads_per_sec": round(len(read_latencies) / elapsed, 1),
+        "writes_per_sec": round(len(write_latencies) / elapsed, 1),
+        "read_latency_ms": summarize(v * 1000 for v in read_latencies),
+        "write_latency_ms": summarize(v * 1000 for v in write_latencies),
+        "errors": errors,
+        "error_samples": error_samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write DB benchmark")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma separated: " + ", ".join(PROFILES))
+    parser.add_argument("--url", help="Benchmark this database URL instead of temporary SQLite files (it is wiped)")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per profile")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--seed-messages", type=int, default=200, help="Messages per session before the run")
+    parser.add_argument("--out", default="db_report.json")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    report = {"meta": report_meta(tool="bench_db", readers=args.readers, writers=args.writers,
+                                  duration=args.duration, url=args.url or "sqlite (temporary)"),
+              "profiles": {}}
+    print(f"  {'profile':<12} {'reads/s':>9} {'writes/s':>9} {'read p99 ms':>12} {'write p99 ms':>13} {'errors':>7}")
+    for name in args.profiles.split(","):
+        env, write_mode = PROFILES[name]
+        os.environ.update(env)
+        with tempfile.TemporaryDirectory() as workdir:
+            url = args.url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            app, session_ids = build_app(url, args.sessions, args.seed_messages)
+            result = run_load(app, session_ids, args.readers, args.writers, args.duration, write_mode)
+            app.extensions["read_engine"].dispose()
+        report["profiles"][name] = result
+        errors = result["errors"]["read"] + result["errors"]["write"]
+        print(f"  {name:<12} {result['reads_per_sec']:>9.1f} {result['writes_per_sec']:>9.1f} "
+              f"{result['read_latency_ms'].get('p99', 0):>12.1f} {result['write_latency_ms'].get('p99', 0):>13.1f} {errors:>7}")
+    write_report(args.out, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
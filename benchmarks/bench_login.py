@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Login storm: login throughput and chat latency while --students log in at once.
+
+    python -m benchmarks.bench_login                       # inline vs pool
+    python -m benchmarks.bench_login --profiles pool --students 300 --hash-workers 4
+
+Each profile starts a fresh SQLite database with --students accounts and one
+chat session. --chat-clients threads keep requesting a page of chat history
+(a request that does no hashing) for the whole run. After --warmup seconds
+every student thread logs in at the same moment; a 503 is retried after its
+Retry-After, like the frontend does. Reported per profile: time until every
+student is logged in, logins/sec, 503s, login latency and chat latency
+before vs during the storm.
+
+Profiles:
+    inline   hashing on the request threads, unbounded (the old behaviour)
+    pool     hashing in --hash-workers processes, at most --hash-queue in flight
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from typing import Dict, Any
+
+from benchmarks.common import summarize, report_meta, write_report
+
+PASSWORD = "correct horse battery staple"
+
+
+def build_app(url: str, students: int, workers: int, queue: int):
+    os.environ.update({"DATABASE_URL": url, "PASSWORD_HASH_WORKERS": str(workers),
+                       "PASSWORD_HASH_QUEUE": str(queue)})
+    from app import create_app, db
+    from app.models.db_models import User, Office, ChatSession, ChatMessage
+    from app.services.password_hasher import get_password_hasher
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        hashed = get_password_hasher(app).hash(PASSWORD)  # current parameters: no upgrades during the run
+        db.session.execute(User.__table__.insert(), [
+            {"name": f"Student {i}", "email": f"storm{i}@example.edu", "password": hashed, "role": "student"}
+            for i in range(students)
+        ])
+        office = Office(name="Storm", join_code="STORM1", owner_id=1)
+        db.session.add(office)
+        db.session.flush()
+        session = ChatSession(user_id=1, office_id=office.id)
+        db.session.add(session)
+        db.session.flush()
+        db.session.execute(ChatMessage.__table__.insert(), [
+            {"session_id": session.id, "sender": "user" if i % 2 == 0 else "ai", "message": f"message {i}"}
+            for i in range(200)
+        ])
+        db.session.commit()
+        session_id = session.id
+    return app, session_id
+
+
+def run_storm(app, session_id: int, students: int, chat_clients: int, warmup: float) -> Dict[str, Any]:
+    from flask_jwt_extended import create_access_token
+    from app.routes import chat
+
+    chat.redis_client = None
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='1', additional_claims={'role': 'student'})}"}
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    storm = {"start": None}
+    chat_before, chat_during, login_latencies = [], [], []
+    counts = {"ok": 0, "busy": 0, "errors": 0}
+
+    def chat_client():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get(f"/chat/history/{session_id}?limit=50", headers=headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                (chat_during if storm["start"] and start >= storm["start"] else chat_before).append(elapsed)
+                if response.status_code != 200:
+                    counts["errors"] += 1
+
+    barrier = threading.Barrier(students + 1)
+
+    def student(i):
+        client = app.test_client()
+        barrier.wait()
+        start = time.perf_counter()
+        while True:
+            response = client.post("/auth/login", json={"email": f"storm{i}@example.edu", "password": PASSWORD})
+            if response.status_code != 503:
+                break
+            with lock:
+                counts["busy"] += 1
+            time.sleep(float(response.headers.get("Retry-After", 1)) * 0.25)
+        with lock:
+            login_latencies.append((time.perf_counter() - start) * 1000)
+            counts["ok" if response.status_code == 200 else "errors"] += 1
+
+    chatters = [threading.Thread(target=chat_client) for _ in range(chat_clients)]
+    students_threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    for t in chatters + students_threads:
+        t.start()
+    time.sleep(warmup)
+    storm["start"] = time.perf_counter()
+    barrier.wait()
+    for t in students_threads:
+        t.join()
+    storm_seconds = time.perf_counter() - storm["start"]
+    stop.set()
+    for t in chatters:
+        t.join()
+
+    return {
+        "storm_seconds": round(storm_seconds, 2),
+        "logins_per_sec": round(counts["ok"] / storm_seconds, 1),
+        "logins": counts["ok"],
+        "busy_503": counts["busy"],
+        "errors": counts["errors"],
+        "login_latency_ms": summarize(login_latencies),
+        "chat_latency_before_ms": summarize(chat_before),
+        "chat_latency_during_ms": summarize(chat_during),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login storm benchmark")
+    parser.add_argument("--profiles", default="inline,pool", help="Comma separated: inline, pool")
+    parser.add_argument("--students", type=int, default=100, help="Simultaneous logins")
+    parser.add_argument("--chat-clients", type=int, default=4)
+    parser.add_argument("--warmup", type=float, default=3.0, help="Seconds of chat traffic before the storm")
+    parser.add_argument("--hash-workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--hash-queue", type=int, default=16)
+    parser.add_argument("--out", default="login_report.json")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    report = {"meta": report_meta(tool="bench_login", students=args.students, chat_clients=args.chat_clients,
+                                  hash_workers=args.hash_workers, hash_queue=args.hash_queue, cpus=os.cpu_count()),
+              "profiles": {}}
+    print(f"  {'profile':<8} {'storm s':>8} {'logins/s':>9} {'503s':>6} {'login p99':>10} "
+          f"{'chat p99 before':>16} {'chat p99 during':>16}")
+    for name in args.profiles.split(","):
+        workers, queue = (0, args.students * 10) if name == "inline" else (args.hash_workers, args.hash_queue)
+        with tempfile.TemporaryDirectory() as workdir:
+            app, session_id = build_app(f"sqlite:///{os.path.join(workdir, 'login.db')}", args.students, workers, queue)
+            result = run_storm(app, session_id, args.students, args.chat_clients, args.warmup)
+            app.extensions["password_hasher"].close()
+            app.extensions["read_engine"].dispose()
+        report["profiles"][name] = result
+        print(f"  {name:<8} {result['storm_seconds']:>8.2f} {result['logins_per_sec']:>9.1f} {result['busy_503']:>6} "
+              f"{result['login_latency_ms'].get('p99', 0):>10.0f} {result['chat_latency_before_ms'].get('p99', 0):>16.1f} "
+              f"{result['chat_latency_during_ms'].get('p99', 0):>16.1f}")
+    write_report(args.out, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Check that every route's queries use an index, and time them on a large dataset.
+
+    python -m benchmarks.dataset --url sqlite:///bench_large.db --profile large
+    python -m benchmarks.bench_queries --url sqlite:///bench_large.db
+
+For each query the routes issue (built with the same ORM expressions), runs
+EXPLAIN (EXPLAIN QUERY PLAN on SQLite), fails if the plan scans the table
+instead of using an index, then times --iterations executions with random
+parameters. Exits non-zero when any plan regresses to a full scan, so it can
+run in CI against the small profile:
+
+    python -m benchmarks.dataset --url sqlite:///ci.db --profile small
+    python -m benchmarks.bench_queries --url sqlite:///ci.db --iterations 50
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Tuple
+
+from sqlalchemy import select, func, text, tuple_
+
+from benchmarks.common import summarize, report_meta, write_report
+
+CURSOR_TIMESTAMP = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def route_queries(ids: Dict[str, int]) -> List[Tuple[str, str, Callable[[random.Random], Any]]]:
+    """(name, table expected to be searched by index, rng -> statement)."""
+    from app.models.db_models import User, Office, Enrollment, ChatSession, ChatMessage, Resource
+
+    def user_id(rng):
+        return rng.randint(1, ids["users"])
+
+    def office_id(rng):
+        return rng.randint(1, ids["offices"])
+
+    def session_id(rng):
+        return rng.randint(1, ids["sessions"])
+
+    return [
+        ("auth.login: user by email", "user",
+         lambda rng: select(User).where(User.email == f"user{user_id(rng) - 1}@example.edu")),
+        ("office.roster: users by lower(email)", "user",
+         lambda rng: select(User.id, User.email, User.role).where(
+             func.lower(User.email).in_([f"user{user_id(rng) - 1}@example.edu" for _ in range(50)]))),
+        ("office.join: office by join code", "office",
+         lambda rng: select(Office).where(Office.join_code == f"{office_id(rng) - 1:06X}")),
+        ("chat.start_session: enrollment check", "enrollment",
+         lambda rng: select(Enrollment).where(Enrollment.user_id == user_id(rng),
+                                              Enrollment.office_id == office_id(rng)).limit(1)),
+        ("chat.start_session: session lookup", "chat_session",
+         lambda rng: select(ChatSession).where(ChatSession.user_id == user_id(rng),
+                                               ChatSession.office_id == office_id(rng)).limit(1)),
+        ("enrollments of a user", "enrollment",
+         lambda rng: select(Enrollment).where(Enrollment.user_id == user_id(rng))),
+        ("chat.history: messages of a session", "chat_message",
+         lambda rng: select(ChatMessage).where(ChatMessage.session_id == session_id(rng))
+         .order_by(ChatMessage.timestamp, ChatMessage.id)),
+        ("chat.history: latest page", "chat_message",
+         lambda rng: select(ChatMessage).where(ChatMessage.session_id == session_id(rng))
+         .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(50)),
+        ("chat.history: page before a cursor", "chat_message",
+         lambda rng: select(ChatMessage).where(
+             ChatMessage.session_id == session_id(rng),
+             tuple_(ChatMessage.timestamp, ChatMessage.id) < tuple_(CURSOR_TIMESTAMP, 2 ** 31))
+         .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(50)),
+        ("upload.list: resources of an office", "resource",
+         lambda rng: select(Resource).where(Resource.office_id == office_id(rng))),
+    ]
+
+
+def explain(conn, dialect: str, sql: str) -> List[str]:
+    if dialect == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+
+def full_scan(plan: List[str], table: str, dialect: str) -> bool:
+    """True if the plan reads `table` without an index."""
+    if dialect == "sqlite":
+        # "SCAN chat_message" is a full scan; "SEARCH ... USING INDEX" or
+        # "SCAN ... USING COVERING INDEX" are index reads.
+        pattern = re.compile(rf"^SCAN {re.escape(table)}\b(?!.*USING (COVERING )?INDEX)")
+        return any(pattern.search(line) for line in plan)
+    return any(f"Seq Scan on {table}" in line or f'Seq Scan on "{table}"' in line for line in plan)
+
+
+def table_counts(conn) -> Dict[str, int]:
+    from app.models.db_models import User, Office, ChatSession, ChatMessage
+    return {
+        "users": conn.execute(select(func.max(User.id))).scalar() or 1,
+        "offices": conn.execute(select(func.max(Office.id))).scalar() or 1,
+        "sessions": conn.execute(select(func.max(ChatSession.id))).scalar() or 1,
+        "messages": conn.execute(select(func.count(ChatMessage.id))).scalar(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN-checked query benchmark")
+    parser.add_argument("--url", required=True, help="Database generated by benchmarks.dataset")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed executions per query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="query_report.json")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+    os.environ["DATABASE_URL"] = args.url
+    from app import create_app, db
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    results, failures = {}, []
+    with app.app_context():
+        engine = db.engine
+        dialect = engine.dialect.name
+        with engine.connect() as conn:
+            ids = table_counts(conn)
+            print(f"🔎 {dialect}: {ids['users']:,} users, {ids['offices']:,} offices, "
+                  f"{ids['sessions']:,} sessions, {ids['messages']:,} messages\n")
+            for name, table, build in route_queries(ids):
+                stmt = build(rng)
+                sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+                plan = explain(conn, dialect, sql)
+                scanned = full_scan(plan, table, dialect)
+                if scanned:
+                    failures.append(name)
+
+                latencies = []
+                for _ in range(args.iterations):
+                    stmt = build(rng)
+                    start = time.perf_counter()
+                    conn.execute(stmt).fetchall()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                summary = summarize(latencies)
+                results[name] = {"plan": plan, "full_scan": scanned, "latency_ms": summary}
+                print(f"{'❌' if scanned else '✅'} {name:<42} p50 {summary['p50']:>8.3f} ms  p99 {summary['p99']:>8.3f} ms")
+                for line in plan:
+                    print(f"     {line}")
+
+    write_report(args.out, {"meta": report_meta(tool="bench_queries", dialect=dialect, **ids), "queries": results})
+    if failures:
+        print(f"\n❌ Full table scans in: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
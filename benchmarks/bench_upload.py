@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Upload and extraction throughput benchmark.
+
+    python -m benchmarks.corpus --out corpus --profile large
+    python -m benchmarks.bench_upload corpus --mode both --repeats 3 --out upload_report.json
+
+--mode direct calls extract_text_from_file in a forked child per file so peak
+RSS can be attributed to a single extraction. --mode http posts each file to
+/upload/file on an in-process app (files above MAX_CONTENT_LENGTH are skipped);
+since extraction moved to the job queue this times storing and queueing only.
+Reports per-format latency distributions, bytes/sec, pages/sec and peak RSS.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from collections import defaultdict
+from typing import Dict, Any, List
+
+from benchmarks.common import summarize, report_meta, write_report
+
+
+def _extract_in_child(path: str, file_type: str, conn):
+    from app.utils.file_processor import extract_text_from_file
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    text = extract_text_from_file(path, file_type)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send({"seconds": elapsed, "chars": len(text or ""),
+               "peak_rss_kb": rss_after, "rss_growth_kb": max(0, rss_after - rss_before)})
+    conn.close()
+
+
+def run_direct(manifest: List[Dict[str, Any]], repeats: int) -> List[Dict[str, Any]]:
+    ctx = multiprocessing.get_context("fork")
+    samples = []
+    for item in manifest:
+        for _ in range(repeats):
+            parent, child = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_extract_in_child, args=(item["path"], item["file_type"], child))
+            proc.start()
+            child.close()
+            result = parent.recv()
+            proc.join()
+            samples.append({**item, **result})
+    return samples
+
+
+def run_http(manifest: List[Dict[str, Any]], repeats: int, workdir: str) -> List[Dict[str, Any]]:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'upload_bench.db')}"
+    from app import create_app, db
+    from app.models.db_models import User, Office
+    from flask_jwt_extended import create_access_token
+
+    app = create_app()
+    app.config["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    with app.app_context():
+        teacher = User(name="Bench Teacher", email="bench-teacher@example.com", password="x", role="teacher")
+        db.session.add(teacher)
+        db.session.flush()
+        office = Office(name="Bench Office", join_code="UPBNCH", owner_id=teacher.id)
+        db.session.add(office)
+        db.session.commit()
+        token = create_access_token(identity=str(teacher.id))
+        office_id = office.id
+
+    client = app.test_client()
+    limit = app.config["MAX_CONTENT_LENGTH"]
+    samples = []
+    for item in manifest:
+        if item["bytes"] >= limit:
+            print(f"  ⏭️  {os.path.basename(item['path'])}: {item['bytes']} bytes exceeds MAX_CONTENT_LENGTH")
+            continue
+        for _ in range(repeats):
+            with open(item["path"], "rb") as f:
+                start = time.perf_counter()
+                response = client.post("/upload/file", headers={"Authorization": f"Bearer {token}"},
+                                       data={"office_id": str(office_id), "file": (f, os.path.basename(item["path"]))})
+                elapsed = time.perf_counter() - start
+            body = response.get_json() or {}
+            samples.append({**item, "seconds": elapsed, "status": response.status_code,
+                            "processed": body.get("resource", {}).get("processed")})
+    return samples
+
+
+def aggregate(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    by_format = defaultdict(list)
+    for s in samples:
+        by_format[s["file_type"]].append(s)
+    out = {}
+    for file_type, rows in sorted(by_format.items()):
+        seconds = sum(r["seconds"] for r in rows)
+        total_bytes = sum(r["bytes"] for r in rows)
+        pages = sum(r["pages"] or 0 for r in rows)
+        stats = {
+            "files": len(rows),
+            "latency_ms": summarize(r["seconds"] * 1000 for r in rows),
+            "bytes_per_sec": round(total_bytes / seconds, 1) if seconds else None,
+            "pages_per_sec": round(pages / seconds, 2) if seconds and pages else None,
+        }
+        if "peak_rss_kb" in rows[0]:
+            stats["peak_rss_mb"] = round(max(r["peak_rss_kb"] for r in rows) / 1024, 1)
+            stats["rss_growth_mb"] = summarize(r["rss_growth_kb"] / 1024 for r in rows)
+        if "status" in rows[0]:
+            stats["errors"] = sum(1 for r in rows if r["status"] != 201)
+        out[file_type] = stats
+    return out
+
+
+def print_table(title: str, stats: Dict[str, Any]):
+    print(f"\n📊 {title}")
+    print(f"  {'format':<13} {'files':>5} {'p50 ms':>9} {'p99 ms':>9} {'MB/s':>8} {'pages/s':>9} {'peak RSS MB':>12}")
+    for file_type, s in stats.items():
+        lat = s["latency_ms"]
+        mbps = (s["bytes_per_sec"] or 0) / 1e6
+        pps = f"{s['pages_per_sec']:.1f}" if s["pages_per_sec"] else "-"
+        rss = f"{s['peak_rss_mb']:.1f}" if "peak_rss_mb" in s else "-"
+        print(f"  {file_type:<13} {s['files']:>5} {lat['p50']:>9.1f} {lat['p99']:>9.1f} {mbps:>8.2f} {pps:>9} {rss:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload/extraction throughput benchmark")
+    parser.add_argument("corpus", help="Directory written by `python -m benchmarks.corpus`")
+    parser.add_argument("--mode", choices=["direct", "http", "both"], default="both")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--format", help="Only benchmark this file_type (pdf, document, presentation, text, image)")
+    parser.add_argument("--out", default="upload_report.json")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    with open(os.path.join(args.corpus, "manifest.json")) as f:
+        manifest = json.load(f)
+    if args.format:
+        manifest = [m for m in manifest if m["file_type"] == args.format]
+
+    report = {"meta": report_meta(tool="bench_upload", corpus=os.path.abspath(args.corpus), repeats=args.repeats)}
+    if args.mode in ("direct", "both"):
+        samples = run_direct(manifest, args.repeats)
+        report["direct"] = aggregate(samples)
+        print_table("Direct extraction", report["direct"])
+    if args.mode in ("http", "both"):
+        with tempfile.TemporaryDirectory() as workdir:
+            samples = run_http(manifest, args.repeats, workdir)
+        report["http"] = aggregate(samples)
+        print_table("POST /upload/file", report["http"])
+    write_report(args.out, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
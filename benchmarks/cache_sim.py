@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Trace-driven cache simulator for the TTS / LLM / history caches.
+
+Replays a log written with CACHE_TRACE_FILE (see app/services/cache_trace.py)
+against LRU, LFU, W-TinyLFU and pure-TTL policies and prints hit-rate vs.
+memory curves per namespace:
+
+    python -m benchmarks.cache_sim cache_trace.log --sample-rate 0.1 --out cache_curves.json
+
+Only gets count as requests. A miss inserts the object with the size seen for
+that key in the trace (the server sets it right after generating it); deletes
+invalidate. Capacity-bound policies ignore TTLs, so their curves show what
+memory buys on its own; the TTL policy has unbounded capacity and reports the
+peak live bytes for a range of TTLs around the configured one. When the trace
+was sampled, memory figures are scaled back up by 1/sample_rate.
+"""
+
+import sys
+import json
+import heapq
+import zlib
+import argparse
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Tuple, Iterable
+
+CAPACITY_FRACTIONS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1.0)
+TTL_MULTIPLIERS = (0.125, 0.25, 0.5, 1, 2, 4, 8)
+
+Access = Tuple[float, str, str, int, int]  # (ts_seconds, key, op, size, ttl)
+
+
+def load_trace(path: str) -> Dict[str, List[Access]]:
+    by_namespace = defaultdict(list)
+    with open(path, "r", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 7:
+                continue
+            ts_ms, namespace, key, op, size, ttl, _hit = parts
+            by_namespace[namespace].append((int(ts_ms) / 1000.0, key, op, int(size), int(ttl)))
+    for accesses in by_namespace.values():
+        accesses.sort(key=lambda a: a[0])
+    return by_namespace
+
+
+def object_sizes(accesses: Iterable[Access]) -> Dict[str, int]:
+    """Best known size per key: the largest size seen in a get hit or a set."""
+    sizes = {}
+    for _, key, op, size, _ in accesses:
+        if size and op in ("get", "set"):
+            sizes[key] = max(sizes.get(key, 0), size)
+    return sizes
+
+
+# --- Policies (byte capacity) ---
+
+class LRUCache:
+    name = "lru"
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.used = 0
+        self.items = OrderedDict()
+
+    def get(self, key) -> bool:
+        if key in self.items:
+            self.items.move_to_end(key)
+            return True
+        return False
+
+    def put(self, key, size):
+        if size > self.capacity:
+            return
+        self.delete(key)
+        while self.used + size > self.capacity:
+            _, evicted = self.items.popitem(last=False)
+            self.used -= evicted
+        self.items[key] = size
+        self.used += size
+
+    def delete(self, key):
+        size = self.items.pop(key, None)
+        if size is not None:
+            self.used -= size
+
+
+class LFUCache:
+    """Evicts the least frequently used key (oldest first on ties)."""
+    name = "lfu"
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.used = 0
+        self.items = {}  # key -> [freq, tick, size]
+        self.heap = []
+        self.tick = 0
+
+    def _touch(self, key):
+        self.tick += 1
+        entry = self.items[key]
+        entry[0] += 1
+        entry[1] = self.tick
+        heapq.heappush(self.heap, (entry[0], entry[1], key))
+
+    def get(self, key) -> bool:
+        if key in self.items:
+            self._touch(key)
+            return True
+        return False
+
+    def put(self, key, size):
+        if size > self.capacity:
+            return
+        self.delete(key)
+        while self.used + size > self.capacity:
+            freq, tick, victim = heapq.heappop(self.heap)
+            entry = self.items.get(victim)
+            if entry and entry[0] == freq and entry[1] == tick:
+                self.delete(victim)
+        self.tick += 1
+        self.items[key] = [1, self.tick, size]
+        heapq.heappush(self.heap, (1, self.tick, key))
+        self.used += size
+
+    def delete(self, key):
+        entry = self.items.pop(key, None)
+        if entry:
+            self.used -= entry[2]
+
+
+class CountMinSketch:
+    """4-bit-style frequency sketch with periodic halving (TinyLFU aging)."""
+
+    def __init__(self, width: int, depth: int = 4, sample_size: int = None):
+        self.width = max(64, 1 << (width - 1).bit_length())
+        self.depth = depth
+        self.rows = [[0] * self.width for _ in range(depth)]
+        self.additions = 0
+        self.sample_size = sample_size or 10 * self.width
+
+    def _indexes(self, key):
+        h = zlib.crc32(key.encode("utf-8"))  # stable across runs, unlike hash()
+        for i in range(self.depth):
+            mixed = (h * (0x9E3779B1 + 2 * i)) & 0xFFFFFFFF
+            yield i, (mixed >> 7) & (self.width - 1)
+
+    def increment(self, key):
+        for i, idx in self._indexes(key):
+            if self.rows[i][idx] < 15:
+                self.rows[i][idx] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [[v >> 1 for v in row] for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key) -> int:
+        return min(self.rows[i][idx] for i, idx in self._indexes(key))
+
+
+class WTinyLFUCache:
+    """Window LRU (1%) in front of a main LRU guarded by TinyLFU admission."""
+    name = "tinylfu"
+
+    def __init__(self, capacity: int, expected_keys: int = 10000):
+        self.capacity = capacity
+        self.window = LRUCache(max(1, capacity // 100))
+        self.main = LRUCache(capacity - self.window.capacity)
+        self.sketch = CountMinSketch(expected_keys)
+
+    def get(self, key) -> bool:
+        self.sketch.increment(key)
+        return self.window.get(key) or self.main.get(key)
+
+    def put(self, key, size):
+        if size > self.capacity:
+            return
+        self.delete(key)
+        self.window.items[key] = size
+        self.window.used += size
+        # Whatever overflows the window (possibly the new key) competes for main.
+        while self.window.used > self.window.capacity and self.window.items:
+            candidate, candidate_size = self.window.items.popitem(last=False)
+            self.window.used -= candidate_size
+            self._admit(candidate, candidate_size)
+
+    def _admit(self, candidate, size):
+        if size > self.main.capacity:
+            return
+        while self.main.used + size > self.main.capacity:
+            victim, victim_size = next(iter(self.main.items.items()))
+            if self.sketch.estimate(candidate) <= self.sketch.estimate(victim):
+                return  # reject the candidate, keep the incumbent
+            self.main.delete(victim)
+        self.main.put(candidate, size)
+
+    def delete(self, key):
+        self.window.delete(key)
+        self.main.delete(key)
+
+
+def simulate_capacity(policy_cls, accesses: List[Access], sizes: Dict[str, int], capacity: int) -> float:
+    cache = policy_cls(capacity) if policy_cls is not WTinyLFUCache else WTinyLFUCache(capacity, len(sizes) or 1)
+    hits = requests = 0
+    for _, key, op, _, _ in accesses:
+        if op == "get":
+            requests += 1
+            if cache.get(key):
+                hits += 1
+            elif key in sizes:
+                cache.put(key, sizes[key])
+        elif op == "del":
+            cache.delete(key)
+    return hits / requests if requests else 0.0
+
+
+def simulate_ttl(accesses: List[Access], sizes: Dict[str, int], ttl: float) -> Tuple[float, int]:
+    """Unbounded cache with a fixed TTL; returns (hit_rate, peak_live_bytes)."""
+    expires = {}
+    expiry_heap = []
+    live = peak = 0
+    hits = requests = 0
+    for ts, key, op, _, _ in accesses:
+        while expiry_heap and expiry_heap[0][0] <= ts:
+            when, victim = heapq.heappop(expiry_heap)
+            if expires.get(victim) == when:
+                del expires[victim]
+                live -= sizes.get(victim, 0)
+        if op == "get":
+            requests += 1
+            if key in expires:
+                hits += 1
+            elif key in sizes:
+                expires[key] = ts + ttl
+                heapq.heappush(expiry_heap, (ts + ttl, key))
+                live += sizes[key]
+                peak = max(peak, live)
+        elif op == "del" and key in expires:
+            del expires[key]
+            live -= sizes.get(key, 0)
+    return (hits / requests if requests else 0.0), peak
+
+
+def analyze_namespace(accesses: List[Access], sample_rate: float) -> Dict[str, List[Dict[str, float]]]:
+    sizes = object_sizes(accesses)
+    working_set = sum(sizes.values())
+    scale = 1.0 / sample_rate
+    curves = {}
+    if working_set:
+        for policy in (LRUCache, LFUCache, WTinyLFUCache):
+            points = []
+            for fraction in CAPACITY_FRACTIONS:
+                capacity = max(1, int(working_set * fraction))
+                hit_rate = simulate_capacity(policy, accesses, sizes, capacity)
+                points.append({"memory_bytes": int(capacity * scale), "hit_rate": round(hit_rate, 4)})
+            curves[policy.name] = points
+    configured_ttl = max((a[4] for a in accesses if a[4]), default=300)
+    ttl_points = []
+    for multiplier in TTL_MULTIPLIERS:
+        ttl = configured_ttl * multiplier
+        hit_rate, peak = simulate_ttl(accesses, sizes, ttl)
+        ttl_points.append({"ttl_s": ttl, "memory_bytes": int(peak * scale), "hit_rate": round(hit_rate, 4)})
+    curves["ttl"] = ttl_points
+    return {
+        "requests": sum(1 for a in accesses if a[2] == "get"),
+        "unique_keys": len(sizes),
+        "working_set_bytes": int(working_set * scale),
+        "configured_ttl_s": configured_ttl,
+        "curves": curves,
+    }
+
+
+def print_namespace(namespace: str, result: Dict):
+    print(f"\n🗂️  {namespace}: {result['requests']} gets, {result['unique_keys']} keys, "
+          f"working set {result['working_set_bytes'] / 1e6:.2f} MB, configured TTL {result['configured_ttl_s']}s")
+    curves = result["curves"]
+    capacity_policies = [p for p in ("lru", "lfu", "tinylfu") if p in curves]
+    if capacity_policies:
+        print(f"  {'memory MB':>10} " + " ".join(f"{p:>8}" for p in capacity_policies))
+        for i, point in enumerate(curves[capacity_policies[0]]):
+            rates = " ".join(f"{curves[p][i]['hit_rate']:>8.1%}" for p in capacity_policies)
+            print(f"  {point['memory_bytes'] / 1e6:>10.2f} {rates}")
+    print(f"  {'ttl s':>10} {'peak MB':>8} {'hit':>8}")
+    for point in curves["ttl"]:
+        print(f"  {point['ttl_s']:>10.0f} {point['memory_bytes'] / 1e6:>8.2f} {point['hit_rate']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate cache policies over a cache access trace")
+    parser.add_argument("trace", help="Log written with CACHE_TRACE_FILE")
+    parser.add_argument("--sample-rate", type=float, default=1.0, help="CACHE_TRACE_SAMPLE_RATE used when recording")
+    parser.add_argument("--namespace", help="Only simulate this namespace (tts, llm, history)")
+    parser.add_argument("--out", default="cache_curves.json", help="Where to write the curves as JSON")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    results = {}
+    for namespace, accesses in sorted(trace.items()):
+        if args.namespace and namespace != args.namespace:
+            continue
+        results[namespace] = analyze_namespace(accesses, args.sample_rate)
+        print_namespace(namespace, results[namespace])
+
+    with open(args.out, "w") as f:
+        json.dump({"sample_rate": args.sample_rate, "namespaces": results}, f, indent=2)
+    print(f"\n📝 Curves written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# benchmarks/common.py - Shared helpers for benchmark reports
+
+import json
+import math
+import platform
+import time
+from typing import Dict, Any, Iterable, List, Optional
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linear-interpolated percentile (same definition as numpy's default)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(values: Iterable[float]) -> Dict[str, Any]:
+    """Count, mean, min/max and the standard percentiles of a sample."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"count": 0}
+    summary = {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "min": min(values),
+        "max": max(values),
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}"] = percentile(values, pct)
+    return {k: (round(v, 3) if isinstance(v, float) else v) for k, v in summary.items()}
+
+
+def report_meta(**extra) -> Dict[str, Any]:
+    meta = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def write_report(path: str, report: Dict[str, Any]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"📝 Report written to {path}")
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_summaries(baseline: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]],
+                      stats=("p50", "p90", "p99"), threshold_pct: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Compare {metric: summary} maps. Rows above threshold_pct are flagged as regressions.
+
+    All metrics are treated as "lower is better" (latencies, CPU time, bytes).
+    """
+    rows = []
+    for metric in sorted(set(baseline) & set(current)):
+        for stat in stats:
+            old = baseline[metric].get(stat)
+            new = current[metric].get(stat)
+            if old is None or new is None:
+                continue
+            change = ((new - old) / old * 100.0) if old else (0.0 if new == old else math.inf)
+            rows.append({
+                "metric": metric,
+                "stat": stat,
+                "baseline": old,
+                "current": new,
+                "change_pct": round(change, 1),
+                "regression": threshold_pct is not None and change > threshold_pct,
+            })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    print(f"{'metric':<28} {'stat':<5} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        flag = "  ❌" if row["regression"] else ""
+        print(f"{row['metric']:<28} {row['stat']:<5} {row['baseline']:>12.3f} {row['current']:>12.3f} "
+              f"{row['change_pct']:>+8.1f}%{flag}")
@@ -0,0 +1,202 @@
+# benchmarks/corpus.py - Deterministic synthetic documents for benchmarks
+#
+# Every generator takes a seed so the same arguments always produce the same
+# bytes, which keeps benchmark numbers comparable between runs.
+
+import random
+import zlib
+from typing import List
+
+VOCABULARY = (
+    "derivative integral limit function vector matrix eigenvalue probability "
+    "distribution variance gradient descent theorem proof lemma algorithm "
+    "complexity recursion induction graph tree node edge weight entropy signal "
+    "frequency momentum energy velocity acceleration force molecule reaction "
+    "equilibrium enzyme protein lecture homework exam syllabus chapter section "
+    "example exercise solution definition property continuous discrete"
+).split()
+
+
+def make_words(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+def make_text(words: int, seed: int = 0, words_per_sentence: int = 12) -> str:
+    """Sentence-shaped filler text with a fixed vocabulary."""
+    tokens = make_words(words, seed)
+    sentences = []
+    for start in range(0, len(tokens), words_per_sentence):
+        chunk = tokens[start:start + words_per_sentence]
+        sentences.append(" ".join(chunk).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def write_txt(path: str, words: int, seed: int = 0, encoding: str = "utf-8") -> str:
+    text = make_text(words, seed)
+    if encoding.lower() not in ("ascii", "us-ascii"):
+        text += " Ünïcödé – café naïve résumé."  # exercise non-ASCII paths
+    with open(path, "w", encoding=encoding, errors="replace") as f:
+        f.write(text)
+    return path
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 40, seed: int = 0) -> str:
+    """Minimal text PDF (Helvetica, compressed content streams) readable by PyPDF2."""
+    rng = random.Random(seed)
+    objects = []  # object bodies, 1-indexed by position
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # patched below
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for page in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            lines.append(" ".join(rng.choice(VOCABULARY) for _ in range(10)))
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 760 Td", f"(Page {page + 1}) Tj", "T*"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = zlib.compress("\n".join(ops).encode("latin-1"))
+        content_id = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)))
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+def write_docx(path: str, paragraphs: int, seed: int = 0, words_per_paragraph: int = 80) -> str:
+    from docx import Document
+    document = Document()
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            document.add_heading(f"Section {i // 20 + 1}", level=1)
+        document.add_paragraph(make_text(words_per_paragraph, seed + i))
+    document.save(path)
+    return path
+
+
+def write_pptx(path: str, slides: int, seed: int = 0, bullets: int = 5) -> str:
+    from pptx import Presentation
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # title and content
+    for i in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {i + 1}: " + " ".join(make_words(3, seed + i))
+        body = slide.placeholders[1].text_frame
+        body.text = make_text(10, seed + i * 7)
+        for b in range(1, bullets):
+            body.add_paragraph().text = make_text(10, seed + i * 7 + b)
+    prs.save(path)
+    return path
+
+
+def make_image(width: int, height: int, seed: int = 0, text_lines: int = 0):
+    """RGB image with a gradient, sensor-like noise and optional dark text lines."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    base = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.frombytes("L", (width, height), rng.randbytes(width * height)).convert("RGB")
+    img = Image.blend(base, noise, 0.15)
+    if text_lines:
+        draw = ImageDraw.Draw(img)
+        step = max(height // (text_lines + 1), 12)
+        for line in range(text_lines):
+            draw.text((width // 20, step * (line + 1)), make_text(8, seed + line), fill=(0, 0, 0))
+    return img
+
+
+def write_image(path: str, width: int, height: int, seed: int = 0, text_lines: int = 0, quality: int = 85) -> str:
+    img = make_image(width, height, seed, text_lines)
+    if path.lower().endswith((".jpg", ".jpeg")):
+        img.save(path, format="JPEG", quality=quality)
+    else:
+        img.save(path)
+    return path
+
+
+# --- Corpus profiles (python -m benchmarks.corpus --out corpus/ --profile large) ---
+
+TEXT_ENCODINGS = ("utf-8", "utf-16", "latin-1", "cp1252")
+
+PROFILES = {
+    # (format, size parameter) pairs; sizes are pages/paragraphs/slides/words
+    "small": {
+        "pdf": [10], "document": [50], "presentation": [20],
+        "text": [20_000], "image": [(1275, 1650, 5)],
+    },
+    "large": {
+        "pdf": [10, 100, 300], "document": [50, 500], "presentation": [20, 200],
+        "text": [20_000, 500_000], "image": [(1275, 1650, 50), (2550, 3300, 10)],
+    },
+}
+
+
+def generate_corpus(outdir: str, profile: str = "small", seed: int = 0) -> List[dict]:
+    """Write a corpus to outdir and return its manifest entries."""
+    import os
+    os.makedirs(outdir, exist_ok=True)
+    spec = PROFILES[profile]
+    manifest = []
+
+    def entry(path, file_type, pages, **extra):
+        manifest.append({"path": path, "file_type": file_type, "pages": pages,
+                         "bytes": os.path.getsize(path), **extra})
+
+    for pages in spec.get("pdf", []):
+        entry(write_pdf(os.path.join(outdir, f"textbook_{pages}p.pdf"), pages, seed=seed), "pdf", pages)
+    for paragraphs in spec.get("document", []):
+        path = write_docx(os.path.join(outdir, f"notes_{paragraphs}para.docx"), paragraphs, seed=seed)
+        entry(path, "document", None, paragraphs=paragraphs)
+    for slides in spec.get("presentation", []):
+        entry(write_pptx(os.path.join(outdir, f"deck_{slides}slides.pptx"), slides, seed=seed), "presentation", slides)
+    for words in spec.get("text", []):
+        for encoding in TEXT_ENCODINGS:
+            name = f"notes_{words}w_{encoding.replace('-', '')}.txt"
+            entry(write_txt(os.path.join(outdir, name), words, seed=seed, encoding=encoding), "text", None,
+                  encoding=encoding)
+    for width, height, count in spec.get("image", []):
+        batch = f"scans_{width}x{height}"
+        for i in range(count):
+            path = write_image(os.path.join(outdir, f"{batch}_{i:03d}.jpg"), width, height, seed=seed + i, text_lines=30)
+            entry(path, "image", 1, batch=batch)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+    parser = argparse.ArgumentParser(description="Generate a synthetic document corpus")
+    parser.add_argument("--out", default="corpus", help="Output directory")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    files = generate_corpus(args.out, args.profile, args.seed)
+    with open(os.path.join(args.out, "manifest.json"), "w") as f:
+        json.dump(files, f, indent=2)
+    total = sum(item["bytes"] for item in files)
+    print(f"📚 Wrote {len(files)} files ({total / 1e6:.1f} MB) to {args.out}/")
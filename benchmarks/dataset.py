@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Synthetic production-sized database for query-plan and throughput tests.
+
+    python -m benchmarks.dataset --url sqlite:///bench_large.db --profile large
+    python -m benchmarks.dataset --url postgresql://user:pw@localhost/officehours_bench --profile medium
+
+Creates the schema with create_all() and bulk-inserts users, offices,
+enrollments, chat sessions, messages and resources with Core executemany in
+--batch sized chunks. Volumes per profile are below; every student joins a few
+offices, has one session per enrollment and a heavy-tailed number of messages,
+so a few sessions are very long (the case history pagination has to handle).
+The target database is wiped first.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List
+
+from benchmarks.corpus import make_text
+
+PROFILES = {
+    #          offices students enroll/student mean msgs/session resources/office
+    "small":  {"offices": 50, "students": 500, "enrollments": 2, "messages": 20, "resources": 3},
+    "medium": {"offices": 500, "students": 10000, "enrollments": 3, "messages": 30, "resources": 5},
+    "large":  {"offices": 3000, "students": 60000, "enrollments": 3, "messages": 40, "resources": 8},
+}
+
+START = datetime(2025, 1, 6, 9, 0, 0)
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def session_lengths(sessions: int, mean: int, rng: random.Random) -> List[int]:
+    """Heavy-tailed message counts (Pareto, alpha 1.5) scaled to the requested mean."""
+    raw = [rng.paretovariate(1.5) for _ in range(sessions)]
+    scale = mean * sessions / sum(raw)
+    return [max(1, int(r * scale)) for r in raw]
+
+
+def generate(url: str, profile: Dict[str, int], batch: int = 20000, seed: int = 1) -> Dict[str, int]:
+    os.environ["DATABASE_URL"] = url
+    from app import create_app, db
+    from app.models.db_models import User, Office, Enrollment, ChatSession, ChatMessage, Resource
+
+    rng = random.Random(seed)
+    # A small pool of message bodies keeps generation fast while staying realistic in size
+    bodies = [make_text(rng.randint(8, 80), seed=i) for i in range(2000)]
+    app = create_app()
+    counts = {}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        def insert(table, rows, label):
+            n = 0
+            conn = db.session.connection()
+            for chunk in _chunks(rows, batch):
+                conn.execute(table.insert(), chunk)
+                n += len(chunk)
+            db.session.commit()
+            counts[label] = n
+            print(f"  {label:<12} {n:>10,}")
+
+        offices = profile["offices"]
+        students = profile["students"]
+        teachers = max(1, offices // 3)
+
+        insert(User.__table__, (
+            {"id": i + 1, "name": f"{'Teacher' if i < teachers else 'Student'} {i}",
+             "email": f"user{i}@example.edu", "password": "pbkdf2:sha256:600000$bench$0",
+             "role": "teacher" if i < teachers else "student", "created_at": START}
+            for i in range(teachers + students)), "users")
+
+        insert(Office.__table__, (
+            {"id": i + 1, "name": f"Office Hours {i}", "join_code": f"{i:06X}"[-6:],
+             "owner_id": (i % teachers) + 1, "created_at": START}
+            for i in range(offices)), "offices")
+
+        enrollments = []
+        for s in range(students):
+            user_id = teachers + s + 1
+            for office_id in rng.sample(range(1, offices + 1), min(profile["enrollments"], offices)):
+                enrollments.append((user_id, office_id))
+        insert(Enrollment.__table__, (
+            {"id": i + 1, "user_id": u, "office_id": o, "joined_at": START}
+            for i, (u, o) in enumerate(enrollments)), "enrollments")
+
+        insert(ChatSession.__table__, (
+            {"id": i + 1, "user_id": u, "office_id": o, "created_at": START}
+            for i, (u, o) in enumerate(enrollments)), "sessions")
+
+        lengths = session_lengths(len(enrollments), profile["messages"], rng)
+
+        def messages():
+            for session_id, length in enumerate(lengths, start=1):
+                ts = START + timedelta(minutes=rng.randint(0, 60 * 24 * 120))
+                for i in range(length):
+                    ts += timedelta(seconds=rng.randint(5, 120))
+                    yield {"session_id": session_id, "sender": "user" if i % 2 == 0 else "ai",
+                           "message": bodies[rng.randrange(len(bodies))], "timestamp": ts}
+        insert(ChatMessage.__table__, messages(), "messages")
+
+        insert(Resource.__table__, (
+            {"office_id": o, "file_path": f"/uploads/{o}/{r}.pdf", "file_name": f"lecture_{r}.pdf",
+             "file_type": "pdf", "extracted_text": bodies[(o * 31 + r) % len(bodies)],
+             "uploaded_at": START, "file_size": 250_000, "processed": True}
+            for o in range(1, offices + 1) for r in range(profile["resources"])), "resources")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic OfficeHours database")
+    parser.add_argument("--url", required=True, help="Target database URL (it is wiped)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="medium")
+    parser.add_argument("--batch", type=int, default=20000, help="Rows per INSERT batch")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.WARNING)
+
+    print(f"🏗️  Generating '{args.profile}' dataset into {args.url}")
+    start = time.perf_counter()
+    generate(args.url, PROFILES[args.profile], args.batch, args.seed)
+    print(f"✅ Done in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+CPU micro-benchmarks for the server's hot functions (no network involved).
+
+    python -m benchmarks.microbench                     # run and compare with the baseline
+    python -m benchmarks.microbench --filter history    # only matching benchmarks
+    python -m benchmarks.microbench --update-baseline   # record new baseline numbers
+
+Each benchmark is auto-calibrated to run for roughly --min-time seconds per
+repeat; the report stores per-operation microseconds (median/min over repeats).
+Baselines are machine-specific: regenerate them on the machine you compare on.
+"""
+
+import os
+import sys
+import time
+import base64
+import io
+import argparse
+import tempfile
+from typing import Callable, Dict, Any, List, Tuple
+
+from benchmarks.common import summarize, report_meta, write_report, load_report, compare_summaries, print_comparison
+from benchmarks import corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+HISTORY_SIZES = (10, 100, 1000, 10000)
+IMAGE_SIZES = ((640, 480), (1280, 720), (1920, 1080), (4032, 3024))
+
+
+def measure(fn: Callable[[], Any], min_time: float, repeats: int) -> Dict[str, Any]:
+    """Per-call microseconds, calibrated so one repeat takes about min_time."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    samples = [elapsed / number * 1e6]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number * 1e6)
+    result = summarize(samples)
+    result["iterations"] = number
+    return result
+
+
+# --- Fixtures ---
+
+def streamed_tokens() -> List[str]:
+    """A ~300 token answer split the way the LLM streams it (word pieces)."""
+    text = corpus.make_text(300, seed=7)
+    words = text.split(" ")
+    return [words[0]] + [" " + w for w in words[1:]]
+
+
+def segmentation_bench() -> Callable[[], Any]:
+    from app.routes.chat import split_complete_sentence, is_speakable
+    tokens = streamed_tokens()
+
+    def run():
+        buffer = ""
+        spoken = 0
+        for token in tokens:
+            buffer += token
+            sentence, buffer = split_complete_sentence(buffer)
+            if sentence is not None and is_speakable(sentence):
+                spoken += 1
+        return spoken
+    return run
+
+
+def sse_benches() -> List[Tuple[str, Callable[[], Any]]]:
+    from app.routes.chat import encode_sse_event
+    text_chunk = {'type': 'text', 'content': ' gradient'}
+    audio_chunk = {'type': 'audio', 'content': base64.b64encode(os.urandom(24 * 1024)).decode()}
+    return [
+        ("sse.text_event", lambda: encode_sse_event(text_chunk)),
+        ("sse.audio_event_24kb", lambda: encode_sse_event(audio_chunk)),
+    ]
+
+
+def image_benches() -> List[Tuple[str, Callable[[], Any]]]:
+    from app.routes.chat import optimize_image
+    benches = []
+    for width, height in IMAGE_SIZES:
+        buf = io.BytesIO()
+        corpus.make_image(width, height, seed=width).save(buf, format="JPEG", quality=90)
+        data_url = "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+        benches.append((f"optimize_image.{width}x{height}", lambda d=data_url: optimize_image(d)))
+    return benches
+
+
+def extraction_benches(workdir: str) -> List[Tuple[str, Callable[[], Any]]]:
+    from app.utils import file_processor
+    from app.utils.file_processor import extract_text_from_file
+    # One process: time the extraction itself, not pool startup (fork or spawn
+    # depending on which threads happen to be running)
+    file_processor.PDF_EXTRACT_WORKERS = 1
+    files = [
+        ("text", corpus.write_txt(os.path.join(workdir, "notes.txt"), 20000)),
+        ("text_latin1", corpus.write_txt(os.path.join(workdir, "notes_latin1.txt"), 20000, encoding="latin-1")),
+        ("pdf", corpus.write_pdf(os.path.join(workdir, "doc.pdf"), pages=20)),
+        ("document", corpus.write_docx(os.path.join(workdir, "doc.docx"), paragraphs=100)),
+        ("presentation", corpus.write_pptx(os.path.join(workdir, "deck.pptx"), slides=20)),
+    ]
+    benches = []
+    for label, path in files:
+        file_type = "text" if label.startswith("text") else label
+        benches.append((f"extract.{label}", lambda p=path, t=file_type: extract_text_from_file(p, t)))
+    return benches
+
+
+def history_benches(workdir: str) -> List[Tuple[str, Callable[[], Any]]]:
+    # Testing config on a file database: no sampler, compactor or extraction worker threads
+    os.environ["TEST_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    from app import create_app, db
+    from app.models.db_models import User, Office, ChatSession, ChatMessage
+    from app.routes import chat
+
+    chat.redis_client = None  # measure the DB + serialization path, not Redis
+    app = create_app(testing=True)
+    ctx = app.app_context()
+    ctx.push()
+    user = User(name="Bench", email="bench@example.com", password="x", role="student")
+    db.session.add(user)
+    db.session.flush()
+    office = Office(name="Bench", join_code="BENCH1", owner_id=user.id)
+    db.session.add(office)
+    db.session.flush()
+
+    benches = []
+    for size in HISTORY_SIZES:
+        session = ChatSession(user_id=user.id, office_id=office.id)
+        db.session.add(session)
+        db.session.flush()
+        db.session.execute(ChatMessage.__table__.insert(), [
+            {"session_id": session.id, "sender": "user" if i % 2 == 0 else "ai",
+             "message": corpus.make_text(40, seed=i)}
+            for i in range(size)
+        ])
+        benches.append((f"history.{size}_messages",
+                        lambda sid=session.id: chat.get_chat_history_for_llm(app, sid)))
+    db.session.commit()
+    return benches
+
+
+def password_benches() -> List[Tuple[str, Callable[[], Any]]]:
+    from app.utils.auth_utils import hash_password, verify_password
+    hashed = hash_password("correct horse battery staple")
+    return [
+        ("password.hash", lambda: hash_password("correct horse battery staple")),
+        ("password.verify", lambda: verify_password("correct horse battery staple", hashed)),
+    ]
+
+
+def collect_benches(workdir: str) -> List[Tuple[str, Callable[[], Any]]]:
+    benches = [("segmentation.300_tokens", segmentation_bench())]
+    benches += sse_benches()
+    benches += image_benches()
+    benches += extraction_benches(workdir)
+    benches += history_benches(workdir)
+    benches += password_benches()
+    return benches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for OfficeHours AI hot paths")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per repeat")
+    parser.add_argument("--repeats", type=int, default=5, help="Repeats per benchmark")
+    parser.add_argument("--out", default="microbench_report.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline report to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Write results to the baseline file")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)  # per-call INFO logs would dominate the timings
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, fn in collect_benches(workdir):
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(fn, args.min_time, args.repeats)
+            r = results[name]
+            print(f"  {name:<32} {r['p50']:>12.1f} µs/op  (min {r['min']:.1f}, n={r['iterations']})")
+
+    report = {"meta": report_meta(tool="microbench", min_time=args.min_time, repeats=args.repeats),
+              "metrics": results}
+    write_report(args.baseline if args.update_baseline else args.out, report)
+
+    if not args.update_baseline and os.path.exists(args.baseline):
+        rows = compare_summaries(load_report(args.baseline)["metrics"], results, stats=("p50",),
+                                 threshold_pct=args.threshold)
+        print()
+        print_comparison(rows)
+        if any(r["regression"] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
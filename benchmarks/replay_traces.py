@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Replay recorded chat traces through the server pipeline.
+
+Record traces on a real deployment with CHAT_TRACE_FILE=traces.jsonl, then:
+
+    python -m benchmarks.replay_traces traces.jsonl --speed 4 --out after.json
+    python -m benchmarks.replay_traces traces.jsonl --out after.json --compare before.json
+
+Each trace is posted to /chat/message of an in-process app whose OpenAI client
+is replaced by ReplayOpenAIClient, so token arrival and TTS latencies match the
+recording while segmentation, TTS scheduling and SSE encoding run for real.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from typing import Dict, Any, List
+
+from benchmarks.common import summarize, report_meta, write_report, load_report, compare_summaries, print_comparison
+
+
+def build_app(db_path: str):
+    # Testing config on a file database: no sampler, compactor or extraction worker threads
+    os.environ["TEST_DATABASE_URL"] = f"sqlite:///{db_path}"
+    from app import create_app, db
+    from app.models.db_models import User, Office, Enrollment, ChatSession
+    from flask_jwt_extended import create_access_token
+
+    app = create_app(testing=True)
+    with app.app_context():
+        teacher = User(name="Replay Teacher", email="replay-teacher@example.com", password="x", role="teacher")
+        student = User(name="Replay Student", email="replay-student@example.com", password="x", role="student")
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        office = Office(name="Replay Office", join_code="REPLAY", owner_id=teacher.id)
+        db.session.add(office)
+        db.session.flush()
+        db.session.add(Enrollment(user_id=student.id, office_id=office.id))
+        db.session.commit()
+        token = create_access_token(identity=str(student.id))
+        student_id, office_id = student.id, office.id
+    return app, token, student_id, office_id
+
+
+def new_session(app, student_id: int, office_id: int) -> int:
+    from app import db
+    from app.models.db_models import ChatSession
+    with app.app_context():
+        session = ChatSession(user_id=student_id, office_id=office_id)
+        db.session.add(session)
+        db.session.commit()
+        return session.id
+
+
+def replay_one(app, token: str, session_id: int, trace: Dict[str, Any]) -> Dict[str, Any]:
+    client = app.test_client()
+    start = time.perf_counter()
+    first_text = first_audio = None
+    audio_times: List[float] = []
+    sse_bytes = 0
+    error = None
+
+    response = client.post('/chat/message', buffered=False,
+                           headers={'Authorization': f'Bearer {token}'},
+                           json={'session_id': session_id, 'message': trace.get('prompt', '')})
+    try:
+        for raw in response.response:
+            now = time.perf_counter() - start
+            sse_bytes += len(raw)
+            for line in raw.decode('utf-8').splitlines():
+                if not line.startswith('data: '):
+                    continue
+                event = json.loads(line[6:])
+                if event['type'] == 'text' and first_text is None:
+                    first_text = now
+                elif event['type'] == 'audio':
+                    first_audio = now if first_audio is None else first_audio
+                    audio_times.append(now)
+                elif event['type'] == 'error':
+                    error = event.get('content')
+    finally:
+        response.close()
+
+    total = time.perf_counter() - start
+    gaps = [b - a for a, b in zip(audio_times, audio_times[1:])]
+    return {
+        'trace_id': trace.get('id'),
+        'ttft_ms': first_text * 1000 if first_text is not None else None,
+        'ttfa_ms': first_audio * 1000 if first_audio is not None else None,
+        'total_ms': total * 1000,
+        'audio_gap_ms': [g * 1000 for g in gaps],
+        'audio_events': len(audio_times),
+        'sse_bytes': sse_bytes,
+        'error': error,
+    }
+
+
+def run_replay(traces: List[Dict[str, Any]], speed: float, sessions: int, closed_loop: bool) -> Dict[str, Any]:
+    from app.routes import chat
+    from app.services.trace_recorder import ReplayOpenAIClient
+
+    tmp = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    tmp.close()
+    app, token, student_id, office_id = build_app(tmp.name)
+    chat.openai_client = ReplayOpenAIClient(traces, speed=speed)
+    chat.redis_client = None  # Replayed cache outcomes come from the trace timings
+
+    session_ids = [new_session(app, student_id, office_id) for _ in range(max(1, sessions))]
+    traces = sorted(traces, key=lambda t: t.get('ts', 0))
+    t0 = traces[0].get('ts', 0)
+    results: List[Dict[str, Any]] = [None] * len(traces)
+    start = time.perf_counter()
+
+    def worker(i, trace):
+        if not closed_loop:
+            delay = (trace.get('ts', t0) - t0) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        results[i] = replay_one(app, token, session_ids[i % len(session_ids)], trace)
+
+    if closed_loop:
+        for i, trace in enumerate(traces):
+            worker(i, trace)
+    else:
+        threads = [threading.Thread(target=worker, args=(i, t)) for i, t in enumerate(traces)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    os.unlink(tmp.name)
+    wall = time.perf_counter() - start
+    return {
+        'meta': report_meta(tool='replay_traces', speed=speed, traces=len(traces), closed_loop=closed_loop),
+        'wall_time_s': round(wall, 3),
+        'errors': sum(1 for r in results if r['error']),
+        'metrics': {
+            'ttft_ms': summarize(r['ttft_ms'] for r in results),
+            'ttfa_ms': summarize(r['ttfa_ms'] for r in results),
+            'total_ms': summarize(r['total_ms'] for r in results),
+            'audio_gap_ms': summarize(g for r in results for g in r['audio_gap_ms']),
+            'sse_bytes': summarize(r['sse_bytes'] for r in results),
+        },
+        'requests': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded chat traces through the server pipeline")
+    parser.add_argument("traces", help="JSONL file written with CHAT_TRACE_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression factor (2 = twice as fast)")
+    parser.add_argument("--sessions", type=int, default=8, help="Chat sessions to spread traces over")
+    parser.add_argument("--closed-loop", action="store_true", help="Replay sequentially instead of at recorded arrival times")
+    parser.add_argument("--out", default="replay_report.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Baseline report to diff latency percentiles against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent for --compare")
+    args = parser.parse_args()
+
+    from app.services.trace_recorder import load_traces
+    traces = load_traces(args.traces)
+    if not traces:
+        print("❌ No traces found")
+        return 1
+
+    print(f"🔁 Replaying {len(traces)} traces at {args.speed}x...")
+    report = run_replay(traces, args.speed, args.sessions, args.closed_loop)
+    write_report(args.out, report)
+    for name, summary in report['metrics'].items():
+        if summary.get('count'):
+            print(f"  {name:<14} p50={summary['p50']:.1f} p90={summary['p90']:.1f} p99={summary['p99']:.1f} (n={summary['count']})")
+
+    if args.compare:
+        rows = compare_summaries(load_report(args.compare)['metrics'], report['metrics'], threshold_pct=args.threshold)
+        print()
+        print_comparison(rows)
+        if any(r['regression'] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Add resource_chunk table
+
+Revision ID: 3d8e5b2a7f61
+Revises: 9c2f71d8e350
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8e5b2a7f61'
+down_revision = '9c2f71d8e350'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resource_chunk',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('number', sa.Integer(), nullable=False),
+    sa.Column('codec', sa.String(length=10), nullable=False),
+    sa.Column('char_count', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['resource_id'], ['resource.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_resource_chunk_resource_id_position', 'resource_chunk', ['resource_id', 'position'],
+                    unique=True, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_resource_chunk_resource_id_position', table_name='resource_chunk')
+    op.drop_table('resource_chunk')
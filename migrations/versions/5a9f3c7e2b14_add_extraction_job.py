@@ -0,0 +1,48 @@
+"""Add extraction_job table
+
+Revision ID: 5a9f3c7e2b14
+Revises: c4e7a2d91f05
+Create Date: 2026-10-19 15:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a9f3c7e2b14'
+down_revision = 'c4e7a2d91f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('extraction_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('message', sa.String(length=200), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('worker', sa.String(length=50), nullable=True),
+    sa.Column('run_after', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['resource_id'], ['resource.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_extraction_job_status_run_after', 'extraction_job', ['status', 'run_after'],
+                    unique=False, if_not_exists=True)
+    op.create_index('ix_extraction_job_resource_id', 'extraction_job', ['resource_id'],
+                    unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_extraction_job_resource_id', table_name='extraction_job')
+    op.drop_index('ix_extraction_job_status_run_after', table_name='extraction_job')
+    op.drop_table('extraction_job')
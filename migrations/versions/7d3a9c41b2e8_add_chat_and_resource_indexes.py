@@ -0,0 +1,32 @@
+"""Add composite indexes for chat history, session lookup and resource listing
+
+Revision ID: 7d3a9c41b2e8
+Revises: e1fb5df01436
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3a9c41b2e8'
+down_revision = 'e1fb5df01436'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_all() may already have built these on databases created by the app
+    op.create_index('ix_chat_message_session_id_timestamp', 'chat_message',
+                    ['session_id', 'timestamp', 'id'], unique=False, if_not_exists=True)
+    op.create_index('ix_chat_session_user_id_office_id', 'chat_session',
+                    ['user_id', 'office_id'], unique=False, if_not_exists=True)
+    op.create_index('ix_resource_office_id', 'resource', ['office_id'], unique=False, if_not_exists=True)
+    # Enrollment lookups by user_id are served by the unique_enrollment
+    # (user_id, office_id) constraint's index, so no separate index is added.
+
+
+def downgrade():
+    op.drop_index('ix_resource_office_id', table_name='resource', if_exists=True)
+    op.drop_index('ix_chat_session_user_id_office_id', table_name='chat_session', if_exists=True)
+    op.drop_index('ix_chat_message_session_id_timestamp', table_name='chat_message', if_exists=True)
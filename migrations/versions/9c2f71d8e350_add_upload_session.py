@@ -0,0 +1,53 @@
+"""Add upload_session and upload_chunk tables
+
+Revision ID: 9c2f71d8e350
+Revises: e81b6d0f4a23
+Create Date: 2026-10-19 19:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c2f71d8e350'
+down_revision = 'e81b6d0f4a23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('upload_session',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('office_id', sa.Integer(), nullable=False),
+    sa.Column('file_name', sa.String(length=200), nullable=False),
+    sa.Column('total_size', sa.BigInteger(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('temp_path', sa.String(length=200), nullable=False),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['office_id'], ['office.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_upload_session_expires_at', 'upload_session', ['expires_at'],
+                    unique=False, if_not_exists=True)
+    op.create_table('upload_chunk',
+    sa.Column('upload_id', sa.String(length=32), nullable=False),
+    sa.Column('offset', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['upload_id'], ['upload_session.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('upload_id', 'offset'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('upload_chunk')
+    op.drop_index('ix_upload_session_expires_at', table_name='upload_session')
+    op.drop_table('upload_session')
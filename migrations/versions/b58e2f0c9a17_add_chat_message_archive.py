@@ -0,0 +1,58 @@
+"""Add chat_message_archive and archive_run tables
+
+Revision ID: b58e2f0c9a17
+Revises: 7d3a9c41b2e8
+Create Date: 2026-10-19 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b58e2f0c9a17'
+down_revision = '7d3a9c41b2e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('chat_message_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('first_message_id', sa.Integer(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('first_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('codec', sa.String(length=10), nullable=False),
+    sa.Column('raw_bytes', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['chat_session.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+    op.create_index('ix_chat_message_archive_session_id_first_timestamp', 'chat_message_archive',
+                    ['session_id', 'first_timestamp'], unique=False, if_not_exists=True)
+    op.create_table('archive_run',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ran_at', sa.DateTime(), nullable=True),
+    sa.Column('idle_days', sa.Float(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('messages', sa.Integer(), nullable=False),
+    sa.Column('raw_bytes', sa.Integer(), nullable=False),
+    sa.Column('compressed_bytes', sa.Integer(), nullable=False),
+    sa.Column('hot_rows', sa.Integer(), nullable=True),
+    sa.Column('hot_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('archive_bytes', sa.BigInteger(), nullable=True),
+    sa.Column('duration_ms', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_table('archive_run')
+    op.drop_index('ix_chat_message_archive_session_id_first_timestamp', table_name='chat_message_archive')
+    op.drop_table('chat_message_archive')
@@ -0,0 +1,24 @@
+"""Add lower(email) index for case-insensitive roster matching
+
+Revision ID: c4e7a2d91f05
+Revises: b58e2f0c9a17
+Create Date: 2026-10-19 14:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a2d91f05'
+down_revision = 'b58e2f0c9a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user', if_exists=True)
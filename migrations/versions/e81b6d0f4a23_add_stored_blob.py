@@ -0,0 +1,38 @@
+"""Add stored_blob table and resource.content_hash
+
+Revision ID: e81b6d0f4a23
+Revises: 5a9f3c7e2b14
+Create Date: 2026-10-19 17:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81b6d0f4a23'
+down_revision = '5a9f3c7e2b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('file_path', sa.String(length=200), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256'),
+    if_not_exists=True
+    )
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_resource_content_hash', 'resource', ['content_hash'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_resource_content_hash', table_name='resource')
+    with op.batch_alter_table('resource', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
+    op.drop_table('stored_blob')
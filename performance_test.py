@@ -1,20 +1,41 @@
 #!/usr/bin/env python3
 """
-Performance testing script for OfficeHours AI
-Tests latency and throughput under various conditions
+Scenario-based load generator for OfficeHours AI
+
+Provisions teachers, offices, enrolled students and chat sessions through the
+real /auth, /office and /chat APIs, then drives open-loop Poisson arrivals
+through ramp stages with a weighted mix of scenarios:
+
+  text    - /chat/message with a text question
+  vision  - /chat/message with a video frame attached
+  upload  - /upload/file with a small text document (teacher)
+
+For chat scenarios it measures time-to-first-token, time-to-first-audio and
+the gaps between audio events. Results are written as a JSON report that can
+be compared run-over-run:
+
+    python performance_test.py --stages 30s@1,60s@5,30s@5 --out run.json
+    python performance_test.py --stages 30s@1,60s@5 --out new.json --compare run.json --threshold 15
+
+Use LLM_PROVIDER=mock on the server to measure our own overhead offline.
 """
 
 import asyncio
 import aiohttp
-import time
+import base64
+import io
 import json
-import statistics
+import random
+import sys
+import time
+import uuid
 import argparse
-from typing import List, Dict, Any
-import concurrent.futures
-import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from benchmarks.common import summarize, report_meta, write_report, load_report, compare_summaries, print_comparison
+
 # Configuration
 API_BASE = "http://localhost:5001"
 TEST_MESSAGES = [
@@ -29,270 +50,343 @@ TEST_MESSAGES = [
     "What is the fundamental theorem of calculus?",
     "Explain Bayes' theorem with an example."
 ]
+DEFAULT_MIX = "text=0.8,vision=0.15,upload=0.05"
+
+
+@dataclass
+class Stage:
+    duration: float  # seconds
+    target_rate: float  # arrivals/sec reached at the end of the stage
+
+
+@dataclass
+class VirtualUser:
+    token: str
+    session_id: int
+    office_id: int
+
+
+@dataclass
+class Fixture:
+    teachers: List[Dict[str, Any]] = field(default_factory=list)  # {'token', 'office_id'}
+    students: List[VirtualUser] = field(default_factory=list)
+
 
-class PerformanceTest:
-    def __init__(self, base_url: str = API_BASE):
+def parse_stages(spec: str) -> List[Stage]:
+    """Parse '30s@1,2m@5,30s@5' into ramp stages (linear ramp to the target rate)."""
+    stages = []
+    for part in spec.split(","):
+        duration, rate = part.strip().split("@")
+        seconds = float(duration[:-1]) * 60 if duration.endswith("m") else float(duration.rstrip("s"))
+        stages.append(Stage(seconds, float(rate)))
+    return stages
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"text", "vision", "upload"}
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    return mix
+
+
+def rate_at(stages: List[Stage], t: float) -> Optional[float]:
+    """Arrival rate at time t, or None once all stages are done."""
+    start_rate, elapsed = 0.0, 0.0
+    for stage in stages:
+        if t < elapsed + stage.duration:
+            progress = (t - elapsed) / stage.duration if stage.duration else 1.0
+            return start_rate + (stage.target_rate - start_rate) * progress
+        start_rate, elapsed = stage.target_rate, elapsed + stage.duration
+    return None
+
+
+def poisson_schedule(stages: List[Stage], rng: random.Random) -> List[float]:
+    """Arrival offsets for a non-homogeneous Poisson process (thinning)."""
+    peak = max((s.target_rate for s in stages), default=0.0)
+    total = sum(s.duration for s in stages)
+    arrivals, t = [], 0.0
+    if peak <= 0:
+        return arrivals
+    while True:
+        t += rng.expovariate(peak)
+        if t >= total:
+            return arrivals
+        if rng.random() * peak <= (rate_at(stages, t) or 0.0):
+            arrivals.append(t)
+
+
+def synthetic_frame() -> str:
+    """Small JPEG data URL standing in for a webcam frame."""
+    try:
+        from PIL import Image
+        img = Image.new("RGB", (640, 480), (200, 200, 200))
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=70)
+        data = buf.getvalue()
+    except ImportError:
+        # 1x1 white JPEG
+        data = base64.b64decode(
+            "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofHh0aHBwgJC4nICIsIxwcKDcp"
+            "LDAxNDQ0Hyc5PTgyPC4zNDL/wAALCAABAAEBAREA/8QAFAABAAAAAAAAAAAAAAAAAAAACf/EABQQAQAAAAAAAAAAAAAAAAAA"
+            "AAD/2gAIAQEAAD8AVN//2Q==")
+    return "data:image/jpeg;base64," + base64.b64encode(data).decode()
+
+
+async def sse_lines(content: aiohttp.StreamReader):
+    """Lines of a streamed response, however long. StreamReader's own line
+    iteration raises ValueError past its buffer size, which base64 TTS audio
+    events can exceed."""
+    pending: List[bytes] = []
+    async for data in content.iter_any():
+        *complete, rest = data.split(b"\n")
+        if complete:
+            yield b"".join(pending) + complete[0]
+            for line in complete[1:]:
+                yield line
+            pending = []
+        pending.append(rest)
+    if any(pending):
+        yield b"".join(pending)
+
+
+class LoadTest:
+    def __init__(self, base_url: str, seed: int = 42, max_inflight: int = 500):
         self.base_url = base_url
-        self.results = {
-            'response_times': [],
-            'first_token_times': [],
-            'total_processing_times': [],
-            'throughput_tests': [],
-            'error_count': 0,
-            'success_count': 0
+        self.rng = random.Random(seed)
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.dropped = 0
+        self.results: Dict[str, List[Dict[str, Any]]] = {"text": [], "vision": [], "upload": []}
+        self.frame = synthetic_frame()
+        self.run_id = uuid.uuid4().hex[:8]
+
+    # --- Provisioning through the real APIs ---
+
+    async def _register_and_login(self, http: aiohttp.ClientSession, role: str, index: int) -> Dict[str, Any]:
+        email = f"load-{self.run_id}-{role}-{index}@example.com"
+        password = "loadtest-password"
+        async with http.post(f"{self.base_url}/auth/register",
+                             json={"name": f"Load {role} {index}", "email": email, "password": password, "role": role}) as resp:
+            if resp.status != 201:
+                raise RuntimeError(f"register {email}: HTTP {resp.status} {await resp.text()}")
+        async with http.post(f"{self.base_url}/auth/login", json={"email": email, "password": password}) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"login {email}: HTTP {resp.status}")
+            return await resp.json()
+
+    @staticmethod
+    def _auth(token: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {token}"}
+
+    async def provision(self, http: aiohttp.ClientSession, offices: int, students_per_office: int,
+                        concurrency: int = 20) -> Fixture:
+        print(f"🏗️  Provisioning {offices} offices x {students_per_office} students...")
+        fixture = Fixture()
+        limit = asyncio.Semaphore(concurrency)
+
+        async def make_office(i):
+            async with limit:
+                login = await self._register_and_login(http, "teacher", i)
+                token = login["token"]
+                async with http.post(f"{self.base_url}/office/create", headers=self._auth(token),
+                                     json={"name": f"Load Office {self.run_id}-{i}"}) as resp:
+                    if resp.status != 201:
+                        raise RuntimeError(f"create office: HTTP {resp.status}")
+                    office = (await resp.json())["office"]
+            return {"token": token, "office_id": office["id"], "join_code": office["join_code"]}
+
+        fixture.teachers = await asyncio.gather(*(make_office(i) for i in range(offices)))
+
+        async def make_student(teacher, j):
+            async with limit:
+                login = await self._register_and_login(http, "student", j)
+                token = login["token"]
+                async with http.post(f"{self.base_url}/office/join", headers=self._auth(token),
+                                     json={"join_code": teacher["join_code"]}) as resp:
+                    if resp.status not in (200, 201):
+                        raise RuntimeError(f"join office: HTTP {resp.status}")
+                async with http.post(f"{self.base_url}/chat/start_session", headers=self._auth(token),
+                                     json={"office_id": teacher["office_id"]}) as resp:
+                    if resp.status != 200:
+                        raise RuntimeError(f"start session: HTTP {resp.status}")
+                    session_id = (await resp.json())["session_id"]
+            return VirtualUser(token, session_id, teacher["office_id"])
+
+        fixture.students = await asyncio.gather(*(
+            make_student(teacher, i * students_per_office + j)
+            for i, teacher in enumerate(fixture.teachers) for j in range(students_per_office)))
+        print(f"  ✅ {len(fixture.teachers)} teachers, {len(fixture.students)} students ready")
+        return fixture
+
+    # --- Scenarios ---
+
+    async def run_chat(self, http: aiohttp.ClientSession, user: VirtualUser, vision: bool) -> Dict[str, Any]:
+        start = time.perf_counter()
+        first_text = first_audio = None
+        audio_times: List[float] = []
+        payload = {"session_id": user.session_id, "message": self.rng.choice(TEST_MESSAGES)}
+        if vision:
+            payload["video_frame"] = self.frame
+        try:
+            async with http.post(f"{self.base_url}/chat/message", json=payload, headers=self._auth(user.token)) as resp:
+                if resp.status != 200:
+                    return {"error": f"HTTP {resp.status}"}
+                async for line in sse_lines(resp.content):
+                    if not line.startswith(b"data:"):
+                        continue
+                    now = time.perf_counter() - start
+                    event = json.loads(line[5:].decode().strip())
+                    if event["type"] == "text" and first_text is None:
+                        first_text = now
+                    elif event["type"] == "audio":
+                        first_audio = now if first_audio is None else first_audio
+                        audio_times.append(now)
+                    elif event["type"] == "error":
+                        return {"error": event.get("content")}
+                    elif event["type"] == "end":
+                        break
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:  # ValueError: malformed event
+            return {"error": str(e) or type(e).__name__}
+        return {
+            "ttft_ms": first_text * 1000 if first_text is not None else None,
+            "ttfa_ms": first_audio * 1000 if first_audio is not None else None,
+            "audio_gap_ms": [(b - a) * 1000 for a, b in zip(audio_times, audio_times[1:])],
+            "total_ms": (time.perf_counter() - start) * 1000,
         }
-        
-    async def test_single_request(self, session: aiohttp.ClientSession, message: str, session_id: int) -> Dict[str, Any]:
-        """Test a single chat request and measure latency"""
-        start_time = time.time()
-        first_token_time = None
-        total_chars = 0
-        audio_chunks = 0
-        
+
+    async def run_upload(self, http: aiohttp.ClientSession, teacher: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        form = aiohttp.FormData()
+        form.add_field("office_id", str(teacher["office_id"]))
+        form.add_field("file", ("Lecture notes. " * 2000).encode(), filename="notes.txt", content_type="text/plain")
         try:
-            payload = {
-                'session_id': session_id,
-                'message': message,
-                'use_avatar': True
-            }
-            
-            async with session.post(f"{self.base_url}/chat/message", json=payload) as response:
-                if response.status != 200:
-                    self.results['error_count'] += 1
-                    return {'error': f"HTTP {response.status}"}
-                
-                # Read streaming response
-                async for line in response.content:
-                    if line.startswith(b'data:'):
-                        try:
-                            data = json.loads(line[5:].decode().strip())
-                            
-                            if data['type'] == 'text':
-                                if first_token_time is None:
-                                    first_token_time = time.time()
-                                total_chars += len(data['content'])
-                            elif data['type'] == 'audio':
-                                audio_chunks += 1
-                            elif data['type'] == 'end':
-                                break
-                                
-                        except json.JSONDecodeError:
-                            continue
-                
-                end_time = time.time()
-                self.results['success_count'] += 1
-                
-                return {
-                    'total_time': end_time - start_time,
-                    'first_token_time': first_token_time - start_time if first_token_time else None,
-                    'chars_generated': total_chars,
-                    'audio_chunks': audio_chunks,
-                    'message_length': len(message)
-                }
-                
-        except Exception as e:
-            self.results['error_count'] += 1
-            return {'error': str(e)}
-    
-    async def test_latency(self, num_requests: int = 10) -> None:
-        """Test response latency with sequential requests"""
-        print(f"\n🧪 Testing latency with {num_requests} sequential requests...")
-        
-        # First, create a test session
-        session_id = await self.create_test_session()
-        if not session_id:
-            print("❌ Failed to create test session")
-            return
-        
-        connector = aiohttp.TCPConnector(limit=100, limit_per_host=30)
-        timeout = aiohttp.ClientTimeout(total=120)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            for i in range(num_requests):
-                message = TEST_MESSAGES[i % len(TEST_MESSAGES)]
-                print(f"  Request {i+1}/{num_requests}: {message[:50]}...")
-                
-                result = await self.test_single_request(session, message, session_id)
-                
-                if 'error' not in result:
-                    self.results['response_times'].append(result['total_time'])
-                    if result['first_token_time']:
-                        self.results['first_token_times'].append(result['first_token_time'])
-                    
-                    print(f"    ✅ Completed in {result['total_time']:.3f}s (first token: {result['first_token_time']:.3f}s if first_token_time else 'N/A')")
-                else:
-                    print(f"    ❌ Error: {result['error']}")
-                
-                # Small delay between requests to avoid overwhelming
-                await asyncio.sleep(0.5)
-    
-    async def test_concurrent_requests(self, num_concurrent: int = 5, requests_per_client: int = 3) -> None:
-        """Test system behavior under concurrent load"""
-        print(f"\n🔥 Testing concurrent load: {num_concurrent} clients, {requests_per_client} requests each...")
-        
-        # Create test sessions for each concurrent client
-        session_ids = []
-        for i in range(num_concurrent):
-            session_id = await self.create_test_session()
-            if session_id:
-                session_ids.append(session_id)
-        
-        if len(session_ids) != num_concurrent:
-            print("❌ Failed to create all test sessions")
+            async with http.post(f"{self.base_url}/upload/file", data=form, headers=self._auth(teacher["token"])) as resp:
+                await resp.read()
+                if resp.status != 201:
+                    return {"error": f"HTTP {resp.status}"}
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return {"error": str(e)}
+        return {"total_ms": (time.perf_counter() - start) * 1000}
+
+    async def _arrival(self, http, scenario: str, fixture: Fixture, offset: float):
+        if self.inflight >= self.max_inflight:
+            self.dropped += 1
             return
-        
-        start_time = time.time()
-        connector = aiohttp.TCPConnector(limit=200, limit_per_host=50)
-        timeout = aiohttp.ClientTimeout(total=180)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            tasks = []
-            
-            for client_id in range(num_concurrent):
-                for req_id in range(requests_per_client):
-                    message = TEST_MESSAGES[(client_id * requests_per_client + req_id) % len(TEST_MESSAGES)]
-                    task = self.test_single_request(session, message, session_ids[client_id])
-                    tasks.append(task)
-            
-            # Execute all requests concurrently
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            end_time = time.time()
-            total_time = end_time - start_time
-            
-            successful_results = [r for r in results if isinstance(r, dict) and 'error' not in r]
-            
-            self.results['throughput_tests'].append({
-                'concurrent_clients': num_concurrent,
-                'requests_per_client': requests_per_client,
-                'total_requests': len(tasks),
-                'successful_requests': len(successful_results),
-                'total_time': total_time,
-                'throughput_rps': len(successful_results) / total_time,
-                'avg_response_time': statistics.mean([r['total_time'] for r in successful_results]) if successful_results else 0
-            })
-            
-            print(f"  ✅ Completed {len(successful_results)}/{len(tasks)} requests in {total_time:.2f}s")
-            print(f"  📊 Throughput: {len(successful_results) / total_time:.2f} RPS")
-    
-    async def create_test_session(self) -> int:
-        """Create a test chat session"""
+        self.inflight += 1
         try:
-            connector = aiohttp.TCPConnector()
-            timeout = aiohttp.ClientTimeout(total=30)
-            
-            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-                # This is a simplified session creation - you might need to adapt this
-                # based on your actual authentication and session creation logic
-                payload = {'office_id': 1}  # Assuming office_id 1 exists
-                async with session.post(f"{self.base_url}/chat/start_session", json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get('session_id')
-                    else:
-                        print(f"Failed to create session: HTTP {response.status}")
-                        return None
-        except Exception as e:
-            print(f"Error creating test session: {e}")
-            return None
-    
-    def print_results(self) -> None:
-        """Print comprehensive performance test results"""
-        print("\n" + "="*80)
-        print("🏁 PERFORMANCE TEST RESULTS")
-        print("="*80)
-        
-        print(f"\n📊 OVERALL STATISTICS:")
-        print(f"  Total Requests: {self.results['success_count'] + self.results['error_count']}")
-        print(f"  Successful: {self.results['success_count']}")
-        print(f"  Errors: {self.results['error_count']}")
-        print(f"  Success Rate: {(self.results['success_count'] / (self.results['success_count'] + self.results['error_count']) * 100):.1f}%")
-        
-        if self.results['response_times']:
-            print(f"\n⚡ RESPONSE TIME ANALYSIS:")
-            response_times = self.results['response_times']
-            print(f"  Mean: {statistics.mean(response_times):.3f}s")
-            print(f"  Median: {statistics.median(response_times):.3f}s")
-            print(f"  Min: {min(response_times):.3f}s")
-            print(f"  Max: {max(response_times):.3f}s")
-            print(f"  Std Dev: {statistics.stdev(response_times):.3f}s")
-            
-            # Percentiles
-            sorted_times = sorted(response_times)
-            p95 = sorted_times[int(0.95 * len(sorted_times))]
-            p99 = sorted_times[int(0.99 * len(sorted_times))]
-            print(f"  95th percentile: {p95:.3f}s")
-            print(f"  99th percentile: {p99:.3f}s")
-        
-        if self.results['first_token_times']:
-            print(f"\n🚀 FIRST TOKEN LATENCY:")
-            first_token_times = self.results['first_token_times']
-            print(f"  Mean: {statistics.mean(first_token_times):.3f}s")
-            print(f"  Median: {statistics.median(first_token_times):.3f}s")
-            print(f"  Min: {min(first_token_times):.3f}s")
-            print(f"  Max: {max(first_token_times):.3f}s")
-        
-        if self.results['throughput_tests']:
-            print(f"\n🔥 CONCURRENT LOAD TEST RESULTS:")
-            for test in self.results['throughput_tests']:
-                print(f"  {test['concurrent_clients']} concurrent clients:")
-                print(f"    Throughput: {test['throughput_rps']:.2f} RPS")
-                print(f"    Success Rate: {(test['successful_requests']/test['total_requests']*100):.1f}%")
-                print(f"    Avg Response Time: {test['avg_response_time']:.3f}s")
-        
-        print(f"\n🎯 PERFORMANCE RATING:")
-        if self.results['first_token_times']:
-            avg_first_token = statistics.mean(self.results['first_token_times'])
-            if avg_first_token < 1.0:
-                print("  🟢 EXCELLENT - Sub-second first token latency")
-            elif avg_first_token < 2.0:
-                print("  🟡 GOOD - Fast response times")
-            elif avg_first_token < 5.0:
-                print("  🟠 ACCEPTABLE - Moderate latency")
+            if scenario == "upload":
+                result = await self.run_upload(http, self.rng.choice(fixture.teachers))
             else:
-                print("  🔴 NEEDS IMPROVEMENT - High latency detected")
-        
-        print("\n💡 OPTIMIZATION RECOMMENDATIONS:")
-        if self.results['response_times']:
-            avg_response = statistics.mean(self.results['response_times'])
-            if avg_response > 10:
-                print("  • Consider reducing max_tokens or using faster models")
-            if self.results['error_count'] > 0:
-                print("  • Investigate error causes and improve error handling")
-        
-        print("\n" + "="*80)
+                result = await self.run_chat(http, self.rng.choice(fixture.students), vision=scenario == "vision")
+        finally:
+            self.inflight -= 1
+        result["offset_s"] = round(offset, 3)
+        self.results[scenario].append(result)
+
+    async def run(self, http: aiohttp.ClientSession, fixture: Fixture, stages: List[Stage], mix: Dict[str, float]):
+        schedule = poisson_schedule(stages, self.rng)
+        scenarios, weights = zip(*mix.items())
+        print(f"🔥 Open-loop run: {len(schedule)} arrivals over {sum(s.duration for s in stages):.0f}s")
+        start = time.perf_counter()
+        tasks = []
+        for offset in schedule:
+            delay = offset - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scenario = self.rng.choices(scenarios, weights)[0]
+            tasks.append(asyncio.create_task(self._arrival(http, scenario, fixture, offset)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    # --- Reporting ---
+
+    def build_report(self, wall_time: float, config: Dict[str, Any]) -> Dict[str, Any]:
+        metrics, counts = {}, {}
+        for scenario, results in self.results.items():
+            ok = [r for r in results if "error" not in r]
+            counts[scenario] = {"requests": len(results), "errors": len(results) - len(ok)}
+            if not results:
+                continue
+            metrics[f"{scenario}.total_ms"] = summarize(r["total_ms"] for r in ok)
+            if scenario != "upload":
+                metrics[f"{scenario}.ttft_ms"] = summarize(r["ttft_ms"] for r in ok)
+                metrics[f"{scenario}.ttfa_ms"] = summarize(r["ttfa_ms"] for r in ok)
+                metrics[f"{scenario}.audio_gap_ms"] = summarize(g for r in ok for g in r["audio_gap_ms"])
+        completed = sum(c["requests"] - c["errors"] for c in counts.values())
+        return {
+            "meta": report_meta(tool="performance_test", **config),
+            "wall_time_s": round(wall_time, 3),
+            "throughput_rps": round(completed / wall_time, 3) if wall_time else 0,
+            "dropped_arrivals": self.dropped,
+            "counts": counts,
+            "metrics": metrics,
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("\n" + "=" * 80)
+    print("🏁 LOAD TEST RESULTS")
+    print("=" * 80)
+    print(f"  Wall time: {report['wall_time_s']:.1f}s   Throughput: {report['throughput_rps']:.2f} RPS   "
+          f"Dropped arrivals: {report['dropped_arrivals']}")
+    for scenario, count in report["counts"].items():
+        if count["requests"]:
+            print(f"  {scenario:<7} requests={count['requests']} errors={count['errors']}")
+    print(f"\n  {'metric':<24} {'n':>5} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, s in sorted(report["metrics"].items()):
+        if s.get("count"):
+            print(f"  {name:<24} {s['count']:>5} {s['p50']:>9.1f} {s['p90']:>9.1f} {s['p95']:>9.1f} "
+                  f"{s['p99']:>9.1f} {s['max']:>9.1f}")
+    print("=" * 80)
+
 
 async def main():
-    parser = argparse.ArgumentParser(description="OfficeHours AI Performance Testing")
-    parser.add_argument("--latency-tests", type=int, default=10, help="Number of latency test requests")
-    parser.add_argument("--concurrent-clients", type=int, default=5, help="Number of concurrent clients")
-    parser.add_argument("--requests-per-client", type=int, default=3, help="Requests per concurrent client")
+    parser = argparse.ArgumentParser(description="OfficeHours AI scenario load generator")
     parser.add_argument("--base-url", default=API_BASE, help="Base URL for API")
-    
+    parser.add_argument("--stages", default="30s@1,60s@3,30s@3", help="Ramp stages as duration@rate,... (rate in arrivals/sec)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. text=0.8,vision=0.15,upload=0.05")
+    parser.add_argument("--offices", type=int, default=2, help="Offices (one teacher each) to provision")
+    parser.add_argument("--students-per-office", type=int, default=10, help="Enrolled students per office")
+    parser.add_argument("--max-inflight", type=int, default=500, help="Drop arrivals beyond this many in-flight requests")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed for arrivals and scenario choice")
+    parser.add_argument("--out", default="load_report.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed percentile regression in percent")
+
     args = parser.parse_args()
-    
-    print("🚀 Starting OfficeHours AI Performance Tests")
+    stages = parse_stages(args.stages)
+    mix = parse_mix(args.mix)
+
+    print("🚀 Starting OfficeHours AI Load Test")
     print(f"   Target: {args.base_url}")
     print(f"   Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    tester = PerformanceTest(args.base_url)
-    
-    try:
-        # Test latency
-        await tester.test_latency(args.latency_tests)
-        
-        # Test concurrent load
-        await tester.test_concurrent_requests(args.concurrent_clients, args.requests_per_client)
-        
-        # Print results
-        tester.print_results()
-        
-    except KeyboardInterrupt:
-        print("\n⏹️  Tests interrupted by user")
-    except Exception as e:
-        print(f"\n❌ Test error: {e}")
-    
-    print("\n✅ Performance testing completed!")
+
+    tester = LoadTest(args.base_url, seed=args.seed, max_inflight=args.max_inflight)
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=180)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+        fixture = await tester.provision(http, args.offices, args.students_per_office)
+        wall = await tester.run(http, fixture, stages, mix)
+
+    report = tester.build_report(wall, {"stages": args.stages, "mix": args.mix, "seed": args.seed,
+                                        "offices": args.offices, "students_per_office": args.students_per_office})
+    print_report(report)
+    write_report(args.out, report)
+
+    if args.compare:
+        rows = compare_summaries(load_report(args.compare)["metrics"], report["metrics"], threshold_pct=args.threshold)
+        print()
+        print_comparison(rows)
+        if any(r["regression"] for r in rows):
+            print(f"\n💥 Regression beyond {args.threshold}% detected")
+            return 1
+    return 0
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
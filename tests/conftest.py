@@ -6,7 +6,7 @@ from app import create_app, db
 from app.models.db_models import User, Office, Enrollment, Resource, ChatSession, ChatMessage
 
 @pytest.fixture(scope='function')
-def app():
+def app(tmp_path):
     """Create application for testing."""
     # Create a temporary database file
     db_fd, db_path = tempfile.mkstemp()
@@ -17,7 +17,8 @@ def app():
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
         'WTF_CSRF_ENABLED': False,
         'SECRET_KEY': 'test-secret-key',
-        'JWT_SECRET_KEY': 'test-jwt-secret'
+        'JWT_SECRET_KEY': 'test-jwt-secret',
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),  # keep test uploads out of app/uploads
     })
 
     with app.app_context():
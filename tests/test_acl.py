@@ -0,0 +1,53 @@
+# tests/test_acl.py - Cached authorization tests
+import re
+from sqlalchemy import event
+from tests.utils import TestDataFactory, AuthHelper, OfficeHelper, TestScenarios
+
+ACL_TABLES = re.compile(r'\b(FROM|JOIN)\s+"?(user|office|enrollment)"?(\s|$)', re.IGNORECASE)
+
+class TestAccessCache:
+    """Test role claims and the membership cache."""
+
+    def test_hot_path_skips_authorization_queries(self, app, client):
+        """Once warm, listing files and starting a session never read user/office/enrollment."""
+        from app import db
+        setup = TestScenarios.setup_teacher_student_office(client)
+        student = AuthHelper.get_auth_headers(setup['student_token'])
+        files_url = f"/upload/office/{setup['office_id']}/files"
+        assert client.get(files_url, headers=student).status_code == 200
+
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert client.get(files_url, headers=student).status_code == 200
+            assert client.post('/chat/start_session', headers=student,
+                               json={'office_id': setup['office_id']}).status_code == 200
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert statements
+        assert not [s for s in statements if ACL_TABLES.search(s)]
+
+    def test_membership_changes_are_visible_immediately(self, app, client):
+        """Joining invalidates the cache; grants made elsewhere are found on a denied check."""
+        from app import db
+        from app.models.db_models import Enrollment
+        setup = TestScenarios.setup_teacher_student_office(client)
+        student = AuthHelper.get_auth_headers(setup['student_token'])
+        other = OfficeHelper.create_office_with_teacher(
+            client, TestDataFactory.create_teacher(email="other@example.com"), {"name": "Other"})
+        third = OfficeHelper.create_office_with_teacher(
+            client, TestDataFactory.create_teacher(email="third@example.com"), {"name": "Third"})
+
+        assert client.get(f"/upload/office/{other['office_id']}/files", headers=student).status_code == 403
+        assert client.post('/office/join', headers=student, json={'join_code': other['join_code']}).status_code == 201
+        assert client.get(f"/upload/office/{other['office_id']}/files", headers=student).status_code == 200
+
+        # Written without invalidate(), e.g. by another worker or a script
+        student_id = Enrollment.query.filter_by(office_id=setup['office_id']).first().user_id
+        db.session.add(Enrollment(user_id=student_id, office_id=third['office_id']))
+        db.session.commit()
+        assert client.get(f"/upload/office/{third['office_id']}/files", headers=student).status_code == 200
+        assert client.get("/upload/office/9999/files", headers=student).status_code == 404
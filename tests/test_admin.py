@@ -0,0 +1,110 @@
+# tests/test_admin.py - Admin diagnostics tests
+import pytest
+from tests.utils import TestDataFactory, AuthHelper, OfficeHelper, FileHelper, TestScenarios
+
+@pytest.fixture
+def admin_headers(app, client):
+    """Auth headers of a teacher whose email is listed in ADMIN_EMAILS."""
+    teacher_data = TestDataFactory.create_teacher(email="admin@example.com")
+    app.config['ADMIN_EMAILS'] = {"admin@example.com"}
+    return AuthHelper.get_auth_headers(AuthHelper.register_and_login(client, teacher_data))
+
+class TestProfiler:
+    """Test the sampling profiler endpoints."""
+
+    def test_profile_requires_admin(self, client):
+        """Non-admins cannot profile the worker."""
+        token = AuthHelper.register_and_login(client, TestDataFactory.create_student())
+        response = client.get('/admin/profile?seconds=0.1',
+                              headers=AuthHelper.get_auth_headers(token))
+        assert response.status_code == 403
+
+    def test_profile_rejects_bad_params(self, client, admin_headers):
+        """Bad durations are a 400 and leave no sampler thread behind."""
+        import threading
+        for query in ('seconds=abc', 'seconds=nan', 'interval_ms=x', 'seconds=inf'):
+            assert client.get(f'/admin/profile?{query}', headers=admin_headers).status_code == 400
+        assert client.get('/admin/profile?seconds=-5&format=collapsed', headers=admin_headers).status_code == 200
+        assert not [t for t in threading.enumerate() if t.name == "sampling-profiler"]
+
+    def test_profile_collapsed_stacks(self, client, admin_headers):
+        """Admins get collapsed stacks for all threads."""
+        response = client.get('/admin/profile?seconds=0.1&format=collapsed', headers=admin_headers)
+        assert response.status_code == 200
+        lines = response.get_data(as_text=True).strip().splitlines()
+        assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+    def test_per_request_profile(self, client, admin_headers):
+        """X-Profile on /upload/file stores a speedscope profile for that request."""
+        office_id = client.post('/office/create', headers=admin_headers,
+                                json={"name": "Profiled"}).get_json()['office']['id']
+        headers = {**admin_headers, 'X-Profile': '1'}
+        response = client.post('/upload/file', headers=headers,
+                               data={'office_id': office_id, 'file': FileHelper.create_test_file()})
+        assert response.status_code == 201
+        profile_id = response.headers['X-Profile-Id']
+
+        profile = client.get(f'/admin/profiles/{profile_id}', headers=admin_headers).get_json()
+        assert profile['$schema'].startswith('https://www.speedscope.app')
+        assert 'profiles' in profile
+
+class TestMemory:
+    """Test the tracemalloc and memory gauge endpoints."""
+
+    def test_memory_gauges(self, client, admin_headers):
+        """RSS and cache-size gauges are reported."""
+        response = client.get('/admin/memory', headers=admin_headers)
+        assert response.status_code == 200
+        gauges = response.get_json()['gauges']
+        assert gauges['memory.rss_bytes'] > 0
+        assert gauges['cache.performance_metrics_bytes'] > 0
+
+    def test_bad_params_rejected(self, client, admin_headers):
+        assert client.post('/admin/memory/start', headers=admin_headers, json={'frames': 'many'}).status_code == 400
+        assert client.post('/admin/memory/start', headers=admin_headers, json={'frames': None}).status_code == 400
+        assert client.get('/admin/memory/snapshot?top=x', headers=admin_headers).status_code == 400
+
+    def test_snapshot_diff(self, client, admin_headers):
+        """A second snapshot is diffed against the first and grouped by module."""
+        assert client.get('/admin/memory/snapshot', headers=admin_headers).status_code == 409
+
+        assert client.post('/admin/memory/start', headers=admin_headers, json={'frames': 1}).status_code == 200
+        try:
+            first = client.get('/admin/memory/snapshot', headers=admin_headers).get_json()
+            assert 'diff' not in first
+            assert first['groups'] and first['top_sites']
+
+            leak = [bytearray(1024) for _ in range(200)]
+            second = client.get('/admin/memory/snapshot?top=50', headers=admin_headers).get_json()
+            groups = {g['group']: g for g in second['diff']['groups']}
+            assert groups['test_admin.py']['size_diff_bytes'] >= 200 * 1024
+            del leak
+        finally:
+            client.post('/admin/memory/stop', headers=admin_headers)
+
+class TestArchive:
+    """Test the archive compaction endpoints."""
+
+    def test_compact_and_report(self, app, client, admin_headers):
+        from datetime import datetime
+        from app import db
+        from app.models.db_models import ChatMessage
+        setup = TestScenarios.setup_teacher_student_office(client)
+        session_id = client.post('/chat/start_session', headers=AuthHelper.get_auth_headers(setup['student_token']),
+                                 json={'office_id': setup['office_id']}).get_json()['session_id']
+        db.session.execute(ChatMessage.__table__.insert(), [
+            {"session_id": session_id, "sender": "user", "message": "same question " * 20,
+             "timestamp": datetime(2025, 1, 1, 9, i)} for i in range(40)
+        ])
+        db.session.commit()
+
+        run = client.post('/admin/archive/compact', headers=admin_headers, json={'idle_days': 30}).get_json()
+        assert run['sessions'] == 1 and run['messages'] == 40
+        assert run['compression_ratio'] > 5
+        assert run['hot_rows'] == 0
+
+        report = client.get('/admin/archive/report', headers=admin_headers).get_json()
+        assert len(report['runs']) == 1
+        assert client.get('/admin/archive/report?limit=x', headers=admin_headers).status_code == 400
+        assert len(client.get('/admin/archive/report?limit=-3', headers=admin_headers).get_json()['runs']) == 1
+        assert report['totals']['reclaimed_bytes'] == run['raw_bytes'] - run['compressed_bytes']
@@ -101,4 +101,49 @@ class TestAuth:
         assert response.status_code == 401
         
         json_data = response.get_json()
-        assert 'Invalid credentials' in json_data['error']
\ No newline at end of file
+        assert 'Invalid credentials' in json_data['error']
+
+
+class TestPasswordHasher:
+    """Test bounded password hashing and hash upgrades."""
+
+    def test_login_shed_when_hasher_full(self, app, client):
+        """With every hashing slot taken, login fails fast with 503 and Retry-After."""
+        from app.services.password_hasher import get_password_hasher
+        client.post('/auth/register', json={"name": "S", "email": "busy@example.com",
+                                            "password": "pw123456", "role": "student"})
+        hasher = get_password_hasher(app)
+        for _ in range(hasher.max_pending):
+            hasher._slots.acquire()
+        try:
+            response = client.post('/auth/login', json={"email": "busy@example.com", "password": "pw123456"})
+        finally:
+            for _ in range(hasher.max_pending):
+                hasher._slots.release()
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+        assert client.post('/auth/login', json={"email": "busy@example.com",
+                                                "password": "pw123456"}).status_code == 200
+
+    def test_outdated_hash_upgraded_on_login(self, app, client):
+        """A hash made with old parameters still works and is replaced after login."""
+        from werkzeug.security import generate_password_hash
+        from app import db
+        db.session.add(User(name="Old", email="old@example.com", role="student",
+                            password=generate_password_hash("pw123456", method="pbkdf2:sha256:1000")))
+        db.session.commit()
+
+        response = client.post('/auth/login', json={"email": "old@example.com", "password": "pw123456"})
+        assert response.status_code == 200
+        db.session.expire_all()
+        upgraded = User.query.filter_by(email="old@example.com").first().password
+        assert upgraded.startswith("scrypt:")
+        assert client.post('/auth/login', json={"email": "old@example.com",
+                                                "password": "pw123456"}).status_code == 200
+
+    def test_unbounded_queue(self):
+        """PASSWORD_HASH_QUEUE=0 means no limit, not no capacity."""
+        from app.services.password_hasher import PasswordHasher
+        hasher = PasswordHasher(workers=0, max_pending=0, method="pbkdf2:sha256:1000")
+        hashed = hasher.hash("x")
+        assert hasher.verify("x", hashed) and hasher._pending == 0
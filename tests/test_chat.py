@@ -1,7 +1,7 @@
 # tests/test_chat.py - Chat functionality tests  
 import pytest
 from unittest.mock import patch
-from tests.utils import TestDataFactory, AuthHelper, OfficeHelper, ChatHelper
+from tests.utils import TestDataFactory, AuthHelper, OfficeHelper, ChatHelper, TestScenarios
 
 class TestChat:
     """Test chat functionality."""
@@ -108,4 +108,199 @@ class TestChat:
         assert response.status_code == 200
         json_data = response.get_json()
         assert 'history' in json_data
-        assert len(json_data['history']) == 2  # User message + AI reply
\ No newline at end of file
+        assert len(json_data['history']) == 2  # User message + AI reply
+
+
+class TestStreamHelpers:
+    """Test sentence segmentation and SSE encoding helpers."""
+
+    def test_split_complete_sentence(self):
+        """Text up to the sentence ending is split off, the rest is kept."""
+        from app.routes.chat import split_complete_sentence
+        sentence, rest = split_complete_sentence("The chain rule is useful. It")
+        assert sentence == "The chain rule is useful."
+        assert rest == " It"
+        assert split_complete_sentence("No ending yet") == (None, "No ending yet")
+
+    def test_is_speakable(self):
+        """Short fragments are not sent to TTS."""
+        from app.routes.chat import is_speakable
+        assert is_speakable("This sentence is long enough to speak.")
+        assert not is_speakable("Yes.")
+
+    def test_encode_sse_event(self):
+        """Chunks are encoded as SSE data frames."""
+        import json
+        from app.routes.chat import encode_sse_event
+        frame = encode_sse_event({'type': 'end', 'processing_time': 1.5, 'metrics': {}})
+        assert frame.startswith('data: ') and frame.endswith('\n\n')
+        assert json.loads(frame[6:]) == {'type': 'end', 'processing_time': 1.5}
+
+    def test_base64_decoded_size(self):
+        """Cached TTS audio is traced in audio bytes, like freshly generated audio."""
+        import base64
+        from app.routes.chat import base64_decoded_size
+        for audio in (b"", b"a", b"ab", b"abc", bytes(range(256)) * 3):
+            encoded = base64.b64encode(audio)
+            assert base64_decoded_size(encoded) == base64_decoded_size(encoded.decode()) == len(audio)
+
+
+class TestMessageWriter:
+    """Test write-behind persistence of chat messages."""
+
+    def test_concurrent_writes_are_batched(self, app):
+        """Messages submitted together commit in shared batches, in submit order."""
+        import threading
+        from app import db
+        from app.models.db_models import User, Office, ChatSession, ChatMessage
+        from app.services.message_writer import MessageWriter
+
+        user = User(name="S", email="s@example.com", password="x", role="student")
+        db.session.add(user)
+        db.session.flush()
+        office = Office(name="O", join_code="WRITE1", owner_id=user.id)
+        db.session.add(office)
+        db.session.flush()
+        session = ChatSession(user_id=user.id, office_id=office.id)
+        db.session.add(session)
+        db.session.commit()
+        session_id = session.id
+
+        committed_sessions = []
+        writer = MessageWriter(app, max_delay=0.05, on_commit=committed_sessions.extend)
+        try:
+            pending = []
+            threads = [threading.Thread(target=lambda i=i: pending.append(writer.submit(session_id, 'user', f"m{i}")))
+                       for i in range(20)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert len(pending) == 20 and all(p.wait(5) for p in pending)
+        finally:
+            writer.close()
+
+        db.session.expire_all()
+        rows = ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.timestamp).all()
+        assert len(rows) == 20
+        assert [r.message for r in rows] == [p.row['message'] for p in sorted(pending, key=lambda p: p.row['timestamp'])]
+        assert 1 <= len(committed_sessions) < 20
+
+    def test_failed_row_does_not_drop_batch(self, app):
+        """A bad row is rejected on retry while the rest of its batch commits."""
+        from app.models.db_models import ChatMessage
+        from app.services.message_writer import MessageWriter
+
+        writer = MessageWriter(app, max_delay=0.05)
+        try:
+            bad = writer.submit(1, 'user', None)  # message is NOT NULL
+            good = writer.submit(1, 'user', "fine")
+            assert good.wait(5)
+            assert not bad.wait(5) and bad.error is not None
+        finally:
+            writer.close()
+        assert ChatMessage.query.filter_by(message="fine").count() == 1
+
+
+class TestHistoryPagination:
+    """Test keyset-paginated, streamed and cached /chat/history."""
+
+    @pytest.fixture
+    def history_session(self, app, client):
+        """A student session with 25 messages, two of them sharing a timestamp."""
+        from datetime import datetime, timedelta
+        from app import db
+        from app.models.db_models import ChatSession, ChatMessage
+        setup = TestScenarios.setup_teacher_student_office(client)
+        headers = AuthHelper.get_auth_headers(setup['student_token'])
+        session_id = client.post('/chat/start_session', headers=headers,
+                                 json={'office_id': setup['office_id']}).get_json()['session_id']
+        start = datetime(2025, 3, 1, 12, 0, 0)
+        db.session.execute(ChatMessage.__table__.insert(), [
+            {"session_id": session_id, "sender": "user" if i % 2 == 0 else "ai", "message": f"m{i}",
+             "timestamp": start + timedelta(seconds=min(i, 24) if i != 11 else 10)}
+            for i in range(25)
+        ])
+        db.session.commit()
+        return headers, session_id
+
+    def test_full_history_streams_all_messages(self, client, history_session):
+        headers, session_id = history_session
+        response = client.get(f'/chat/history/{session_id}', headers=headers)
+        assert response.status_code == 200
+        assert response.is_streamed
+        messages = [m['message'] for m in response.get_json()['history']]
+        assert messages == [f"m{i}" for i in range(25)]
+
+    def test_keyset_pages_cover_history_once(self, client, history_session):
+        """Walking back with `before` cursors returns every message exactly once."""
+        headers, session_id = history_session
+        seen = []
+        url = f'/chat/history/{session_id}?limit=4'
+        while True:
+            page = client.get(url, headers=headers).get_json()
+            seen = [m['message'] for m in page['history']] + seen
+            if not page['page']['has_more_before']:
+                break
+            url = f"/chat/history/{session_id}?limit=4&before={page['page']['before']}"
+        assert seen == [f"m{i}" for i in range(25)]
+
+        first = client.get(f'/chat/history/{session_id}?limit=3&after=' + page['page']['after'],
+                           headers=headers).get_json()
+        assert [m['message'] for m in first['history']] == ['m1', 'm2', 'm3']
+
+        assert client.get(f'/chat/history/{session_id}?before=garbage', headers=headers).status_code == 400
+
+    def test_etag_returns_304_until_history_changes(self, client, history_session):
+        from app import db
+        from app.models.db_models import ChatMessage
+        headers, session_id = history_session
+        etag = client.get(f'/chat/history/{session_id}?limit=10', headers=headers).headers['ETag']
+
+        cached = client.get(f'/chat/history/{session_id}?limit=10', headers={**headers, 'If-None-Match': etag})
+        assert cached.status_code == 304
+
+        db.session.add(ChatMessage(session_id=session_id, sender='user', message='new'))
+        db.session.commit()
+        fresh = client.get(f'/chat/history/{session_id}?limit=10', headers={**headers, 'If-None-Match': etag})
+        assert fresh.status_code == 200
+        assert fresh.get_json()['history'][-1]['message'] == 'new'
+
+    def test_archived_history_reads_transparently(self, app, client, history_session):
+        """After compaction full, paged and LLM history are unchanged and new messages follow."""
+        from app import db
+        from app.models.db_models import ChatMessage, ChatMessageArchive
+        from app.routes.chat import get_chat_history_for_llm
+        from app.services import archive
+        headers, session_id = history_session
+        expected = [f"m{i}" for i in range(25)]
+
+        result = archive.compact(app, idle_days=1, segment_size=7)
+        assert result['messages'] == 25 and result['compressed_bytes'] > 0
+        assert ChatMessage.query.filter_by(session_id=session_id).count() == 0
+        assert ChatMessageArchive.query.filter_by(session_id=session_id).count() == 4
+
+        db.session.add(ChatMessage(session_id=session_id, sender='user', message='new'))
+        db.session.commit()
+        expected.append('new')
+
+        full = client.get(f'/chat/history/{session_id}', headers=headers).get_json()
+        assert [m['message'] for m in full['history']] == expected
+
+        seen = []
+        url = f'/chat/history/{session_id}?limit=4'
+        while True:
+            page = client.get(url, headers=headers).get_json()
+            seen = [m['message'] for m in page['history']] + seen
+            if not page['page']['has_more_before']:
+                break
+            url = f"/chat/history/{session_id}?limit=4&before={page['page']['before']}"
+        assert seen == expected
+
+        forward = client.get(f'/chat/history/{session_id}?limit=30&after=' + page['page']['after'],
+                             headers=headers).get_json()
+        oldest_page = len(page['history'])
+        assert [m['message'] for m in forward['history']] == expected[oldest_page:]
+
+        with patch('app.routes.chat.redis_client', None):
+            assert [m['content'] for m in get_chat_history_for_llm(app, session_id)] == expected
@@ -0,0 +1,39 @@
+# tests/test_database.py - Engine configuration tests
+from sqlalchemy import text
+from app.services.database import engine_options, normalize_url, read_session
+
+class TestDatabaseEngines:
+    """Test SQLite WAL setup and Postgres pool options."""
+
+    def test_postgres_options(self):
+        """Postgres URLs get a sized, pre-pinged pool; postgres:// is accepted."""
+        url = normalize_url("postgres://u:p@db.example.com/officehours")
+        assert url.startswith("postgresql://")
+        options = engine_options(url)
+        assert options["pool_size"] > 0 and options["pool_pre_ping"]
+
+    def test_sqlite_file_uses_wal_and_read_engine(self, monkeypatch, tmp_path):
+        """File databases run in WAL mode with a separate query-only read engine."""
+        from app import create_app, db
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'wal.db'}")
+        app = create_app()
+        with app.app_context():
+            assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            with read_session(app) as read_db:
+                assert read_db.get_bind() is not db.engine
+                assert read_db.execute(text("PRAGMA query_only")).scalar() == 1
+            db.session.remove()
+            app.extensions["read_engine"].dispose()
+            db.engine.dispose()
+
+    def test_route_queries_use_indexes(self, app):
+        """Every route query is an index search, not a table scan."""
+        import random
+        from app import db
+        from benchmarks.bench_queries import route_queries, explain, full_scan
+        ids = {"users": 10, "offices": 10, "sessions": 10}
+        with db.engine.connect() as conn:
+            for name, table, build in route_queries(ids):
+                sql = str(build(random.Random(1)).compile(db.engine, compile_kwargs={"literal_binds": True}))
+                plan = explain(conn, "sqlite", sql)
+                assert not full_scan(plan, table, "sqlite"), f"{name}: {plan}"
@@ -0,0 +1,92 @@
+# tests/test_llm_provider.py - Mock LLM/TTS provider tests
+import json
+import pytest
+from app.services.llm_provider import MockConfig, MockOpenAIClient, MP3_FRAME
+from tests.utils import TestScenarios, AuthHelper
+
+FAST_CONFIG = MockConfig(first_token_delay=0, tokens_per_sec=0, tts_latency_mean=0, tts_latency_jitter=0)
+
+class TestMockProvider:
+    """Test the deterministic mock provider."""
+
+    def test_stream_is_deterministic(self):
+        """Same prompt produces the same token stream."""
+        client = MockOpenAIClient(FAST_CONFIG)
+        messages = [{"role": "user", "content": [{"type": "text", "text": "What is a derivative?"}]}]
+
+        def collect():
+            stream = client.chat.completions.create(model="m", messages=messages, stream=True)
+            return [c.choices[0].delta.content for c in stream if c.choices[0].delta.content]
+
+        first = collect()
+        assert first and first == collect()
+
+    def test_speech_returns_mp3_frames(self):
+        """TTS payload is a whole number of MP3 frames."""
+        client = MockOpenAIClient(FAST_CONFIG)
+        audio = b"".join(client.audio.speech.create(input="one two three four five").iter_bytes())
+        assert audio.startswith(b"\xff\xfb")
+        assert len(audio) % len(MP3_FRAME) == 0
+
+    def test_error_injection(self):
+        """An error rate of 1 always fails."""
+        import openai
+        client = MockOpenAIClient(MockConfig(error_rate=1.0, first_token_delay=0))
+        with pytest.raises(openai.APIStatusError):
+            client.chat.completions.create(model="m", messages=[], stream=True)
+
+    def test_chat_message_streams_with_mock(self, client, monkeypatch):
+        """The full /chat/message pipeline runs against the mock."""
+        from app.routes import chat
+        monkeypatch.setattr(chat, 'openai_client', MockOpenAIClient(FAST_CONFIG))
+        monkeypatch.setattr(chat, 'redis_client', None)
+
+        setup = TestScenarios.setup_teacher_student_office(client)
+        headers = AuthHelper.get_auth_headers(setup['student_token'])
+        session_id = client.post('/chat/start_session', headers=headers,
+                                 json={'office_id': setup['office_id']}).get_json()['session_id']
+
+        response = client.post('/chat/message', headers=headers,
+                               json={'session_id': session_id, 'message': 'Explain the chain rule.'})
+        events = [json.loads(line[6:]) for line in response.get_data(as_text=True).splitlines()
+                  if line.startswith('data: ')]
+        types = [e['type'] for e in events]
+
+        assert 'text' in types and 'audio' in types
+        assert types[-1] == 'end'
+
+        # Both sides of the exchange were committed before 'end' was sent (no flush needed)
+        from app.models.db_models import ChatMessage
+        rows = ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.timestamp).all()
+        assert [r.sender for r in rows] == ['user', 'ai']
+        assert rows[1].message == ''.join(e['content'] for e in events if e['type'] == 'text')
+
+class TestTraceReplay:
+    """Test recording chat traces and replaying them."""
+
+    def test_record_then_replay(self, client, monkeypatch, tmp_path):
+        """A recorded trace replays the same token stream."""
+        from app.routes import chat
+        from app.services.trace_recorder import load_traces, ReplayOpenAIClient
+        trace_file = tmp_path / 'traces.jsonl'
+        monkeypatch.setenv('CHAT_TRACE_FILE', str(trace_file))
+        monkeypatch.setattr(chat, 'openai_client', MockOpenAIClient(FAST_CONFIG))
+        monkeypatch.setattr(chat, 'redis_client', None)
+
+        setup = TestScenarios.setup_teacher_student_office(client)
+        headers = AuthHelper.get_auth_headers(setup['student_token'])
+        session_id = client.post('/chat/start_session', headers=headers,
+                                 json={'office_id': setup['office_id']}).get_json()['session_id']
+        client.post('/chat/message', headers=headers,
+                    json={'session_id': session_id, 'message': 'What is a limit?'}).get_data()
+
+        traces = load_traces(str(trace_file))
+        assert len(traces) == 1
+        trace = traces[0]
+        assert trace['prompt'] == 'What is a limit?'
+        assert trace['tokens'] and trace['tts']
+
+        replay = ReplayOpenAIClient(traces, speed=1000)
+        stream = replay.chat.completions.create(messages=[{'role': 'user', 'content': 'What is a limit?'}], stream=True)
+        replayed = [c.choices[0].delta.content for c in stream]
+        assert replayed == [token for _, token in trace['tokens']]
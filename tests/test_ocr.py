@@ -0,0 +1,237 @@
+# tests/test_ocr.py - OCR pipeline tests
+import os
+import shutil
+import subprocess
+import importlib.util
+import pytest
+from tests.utils import AuthHelper, OfficeHelper
+
+FAKE_TESSERACT = """#!/bin/sh
+[ -n "$FAKE_TESSERACT_SLEEP" ] && sleep "$FAKE_TESSERACT_SLEEP"
+if [ -n "$FAKE_TESSERACT_ECHO_HASH" ]; then
+    echo "slide $(cksum < "$1" | cut -d' ' -f1)" > "$2.txt"
+else
+    echo "whiteboard notes" > "$2.txt"
+fi
+"""
+
+@pytest.fixture(autouse=True)
+def ocr_cache(tmp_path, monkeypatch):
+    """An empty OCR cache under tmp_path instead of app/uploads, visible to child processes too."""
+    from app.services import ocr
+    monkeypatch.setenv("OCR_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(ocr, "OCR_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+@pytest.fixture
+def fake_tesseract(tmp_path, monkeypatch):
+    """A tesseract stand-in on PATH, visible to child processes too."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "tesseract"
+    script.write_text(FAKE_TESSERACT)
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return tmp_path
+
+def make_photo(path, shade=190):
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (4000, 3000), (shade, shade, shade - 10))
+    ImageDraw.Draw(image).text((200, 200), "x = 2y + 1", fill=(20, 20, 20))
+    image.save(path, quality=90)
+    return str(path)
+
+class TestOcr:
+    """Test preprocessing, the pool, timeouts and the cache."""
+
+    def test_preprocess_downscales_and_binarizes(self, tmp_path):
+        from PIL import Image
+        from app.services import ocr
+        with Image.open(make_photo(tmp_path / "board.jpg")) as image:
+            prepared = ocr.preprocess(image)
+        assert max(prepared.size) == ocr.OCR_MAX_SIDE and prepared.mode == "1"
+        assert 40 <= ocr.otsu_threshold([0] * 40 + [500] + [0] * 159 + [900] + [0] * 55) < 200
+
+    def test_batch_in_order_then_cached(self, fake_tesseract):
+        from app.services import ocr, metrics
+        paths = [make_photo(fake_tesseract / f"board{i}.jpg", shade=150 + i) for i in range(4)]
+        before = metrics.snapshot_counters()
+
+        first = list(ocr.ocr_many(paths, workers=2))
+        assert [r.path for r in first] == paths
+        assert {(r.status, r.text) for r in first} == {("ok", "whiteboard notes")}
+        second = list(ocr.ocr_many(paths, workers=2))
+        assert [r.status for r in second] == ["cached"] * 4
+
+        counted = metrics.counters_since(before)
+        assert counted["ocr.images"] == {"status=ok": 4, "status=cached": 4}
+        assert sum(counted["ocr.latency_ms"].values()) == 4
+
+    def test_timeout_is_per_image(self, fake_tesseract, monkeypatch):
+        from app.services import ocr
+        monkeypatch.setenv("FAKE_TESSERACT_SLEEP", "5")
+        monkeypatch.setattr(ocr, "OCR_TIMEOUT", 0.5)
+        result = ocr.ocr_image(make_photo(fake_tesseract / "slow.jpg"))
+        assert result.status == "timeout" and result.seconds < 4
+        assert ocr.text_or_placeholder(result) == "[IMAGE: slow.jpg - text extraction failed]"
+        assert ocr.cache_get(ocr.file_hash(result.path)) is None
+
+    def test_worker_forwards_ocr_metrics(self, app, client, fake_tesseract):
+        """An image job runs OCR in the worker child; its counters reach this process."""
+        from app import db
+        from app.services import metrics, resource_text
+        from app.services.extraction_queue import ExtractionWorker
+        data = OfficeHelper.create_office_with_teacher(client)
+        with open(make_photo(fake_tesseract / "upload.jpg"), "rb") as f:
+            body = client.post('/upload/file', headers=AuthHelper.get_auth_headers(data["teacher_token"]),
+                               data={'office_id': data['office_id'], 'file': (f, 'board.jpg')}).get_json()
+        before = metrics.snapshot_counters()
+        worker = ExtractionWorker(app, "test")
+        try:
+            assert worker.run_once()
+        finally:
+            worker.process.stop()
+        assert resource_text.full_text(db.session, body['resource']['id']) == "whiteboard notes"
+        assert metrics.counters_since(before)["ocr.images"] == {"status=ok": 1}
+
+def make_clip(path, slides, seconds=6, size=(320, 180), fps=5):
+    """A clip showing each (shade, box) slide for `seconds`, with ffmpeg or OpenCV."""
+    from PIL import Image, ImageDraw
+    images = []
+    for shade, box in slides:
+        image = Image.new("RGB", size, (shade, shade, shade))
+        ImageDraw.Draw(image).rectangle(box, fill=(255 - shade,) * 3)
+        images.append(image)
+    if shutil.which("ffmpeg"):
+        inputs = []
+        for index, image in enumerate(images):
+            image.save(path.parent / f"slide{index}.png")
+            inputs += ["-loop", "1", "-t", str(seconds), "-i", str(path.parent / f"slide{index}.png")]
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", *inputs, "-filter_complex",
+                        f"concat=n={len(images)}:v=1,fps={fps},format=yuv420p", "-g", str(fps * 2),
+                        "-y", str(path)], check=True)
+    else:
+        import cv2
+        import numpy
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        for image in images:
+            frame = numpy.array(image)[:, :, ::-1]
+            for _ in range(seconds * fps):
+                writer.write(frame)
+        writer.release()
+    return str(path)
+
+def make_thumb(shade, box=None):
+    """A THUMB_SIZE grayscale frame, optionally with a dark box (the slide's content)."""
+    from PIL import Image, ImageDraw
+    from app.services import video
+    image = Image.new("L", video.THUMB_SIZE, shade)
+    if box:
+        ImageDraw.Draw(image).rectangle(box, fill=0)
+    return image.tobytes()
+
+class TestVideo:
+    """Test scene selection and keyframe OCR with stand-in frame sources."""
+
+    def test_one_keyframe_per_slide(self):
+        from app.services import video
+        first, second = make_thumb(230, (10, 10, 80, 40)), make_thumb(230, (60, 30, 150, 80))
+        noisy = make_thumb(232, (10, 10, 80, 40))  # same slide, slightly different exposure
+        thumbs = [first, first, noisy, make_thumb(120), second, second, second, first, first]
+        frames = [video.Frame(index * 2.0, thumb) for index, thumb in enumerate(thumbs)]
+
+        assert [f.seconds for f in video.select_keyframes(frames, 0.06)] == [2.0, 10.0, 16.0]
+        assert [f.seconds for f in video.select_keyframes(frames[:1], 0.06)] == [0.0]
+        assert video.frame_difference(first, noisy) < 0.06 < video.frame_difference(first, second)
+
+    def test_keyframes_become_timestamped_chunks(self, fake_tesseract, monkeypatch):
+        from PIL import Image, ImageDraw
+        from app.services import metrics, video
+        from app.utils.file_processor import iter_text_segments
+        monkeypatch.setenv("FAKE_TESSERACT_ECHO_HASH", "1")
+        # 40 minutes sampled every 2 s: slide 1, slide 2 (twice, the speaker passing in between), slide 3
+        layout = [(0, 1), (300, 2), (900, 0), (906, 2), (2000, 3)]
+        def slide_at(seconds):
+            return next(slide for start, slide in reversed(layout) if seconds >= start)
+        thumbs = {slide: make_thumb(230, (20 * slide, 10, 20 * slide + 40, 50)) for slide in range(4)}
+        grabbed = []
+        def grab_frame(path, seconds, out_path):
+            grabbed.append(seconds)
+            image = Image.new("L", (640, 360), 240)
+            ImageDraw.Draw(image).rectangle((100 * slide_at(seconds), 50, 100 * slide_at(seconds) + 80, 200), fill=0)
+            image.save(out_path)
+        monkeypatch.setattr(video, "backend", lambda: "ffmpeg")
+        monkeypatch.setattr(video, "sample_frames", lambda path: (
+            video.Frame(float(t), thumbs[slide_at(t)]) for t in range(0, 2400, 2)))
+        monkeypatch.setattr(video, "grab_frame", grab_frame)
+        monkeypatch.setattr(video, "OCR_BATCH", 2)
+        before = metrics.snapshot_counters()
+
+        segments = list(iter_text_segments(str(fake_tesseract / "lecture.mp4"), 'video'))
+        assert grabbed == [2.0, 302.0, 902.0, 908.0, 2002.0]
+        assert [(s.kind, s.number) for s in segments] == [('keyframe', 2), ('keyframe', 302), ('keyframe', 902),
+                                                          ('keyframe', 908), ('keyframe', 2002)]
+        assert segments[0].text.startswith("[00:02] slide ") and segments[4].text.startswith("[33:22] slide ")
+        assert segments[1].text[8:] == segments[3].text[8:] != segments[2].text[8:]
+        assert metrics.counters_since(before)["video.keyframes"] == {"": 5}
+
+    def test_repeated_text_and_no_decoder(self, fake_tesseract, monkeypatch):
+        from PIL import Image
+        from app.services import video
+        from app.utils.file_processor import iter_text_segments, extract_from_video
+        path = str(fake_tesseract / "lecture.mp4")
+        monkeypatch.setattr(video, "backend", lambda: None)
+        assert extract_from_video(path) == "[VIDEO: lecture.mp4 - no video decoder available]"
+
+        thumbs = [make_thumb(200)] * 3 + [make_thumb(40)] * 3
+        monkeypatch.setattr(video, "backend", lambda: "ffmpeg")
+        monkeypatch.setattr(video, "sample_frames", lambda path: (
+            video.Frame(index * 2.0, thumb) for index, thumb in enumerate(thumbs)))
+        monkeypatch.setattr(video, "grab_frame", lambda path, seconds, out: Image.new("L", (64, 64), 250).save(out))
+        # Both scenes read as the same text: only the first is kept
+        segments = list(iter_text_segments(path, 'video'))
+        assert [(s.kind, s.number, s.text) for s in segments] == [('keyframe', 2, "[00:02] whiteboard notes")]
+
+    def test_failed_grab_skips_one_keyframe(self, fake_tesseract, monkeypatch):
+        import subprocess
+        from PIL import Image
+        from app.services import metrics, video
+        from app.utils.file_processor import iter_text_segments
+        monkeypatch.setenv("FAKE_TESSERACT_ECHO_HASH", "1")
+        thumbs = [make_thumb(shade) for shade in (200, 200, 40, 40, 120, 120)]
+        def grab_frame(path, seconds, out_path):
+            if seconds == 6.0:
+                raise subprocess.CalledProcessError(1, "ffmpeg")
+            Image.new("L", (64, 64), int(seconds * 20)).save(out_path)
+        monkeypatch.setattr(video, "backend", lambda: "ffmpeg")
+        monkeypatch.setattr(video, "sample_frames", lambda path: (
+            video.Frame(index * 2.0, thumb) for index, thumb in enumerate(thumbs)))
+        monkeypatch.setattr(video, "grab_frame", grab_frame)
+        before = metrics.snapshot_counters()
+
+        segments = list(iter_text_segments(str(fake_tesseract / "lecture.mp4"), 'video'))
+        assert [s.number for s in segments] == [2, 10]
+        assert metrics.counters_since(before)["video.keyframes_skipped"] == {"": 1}
+
+    @pytest.mark.skipif(not (shutil.which("ffmpeg") or importlib.util.find_spec("cv2")),
+                        reason="needs ffmpeg or OpenCV to encode and decode a clip")
+    def test_decodes_real_clip(self, fake_tesseract, monkeypatch):
+        """The real decoder finds the two slides of a generated 12 s clip."""
+        from PIL import Image
+        from app.services import video
+        from app.utils.file_processor import iter_text_segments
+        monkeypatch.setenv("FAKE_TESSERACT_ECHO_HASH", "1")
+        clip = make_clip(fake_tesseract / "clip.mp4", [(230, (20, 20, 120, 80)), (60, (180, 100, 300, 160))])
+        assert 10 <= (video.duration(clip) or 12) <= 14
+
+        frames = list(video.sample_frames(clip))
+        assert 5 <= len(frames) <= 7 and all(len(f.thumb) == 160 * 90 for f in frames)
+        keyframes = list(video.select_keyframes(frames))
+        assert len(keyframes) == 2 and keyframes[0].seconds < 6 <= keyframes[1].seconds
+
+        video.grab_frame(clip, keyframes[1].seconds, str(fake_tesseract / "slide.png"))
+        with Image.open(fake_tesseract / "slide.png") as image:
+            assert image.size == (320, 180) and image.convert("L").getpixel((5, 5)) < 128
+
+        segments = list(iter_text_segments(clip, 'video'))
+        assert [s.kind for s in segments] == ['keyframe', 'keyframe'] and segments[0].text != segments[1].text
@@ -66,4 +66,108 @@ class TestOffice:
                              headers=AuthHelper.get_auth_headers(token),
                              json={"join_code": "INVALID"})
         
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404
+
+
+class TestRosterImport:
+    """Test bulk roster import."""
+
+    @staticmethod
+    def read_ndjson(response):
+        import json
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_csv_roster_creates_and_enrolls(self, client):
+        """New, existing, duplicate, invalid and teacher rows each get their own result."""
+        from tests.utils import OfficeHelper, FileHelper
+        setup = OfficeHelper.create_office_with_teacher(client)
+        headers = AuthHelper.get_auth_headers(setup['teacher_token'])
+        AuthHelper.register_and_login(client, TestDataFactory.create_student(email="Existing@example.com"))
+
+        roster = ("name,email,password\n"
+                  "New Student,new@example.com,\n"
+                  "Existing,existing@example.com,\n"
+                  "Dup,NEW@example.com,\n"
+                  "Broken,not-an-email,\n"
+                  "Teacher,teacher@example.com,\n"
+                  "Chosen,chosen@example.com,chosenpass\n")
+        response = client.post(f"/office/{setup['office_id']}/roster", headers=headers,
+                               data={'file': FileHelper.create_test_file(roster, "roster.csv")},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        lines = self.read_ndjson(response)
+        results, summary = lines[:-1], lines[-1]['summary']
+        assert [r['status'] for r in results] == ['enrolled', 'enrolled', 'error', 'error', 'error', 'enrolled']
+        assert results[0]['created'] and 'created' not in results[1]
+        assert summary == {"rows": 6, "created": 2, "enrolled": 3, "already_enrolled": 0, "errors": 3}
+
+        login = client.post('/auth/login', json={"email": "new@example.com",
+                                                 "password": results[0]['temporary_password']})
+        assert login.status_code == 200
+        assert client.post('/auth/login', json={"email": "chosen@example.com",
+                                                "password": "chosenpass"}).status_code == 200
+        files = client.get(f"/upload/office/{setup['office_id']}/files",
+                           headers=AuthHelper.get_auth_headers(login.get_json()['token']))
+        assert files.status_code == 200
+
+    def test_json_roster_is_idempotent(self, client):
+        """Re-importing the same roster creates nothing new."""
+        from tests.utils import OfficeHelper
+        setup = OfficeHelper.create_office_with_teacher(client)
+        headers = AuthHelper.get_auth_headers(setup['teacher_token'])
+        roster = {"students": [{"name": f"S{i}", "email": f"s{i}@example.com"} for i in range(30)]}
+        first = self.read_ndjson(client.post(f"/office/{setup['office_id']}/roster", headers=headers, json=roster))
+        again = self.read_ndjson(client.post(f"/office/{setup['office_id']}/roster", headers=headers, json=roster))
+        assert first[-1]['summary']['created'] == 30
+        assert again[-1]['summary'] == {"rows": 30, "created": 0, "enrolled": 0, "already_enrolled": 30, "errors": 0}
+
+        student = AuthHelper.register_and_login(client, TestDataFactory.create_student(email="x@example.com"))
+        denied = client.post(f"/office/{setup['office_id']}/roster",
+                             headers=AuthHelper.get_auth_headers(student), json=roster)
+        assert denied.status_code == 403
+
+
+class TestBulkOffices:
+    """Test bulk office creation and join-code allocation."""
+
+    def test_bulk_create_offices(self, client):
+        """Hundreds of offices are created in one request with distinct join codes."""
+        token = AuthHelper.register_and_login(client, TestDataFactory.create_teacher())
+        headers = AuthHelper.get_auth_headers(token)
+        names = [f"CS 101 - {i:03d}" for i in range(200)]
+        response = client.post('/office/bulk_create', headers=headers, json={"names": names})
+        assert response.status_code == 201
+        offices = response.get_json()['offices']
+        assert [o['name'] for o in offices] == names
+        assert len({o['join_code'] for o in offices}) == 200
+        assert client.get(f"/upload/office/{offices[-1]['id']}/files", headers=headers).status_code == 200
+
+        assert client.post('/office/bulk_create', headers=headers, json={"names": []}).status_code == 400
+        student = AuthHelper.register_and_login(client, TestDataFactory.create_student())
+        assert client.post('/office/bulk_create', headers=AuthHelper.get_auth_headers(student),
+                           json={"names": ["x"]}).status_code == 403
+
+    def test_collisions_redrawn_and_counted(self, app, client, monkeypatch):
+        """Codes known to be used are redrawn; a code taken by another worker triggers a reload."""
+        from app import db
+        from app.models.db_models import Office
+        from app.services import metrics
+        from app.services.join_codes import get_allocator
+        token = AuthHelper.register_and_login(client, TestDataFactory.create_teacher())
+        headers = AuthHelper.get_auth_headers(token)
+        first = client.post('/office/create', headers=headers, json={"name": "A"}).get_json()['office']
+
+        # Written behind the allocator's back, as another worker would
+        owner_id = Office.query.get(first['id']).owner_id
+        db.session.add(Office(name="Elsewhere", owner_id=owner_id, join_code="ZZZZZZ"))
+        db.session.commit()
+
+        allocator = get_allocator(app)
+        draws = iter([first['join_code'], "ZZZZZZ", "ZZZZZZ", "NEW001"])
+        monkeypatch.setattr(allocator._random, "choices", lambda alphabet, k: list(next(draws)))
+        collisions = metrics.counter_values("join_codes.collisions").get("", 0)
+
+        response = client.post('/office/create', headers=headers, json={"name": "B"})
+        assert response.status_code == 201
+        assert response.get_json()['office']['join_code'] == "NEW001"
+        assert metrics.counter_values("join_codes.collisions")[""] == collisions + 2
@@ -0,0 +1,34 @@
+# tests/test_query_monitor.py - SQL timing and N+1 detection tests
+import logging
+from app.services import metrics
+from app.services.query_monitor import statement_shape, parameter_shape
+from tests.utils import TestDataFactory, AuthHelper
+
+class TestQueryMonitor:
+    """Test per-request query attribution."""
+
+    def test_statement_shape(self):
+        """Literals and IN lists collapse so repeated lookups share a shape."""
+        a = statement_shape("SELECT * FROM user\n WHERE id IN (?, ?, ?) AND name = 'bob' LIMIT 1")
+        b = statement_shape("SELECT * FROM user WHERE id IN (?, ?) AND name = 'alice' LIMIT 5")
+        assert a == b == "SELECT * FROM user WHERE id IN (?, ...) AND name = ? LIMIT ?"
+        assert parameter_shape((1, "x")) == "(int, str)"
+        assert parameter_shape([(1, "x"), (2, "y")], executemany=True) == "2 x (int, str)"
+
+    def test_queries_attributed_to_route(self, client):
+        """Each request's query count and DB time is exported per route."""
+        before = metrics.counter_values("db.queries").get("route=auth.login", 0)
+        token = AuthHelper.register_and_login(client, TestDataFactory.create_student())
+        assert token
+        after = metrics.counter_values("db.queries").get("route=auth.login", 0)
+        assert after > before
+        assert "auth.login" in metrics.collect()["gauges"]["db.routes"]
+
+    def test_repeated_statement_flagged(self, client, monkeypatch, caplog):
+        """Running the same statement shape more than the threshold logs an N+1 warning."""
+        monkeypatch.setenv("N_PLUS_ONE_THRESHOLD", "0")
+        with caplog.at_level(logging.WARNING, logger="app.services.query_monitor"):
+            response = client.post('/auth/register', json=TestDataFactory.create_student(),
+                                   headers={'X-Request-Id': 'req-123'})
+        assert response.headers['X-Request-Id'] == 'req-123'
+        assert any("N_PLUS_ONE route=auth.register request=req-123" in r.message for r in caplog.records)
@@ -1,8 +1,25 @@
 # tests/test_upload.py - File upload tests
 import pytest
 import io
+import os
+import json
+import time
 from unittest.mock import patch
 from tests.utils import TestDataFactory, AuthHelper, OfficeHelper, FileHelper
+from app.services import resource_text
+
+def fake_extractor(file_path, file_type, progress=None):
+    """Extractor run in the worker child by the queue tests."""
+    with open(file_path) as f:
+        content = f.read()
+    if "crash" in content:
+        os._exit(3)
+    if "slow" in content:
+        time.sleep(30)
+    if "blank" in content:
+        return ""
+    progress(0.5, "halfway")
+    return f"extracted: {content}"
 
 class TestUpload:
     """Test file upload functionality."""
@@ -76,4 +93,356 @@ class TestUpload:
         assert response.status_code == 200
         json_data = response.get_json()
         assert 'files' in json_data
-        assert len(json_data['files']) == 1
\ No newline at end of file
+        assert len(json_data['files']) == 1
+
+class TestExtractionQueue:
+    """Test background extraction jobs."""
+
+    @pytest.fixture
+    def teacher_with_office(self, client):
+        return OfficeHelper.create_office_with_teacher(client)
+
+    def upload(self, client, data, content):
+        response = FileHelper.upload_file(client, data["teacher_token"], data['office_id'], content=content)
+        assert response.status_code == 201
+        return response.get_json()
+
+    def test_upload_returns_before_extraction(self, app, client, teacher_with_office):
+        """Upload only queues a job; a worker process fills in the text and SSE reports it."""
+        from app import db
+        from app.models.db_models import Resource
+        from app.services.extraction_queue import ExtractionWorker
+        data = teacher_with_office
+        headers = AuthHelper.get_auth_headers(data["teacher_token"])
+        body = self.upload(client, data, "lecture notes")
+        assert body['resource']['processed'] is False
+        assert body['job']['status'] == 'queued'
+
+        worker = ExtractionWorker(app, "test", extractor="tests.test_upload:fake_extractor")
+        try:
+            assert worker.run_once()
+            assert not worker.run_once()
+        finally:
+            worker.process.stop()
+
+        db.session.expire_all()
+        resource = db.session.get(Resource, body['resource']['id'])
+        assert resource.processed
+        assert resource_text.full_text(db.session, resource.id) == "extracted: lecture notes"
+        job = client.get(f"/upload/jobs/{body['job']['id']}", headers=headers).get_json()['job']
+        assert job['status'] == 'done' and job['progress'] == 1.0
+
+        events = client.get(f"/upload/jobs/{body['job']['id']}/events", headers=headers)
+        assert events.mimetype == 'text/event-stream'
+        assert '"status": "done"' in events.get_data(as_text=True)
+
+        student = AuthHelper.register_and_login(client, TestDataFactory.create_student())
+        assert client.get(f"/upload/jobs/{body['job']['id']}",
+                          headers=AuthHelper.get_auth_headers(student)).status_code == 404
+
+    def test_crash_and_timeout_are_contained(self, app, client, teacher_with_office, monkeypatch):
+        """A crashing job is retried then failed, a slow one is killed; the web process carries on."""
+        from app import db
+        from app.models.db_models import ExtractionJob, Resource
+        from app.services.extraction_queue import ExtractionWorker
+        monkeypatch.setenv("EXTRACTION_RETRY_BACKOFF", "0")
+        monkeypatch.setenv("EXTRACTION_TIMEOUT", "2")
+        data = teacher_with_office
+        crash = self.upload(client, data, "crash")['job']['id']
+        slow = self.upload(client, data, "slow")['job']['id']
+        ok = self.upload(client, data, "fine")['job']['id']
+        blank = self.upload(client, data, "blank")
+        ExtractionJob.query.update({'max_attempts': 2})
+        db.session.commit()
+
+        worker = ExtractionWorker(app, "test", extractor="tests.test_upload:fake_extractor")
+        try:
+            while worker.run_once():
+                pass
+        finally:
+            worker.process.stop()
+
+        db.session.expire_all()
+        jobs = {job.id: job for job in ExtractionJob.query.all()}
+        assert jobs[crash].status == 'failed' and jobs[crash].attempts == 2
+        assert 'exit code 3' in jobs[crash].error
+        assert jobs[slow].status == 'failed' and 'Timed out' in jobs[slow].error
+        assert jobs[ok].status == 'done'
+        # No text is still a finished extraction, not a pending one
+        assert jobs[blank['job']['id']].status == 'done' and jobs[blank['job']['id']].message == 'No text extracted'
+        assert db.session.get(Resource, blank['resource']['id']).processed
+
+
+class TestUploadStore:
+    """Test content-addressed storage and extraction reuse."""
+
+    def test_identical_uploads_share_file_and_extraction(self, app, client):
+        from app import db
+        from app.models.db_models import Resource, StoredBlob, ExtractionJob
+        from app.services.extraction_queue import ExtractionWorker
+        data = OfficeHelper.create_office_with_teacher(client)
+        token = data["teacher_token"]
+        other_office = client.post('/office/create', headers=AuthHelper.get_auth_headers(token),
+                                   json={'name': 'Section 2'}).get_json()['office']['id']
+        content = f"syllabus {os.urandom(8).hex()}"
+
+        # Two copies queued before either is extracted: the second job reuses the first one's text
+        first = FileHelper.upload_file(client, token, data['office_id'], content=content).get_json()
+        second = FileHelper.upload_file(client, token, other_office, content=content).get_json()
+        assert first['job'] and second['job']
+        worker = ExtractionWorker(app, "test", extractor="tests.test_upload:fake_extractor")
+        try:
+            assert worker.run_once() and worker.run_once()
+        finally:
+            worker.process.stop()
+        assert db.session.get(ExtractionJob, second['job']['id']).message == "Reused"
+
+        # A later copy is done at upload time
+        third = FileHelper.upload_file(client, token, other_office, filename="copy.txt", content=content).get_json()
+        assert third['job'] is None and third['resource']['processed'] is True
+
+        db.session.expire_all()
+        resources = Resource.query.all()
+        assert {resource_text.full_text(db.session, r.id) for r in resources} == {f"extracted: {content}"}
+        assert len({r.file_path for r in resources}) == 1
+        blob = db.session.get(StoredBlob, resources[0].content_hash)
+        assert blob.ref_count == 3 and blob.size == len(content)
+        path, sha256 = blob.file_path, blob.sha256
+
+        headers = AuthHelper.get_auth_headers(token)
+        for resource in resources:
+            assert os.path.exists(path)
+            assert client.delete(f"/upload/file/{resource.id}", headers=headers).status_code == 200
+        assert not os.path.exists(path)
+        assert db.session.get(StoredBlob, sha256) is None
+
+    def test_failed_upload_leaves_no_blob(self, app, client, monkeypatch):
+        from app.models.db_models import Resource, StoredBlob
+        from app.services import extraction_queue
+        data = OfficeHelper.create_office_with_teacher(client)
+
+        def broken_enqueue(session, resource_id):
+            raise RuntimeError("queue unavailable")
+
+        monkeypatch.setattr(extraction_queue, "enqueue", broken_enqueue)
+        response = FileHelper.upload_file(client, data["teacher_token"], data['office_id'], content="lost notes")
+        assert response.status_code == 500
+        assert Resource.query.count() == 0 and StoredBlob.query.count() == 0
+        blobs = os.path.join(app.config['UPLOAD_FOLDER'], 'blobs')
+        assert not [name for _, _, names in os.walk(blobs) for name in names]
+
+
+class TestChunkedUpload:
+    """Test resumable chunked uploads."""
+
+    @staticmethod
+    def start(client, headers, office_id, content):
+        response = client.post('/upload/sessions', headers=headers,
+                               json={'office_id': office_id, 'filename': 'lecture.mp4', 'size': len(content)})
+        assert response.status_code == 201
+        return f"/upload/sessions/{response.get_json()['upload']['id']}"
+
+    @staticmethod
+    def put(client, headers, url, content, offset, body=None):
+        import hashlib
+        chunk = content[offset:offset + 1000]
+        return client.put(f"{url}/chunks/{offset}", data=chunk if body is None else body,
+                          headers={**headers, 'X-Chunk-Sha256': hashlib.sha256(chunk).hexdigest()})
+
+    def test_out_of_order_chunks_with_resume(self, app, client, monkeypatch):
+        import hashlib
+        from app import db
+        from app.models.db_models import Resource, UploadSession
+        from app.services import chunked_upload
+        monkeypatch.setattr(chunked_upload, "CHUNK_SIZE", 1000)
+        data = OfficeHelper.create_office_with_teacher(client)
+        headers = AuthHelper.get_auth_headers(data["teacher_token"])
+        content = os.urandom(4500)
+
+        response = client.post('/upload/sessions', headers=headers,
+                               json={'office_id': data['office_id'], 'filename': 'lecture.mp4', 'size': len(content)})
+        assert response.status_code == 201
+        upload = response.get_json()['upload']
+        assert upload['chunk_count'] == 5 and upload['missing'] == [0, 1000, 2000, 3000, 4000]
+        url = f"/upload/sessions/{upload['id']}"
+
+        def put(offset, body=None):
+            return self.put(client, headers, url, content, offset, body)
+
+        assert put(1000, b"x" * 1000).status_code == 422  # corrupted in transit
+        assert put(500).status_code == 400  # not on a chunk boundary
+        # Any order works (test_parallel_chunks sends them concurrently)
+        assert [put(offset).status_code for offset in (4000, 0, 2000)] == [200] * 3
+
+        # Resume: finalize reports what is missing, the client sends only that
+        response = client.post(f"{url}/finalize", headers=headers)
+        assert response.status_code == 409
+        missing = response.get_json()['upload']['missing']
+        assert missing == [1000, 3000]
+        for offset in missing:
+            assert put(offset).status_code == 200
+
+        response = client.post(f"{url}/finalize", headers=headers)
+        assert response.status_code == 201
+        body = response.get_json()
+        assert body['resource']['file_type'] == 'video' and body['resource']['file_size'] == len(content)
+        assert body['job']['status'] == 'queued'
+        resource = db.session.get(Resource, body['resource']['id'])
+        assert resource.content_hash == hashlib.sha256(content).hexdigest()
+        with open(resource.file_path, 'rb') as f:
+            assert f.read() == content
+        assert db.session.get(UploadSession, upload['id']) is None
+        assert client.get(url, headers=headers).status_code == 404
+
+    def test_failed_resend_unrecords_chunk(self, app, client, monkeypatch):
+        """A resend that fails after overwriting part of an accepted chunk must be sent again."""
+        import hashlib
+        from app import db
+        from app.models.db_models import Resource, UploadSession
+        from app.services import chunked_upload
+        monkeypatch.setattr(chunked_upload, "CHUNK_SIZE", 1000)
+        data = OfficeHelper.create_office_with_teacher(client)
+        headers = AuthHelper.get_auth_headers(data["teacher_token"])
+        content = os.urandom(2000)
+        url = self.start(client, headers, data['office_id'], content)
+        assert [self.put(client, headers, url, content, offset).status_code for offset in (0, 1000)] == [200, 200]
+
+        assert self.put(client, headers, url, content, 0, b"y" * 400).status_code == 400  # short resend
+        response = client.post(f"{url}/finalize", headers=headers)
+        assert response.status_code == 409 and response.get_json()['upload']['missing'] == [0]
+
+        class DroppedStream:
+            def __init__(self):
+                self.sent = False
+            def read(self, size):
+                if self.sent:
+                    raise IOError("client disconnected")
+                self.sent = True
+                return b"z" * 300
+        assert self.put(client, headers, url, content, 0).status_code == 200
+        upload = db.session.get(UploadSession, url.rsplit('/', 1)[1])
+        with pytest.raises(IOError):
+            chunked_upload.write_chunk(db.session, upload, 1000, DroppedStream(),
+                                       hashlib.sha256(content[1000:]).hexdigest())
+        assert chunked_upload.received_offsets(db.session, upload) == [0]
+
+        assert self.put(client, headers, url, content, 1000).status_code == 200
+        response = client.post(f"{url}/finalize", headers=headers)
+        assert response.status_code == 201
+        resource = db.session.get(Resource, response.get_json()['resource']['id'])
+        assert resource.content_hash == hashlib.sha256(content).hexdigest()
+
+    def test_parallel_chunks(self, monkeypatch, tmp_path):
+        """Chunks PUT concurrently, each request on its own connection to a file database."""
+        import hashlib
+        from concurrent.futures import ThreadPoolExecutor
+        from app import create_app, db
+        from app.models.db_models import Resource
+        from app.services import chunked_upload
+        monkeypatch.setenv("TEST_DATABASE_URL", f"sqlite:///{tmp_path / 'parallel.db'}")
+        monkeypatch.setattr(chunked_upload, "CHUNK_SIZE", 1000)
+        app = create_app(testing=True)
+        app.config['UPLOAD_FOLDER'] = str(tmp_path / "uploads")
+        try:
+            client = app.test_client()
+            data = OfficeHelper.create_office_with_teacher(client)
+            headers = AuthHelper.get_auth_headers(data["teacher_token"])
+            content = os.urandom(7500)
+            url = self.start(client, headers, data['office_id'], content)
+
+            offsets = list(range(0, len(content), 1000))[::-1]
+            with ThreadPoolExecutor(len(offsets)) as pool:
+                statuses = list(pool.map(
+                    lambda offset: self.put(app.test_client(), headers, url, content, offset).status_code, offsets))
+            assert statuses == [200] * len(offsets)
+
+            response = client.post(f"{url}/finalize", headers=headers)
+            assert response.status_code == 201
+            with app.app_context():
+                resource = db.session.get(Resource, response.get_json()['resource']['id'])
+                assert resource.content_hash == hashlib.sha256(content).hexdigest()
+                with open(resource.file_path, 'rb') as f:
+                    assert f.read() == content
+        finally:
+            with app.app_context():
+                db.session.remove()
+                app.extensions["read_engine"].dispose()
+                db.engine.dispose()
+
+
+class TestPdfExtraction:
+    """Test page-parallel PDF extraction and chunked text storage."""
+
+    def test_pdf_pages_extracted_in_parallel_and_in_order(self, app, client, monkeypatch, tmp_path):
+        import PyPDF2
+        from benchmarks.corpus import write_pdf
+        from app import db
+        from app.models.db_models import Resource, ResourceChunk, ExtractionJob
+        from app.services.extraction_queue import ExtractionWorker
+        monkeypatch.setenv("PDF_EXTRACT_WORKERS", "3")
+        monkeypatch.setenv("PDF_PAGES_PER_TASK", "4")
+        path = write_pdf(str(tmp_path / "textbook.pdf"), 30)
+        expected = "\n".join(page.extract_text() for page in PyPDF2.PdfReader(path).pages).strip()
+
+        data = OfficeHelper.create_office_with_teacher(client)
+        headers = AuthHelper.get_auth_headers(data["teacher_token"])
+        with open(path, 'rb') as f:
+            body = client.post('/upload/file', headers=headers,
+                               data={'office_id': data['office_id'], 'file': (f, 'textbook.pdf')}).get_json()
+        worker = ExtractionWorker(app, "test")
+        try:
+            assert worker.run_once()
+        finally:
+            worker.process.stop()
+
+        db.session.expire_all()
+        resource_id = body['resource']['id']
+        assert resource_text.full_text(db.session, resource_id) == expected
+        job = db.session.get(ExtractionJob, body['job']['id'])
+        assert job.status == 'done' and job.progress == 1.0
+
+        # Pages are stored as chunks, the larger ones compressed, and streamed back page by page
+        chunks = ResourceChunk.query.filter_by(resource_id=resource_id).order_by(ResourceChunk.position).all()
+        assert [(c.kind, c.number) for c in chunks] == [('page', n) for n in range(1, 31)]
+        assert {c.codec for c in chunks} == {resource_text.CODEC}
+        response = client.get(f"/upload/file/{resource_id}/text", headers=headers)
+        assert response.mimetype == 'application/x-ndjson'
+        pages = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [p['number'] for p in pages] == list(range(1, 31))
+        assert "\n".join(p['text'] for p in pages).strip() == expected
+
+    def test_listing_does_not_load_text(self, app, client):
+        from sqlalchemy import event
+        from app import db
+        from app.models.db_models import Resource
+        data = OfficeHelper.create_office_with_teacher(client)
+        headers = AuthHelper.get_auth_headers(data["teacher_token"])
+        resource_id = FileHelper.upload_file(client, data["teacher_token"], data['office_id']).get_json()['resource']['id']
+        resource_text.write_chunks(db.session, resource_id, [('section', 1, "x" * 5000)])
+        db.session.commit()
+
+        statements = []
+        with app.app_context():
+            engine = db.engine
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.get(f"/upload/office/{data['office_id']}/files", headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert response.get_json()['files'][0]['id'] == resource_id
+        assert not [s for s in statements if "extracted_text" in s or "resource_chunk" in s]
+        assert "extracted_text" not in Resource.query.get(resource_id).__dict__  # deferred
+
+    def test_text_encodings(self, tmp_path, monkeypatch):
+        """Latin-1 files keep their last byte; utf-8 characters split across reads survive."""
+        from app.utils import file_processor
+        latin1 = tmp_path / "menu.txt"
+        latin1.write_bytes(b"caf\xe9\nna\xefve caf\xe9")
+        assert file_processor.extract_from_txt(str(latin1)) == "café\nnaïve café"
+
+        monkeypatch.setattr(file_processor, "SECTION_CHARS", 7)
+        utf8 = tmp_path / "notes.txt"
+        utf8.write_bytes("café crème brûlée".encode("utf-8"))
+        sections = [segment.text for segment in file_processor.iter_txt_sections(str(utf8))]
+        assert len(sections) > 1 and "".join(sections) == "café crème brûlée"